@@ -22,6 +22,7 @@
 
 #include <vector>
 #include <array>
+#include <algorithm>
 #include <stdlib.h>
 #include "libndspy/Dspy.h"
 
@@ -42,6 +43,7 @@
 #endif
 
 #include <atomic>
+#include <mutex>
 
 typedef bool (*FuncPtr)();
 FuncPtr tag_redraw_func;
@@ -54,6 +56,12 @@ struct BlenderImage
         isXpu = false;
         framebuffer = nullptr;
         denoiseFrameBuffer = nullptr;
+        generation = 0;
+        isDirty = false;
+        dirtyXMin = 0;
+        dirtyXMax = 0;
+        dirtyYMin = 0;
+        dirtyYMax = 0;
     }
 
     int width;
@@ -90,6 +98,20 @@ struct BlenderImage
     size_t noutputs;
     std::atomic<bool> bufferUpdated;
 
+    // Incremented every time new pixels are written to the framebuffer.
+    // Zero means no pixels have arrived yet.
+    std::atomic<uint64_t> generation;
+
+    // The region of the framebuffer that has changed since the
+    // last call to GetFloatFramebufferRegion. These are in framebuffer
+    // coordinates (i.e.: rows are flipped) and the max values are exclusive.
+    std::mutex dirtyMutex;
+    bool isDirty;
+    int dirtyXMin;
+    int dirtyXMax;
+    int dirtyYMin;
+    int dirtyYMax;
+
     // These two aren't currently used
     // but are needed if we decide to use a
     // fragment shader
@@ -161,6 +183,30 @@ bool DenoiseBuffer(BlenderImage* blenderImage)
     return false;
 }
 
+// Add a region to the dirty region of the framebuffer
+void MarkDirtyRegion(BlenderImage* blenderImage, int xmin, int xmax, int ymin, int ymax)
+{
+    std::lock_guard<std::mutex> lock(blenderImage->dirtyMutex);
+    if (!blenderImage->isDirty)
+    {
+        blenderImage->dirtyXMin = xmin;
+        blenderImage->dirtyXMax = xmax;
+        blenderImage->dirtyYMin = ymin;
+        blenderImage->dirtyYMax = ymax;
+        blenderImage->isDirty = true;
+        return;
+    }
+    blenderImage->dirtyXMin = std::min(blenderImage->dirtyXMin, xmin);
+    blenderImage->dirtyXMax = std::max(blenderImage->dirtyXMax, xmax);
+    blenderImage->dirtyYMin = std::min(blenderImage->dirtyYMin, ymin);
+    blenderImage->dirtyYMax = std::max(blenderImage->dirtyYMax, ymax);
+}
+
+void MarkAllDirty(BlenderImage* blenderImage)
+{
+    MarkDirtyRegion(blenderImage, 0, blenderImage->width, 0, blenderImage->height);
+}
+
 // Copy from the XPU shared memory framebuffer to our framebuffer
 void CopyXpuBuffer(BlenderImage* blenderImage)
 {
@@ -309,6 +355,73 @@ void GetFloatFramebuffer(size_t pos, size_t pybuffersize, float* pybuffer)
     memcpy(pybuffer, blenderImage->framebuffer, sizeof(float) * pybuffersize);
 }
 
+// Copy only the region of the float buffer that has changed since the 
+// last call. pybuffer is expected to be the same size as the whole framebuffer, 
+// and to hold the pixels from the previous call. If fullCopy is true, 
+// the whole framebuffer is copied.
+//
+// On return, region holds the copied region as xmin, xmax, ymin, ymax 
+// (max values are exclusive, rows are in framebuffer order). Returns false 
+// if nothing has changed, and nothing was copied.
+PRMANEXPORT
+bool GetFloatFramebufferRegion(size_t pos, size_t pybuffersize, float* pybuffer, bool fullCopy, int* region)
+{
+    if (s_blenderImages.empty() || pos >= s_blenderImages.size())
+        return false;
+
+    BlenderImage* blenderImage = s_blenderImages[pos];
+    
+    if (blenderImage == nullptr || blenderImage->framebuffer == nullptr)
+        return false;
+
+    int xmin = 0;
+    int xmax = blenderImage->width;
+    int ymin = 0;
+    int ymax = blenderImage->height;
+    {
+        std::lock_guard<std::mutex> lock(blenderImage->dirtyMutex);
+        if (!blenderImage->isDirty && !fullCopy)
+            return false;
+        if (!fullCopy)
+        {
+            xmin = std::max(blenderImage->dirtyXMin, 0);
+            xmax = std::min(blenderImage->dirtyXMax, blenderImage->width);
+            ymin = std::max(blenderImage->dirtyYMin, 0);
+            ymax = std::min(blenderImage->dirtyYMax, blenderImage->height);
+        }
+        blenderImage->isDirty = false;
+    }
+
+    const unsigned char* src = blenderImage->framebuffer;
+    if (DenoiseBuffer(blenderImage)) {
+        // the denoiser touches every pixel
+        src = blenderImage->denoiseFrameBuffer;
+        xmin = 0;
+        xmax = blenderImage->width;
+        ymin = 0;
+        ymax = blenderImage->height;
+    }
+
+    unsigned char* dst = (unsigned char*) pybuffer;
+    size_t dstsize = sizeof(float) * pybuffersize;
+    size_t rowsize = blenderImage->width * blenderImage->entrysize;
+    size_t xoffset = xmin * blenderImage->entrysize;
+    size_t copysize = (xmax - xmin) * blenderImage->entrysize;
+    for (int y = ymin; y < ymax; ++y)
+    {
+        size_t offset = y * rowsize + xoffset;
+        if (offset + copysize > dstsize)
+            break;
+        memcpy(dst + offset, src + offset, copysize);
+    }
+
+    region[0] = xmin;
+    region[1] = xmax;
+    region[2] = ymin;
+    region[3] = ymax;
+    return true;
+}
+
 // Return the active region that RenderMan is currently working on
 PRMANEXPORT
 void GetActiveRegion(size_t pos, int& arXMin, int& arXMax, int& arYMin, int& arYMax)
@@ -459,6 +572,22 @@ bool HasBufferUpdated()
     return blenderImage->bufferUpdated;
 }
 
+// Return the generation of the framebuffer for this display. The generation 
+// changes every time new pixels are written, and is 0 if no pixels have
+// been written yet.
+PRMANEXPORT
+uint64_t GetBufferGeneration(size_t pos)
+{
+    if (s_blenderImages.empty() || pos >= s_blenderImages.size())
+        return 0;
+
+    BlenderImage* blenderImage = s_blenderImages[pos];
+    if (blenderImage == nullptr)
+        return 0;
+
+    return blenderImage->generation;
+}
+
 PRMANEXPORT
 void ResetBufferUpdated()
 {
@@ -673,6 +802,14 @@ DspyImageData(
         }
     }
 
+    MarkDirtyRegion(blenderImage,
+                    blenderImage->cropXMin + xmin,
+                    blenderImage->cropXMin + xmax_plus_1,
+                    blenderImage->height - (blenderImage->cropYMin + ymax_plus_1),
+                    blenderImage->height - (blenderImage->cropYMin + ymin));
+
+    blenderImage->generation++;
+
     blenderImage->arXMin = blenderImage->cropXMin + xmin;
     blenderImage->arXMax = blenderImage->cropXMin + xmax_plus_1 - 1;
     blenderImage->arYMin = blenderImage->cropYMin + ymin;
@@ -853,6 +990,7 @@ bool DisplayBlender::Rebind(const uint32_t width, const uint32_t height,
    {
         m_image->denoiseFrameBuffer = (unsigned char*) std::malloc(m_image->size);
    }
+   MarkAllDirty(m_image);
    return true; 
 }
 
@@ -862,10 +1000,12 @@ void DisplayBlender::Close()
     if (m_image->framebuffer)
     {
         std::free(m_image->framebuffer);
+        m_image->framebuffer = nullptr;
     }
     if (m_image->denoiseFrameBuffer)
     {
         std::free(m_image->denoiseFrameBuffer);
+        m_image->denoiseFrameBuffer = nullptr;
     }
     tag_redraw_func = NULL;
 }
@@ -884,6 +1024,8 @@ void DisplayBlender::Notify(const uint32_t iteration,
         return;
     }
     CopyXpuBuffer(m_image);
+    MarkAllDirty(m_image);
+    m_image->generation++;
     m_image->bufferUpdated = true;
     if (tag_redraw_func)
     {
@@ -71,6 +71,8 @@ __DEFAULTS__ = {
     'rman_invert_light_linking': False,
     'rman_show_cycles_convert': False,
     'rman_render_nurbs_as_mesh': True,
+    'rman_export_workers': 0,
+    'rman_export_prefetch_memory': 1024,
     'rman_emit_default_params': False,
     'rman_show_advanced_params': False,      
     'rman_config_dir': "",
@@ -492,6 +494,20 @@ class RendermanPreferences(AddonPreferences):
         description="Render all NURBS surfaces as meshes."
     )
 
+    rman_export_workers: IntProperty(
+        name="Export Threads",
+        description="Number of threads used to process mesh data when exporting a scene for final renders. 0 will use the number of cores on this machine. 1 will disable threaded export.",
+        default=0,
+        min=0, max=64
+    )
+
+    rman_export_prefetch_memory: IntProperty(
+        name="Export Read-Ahead Memory (MB)",
+        description="Maximum amount of mesh data, in megabytes, read ahead of the mesh being exported when using threaded export.",
+        default=1024,
+        min=64
+    )
+
     rman_emit_default_params: BoolProperty(
         name="Emit Default Params",
         default=False,
@@ -786,6 +802,8 @@ class RendermanPreferences(AddonPreferences):
         col = row.column()
         #col.prop(self, 'rman_do_preview_renders')  
         col.prop(self, 'rman_render_nurbs_as_mesh')
+        col.prop(self, 'rman_export_workers')
+        col.prop(self, 'rman_export_prefetch_memory')
         col.prop(self, 'rman_show_cycles_convert')     
         col.prop(self, 'rman_emit_default_params')    
         # col.prop(self, 'rman_invert_light_linking')
@@ -2,11 +2,13 @@ import unittest
 from RenderManForBlender.rfb_unittests.test_string_expr import StringExprTest
 from RenderManForBlender.rfb_unittests.test_shader_nodes import ShaderNodesTest
 from RenderManForBlender.rfb_unittests.test_geo import GeoTest
+from RenderManForBlender.rfb_unittests.test_scene_sync import SceneSyncTest
 
 classes = [
     StringExprTest,
     ShaderNodesTest,
-    GeoTest
+    GeoTest,
+    SceneSyncTest
 ]
 
 def suite():
@@ -1,7 +1,11 @@
 import unittest
 import bpy
+import tracemalloc
+from unittest import mock
 import numpy as np
+from mathutils import Matrix, Vector
 from ..rfb_utils import mesh_utils
+from ..rfb_utils import transform_utils
 from ..rman_constants import BLENDER_41
 
 
@@ -10,6 +14,11 @@ class GeoTest(unittest.TestCase):
     @classmethod
     def add_tests(self, suite):
         suite.addTest(GeoTest('test_mesh_export'))
+        suite.addTest(GeoTest('test_mesh_no_normals'))
+        suite.addTest(GeoTest('test_mesh_eq_bitwise'))
+        suite.addTest(GeoTest('test_large_mesh_eq'))
+        suite.addTest(GeoTest('test_transform_points_array'))
+        suite.addTest(GeoTest('test_large_pointcloud_transform_memory'))
 
     def test_mesh_export(self):
 
@@ -38,4 +47,100 @@ class GeoTest(unittest.TestCase):
         self.assertEqual(mesh, mesh_test)
         bpy.ops.object.delete()
 
-        
+    def test_mesh_no_normals(self):
+        nverts = [4]
+        verts = [0, 1, 2, 3]
+        P = [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 0.0, 0.0, 1.0, 0.0]
+        N = [0.0, 0.0, 1.0]
+
+        mesh = mesh_utils.RmanMesh(nverts, verts, P)
+        self.assertTrue(mesh == mesh_utils.RmanMesh(nverts, verts, P))
+        self.assertFalse(mesh == mesh_utils.RmanMesh(nverts, verts, P, N))
+
+    def test_mesh_eq_bitwise(self):
+        nverts = np.array([3], dtype=np.int32)
+        verts = np.array([0, 1, 2], dtype=np.int32)
+        P = np.array([0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, np.nan], dtype=np.float32)
+
+        # arrays with the same dtype are compared bitwise, so
+        # NaNs are equal, and -0.0 is different from 0.0
+        mesh = mesh_utils.RmanMesh(nverts, verts, P)
+        self.assertTrue(mesh == mesh_utils.RmanMesh(nverts, verts, P.copy()))
+        P_neg_zero = P.copy()
+        P_neg_zero[0] = -0.0
+        self.assertFalse(mesh == mesh_utils.RmanMesh(nverts, verts, P_neg_zero))
+
+        # arrays with different dtypes are compared by value
+        P = np.array([0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0], dtype=np.float32)
+        mesh = mesh_utils.RmanMesh(nverts, verts, P)
+        self.assertTrue(mesh == mesh_utils.RmanMesh(nverts, verts, P.astype(np.float64)))
+
+    def test_large_mesh_eq(self):
+        npoints = 100000
+        nverts = np.full(npoints, 4, dtype=np.int32)
+        verts = np.arange(npoints*4, dtype=np.int32) % npoints
+        P = np.random.default_rng(0).random(npoints*3, dtype=np.float32)
+        N = P.copy()
+
+        mesh = mesh_utils.RmanMesh(nverts, verts, P, N)
+        mesh_copy = mesh_utils.RmanMesh(nverts.copy(), verts.copy(), P.copy(), N.copy())
+
+        with mock.patch.object(mesh_utils, 'get_digest', wraps=mesh_utils.get_digest) as get_digest:
+            self.assertTrue(mesh == mesh_copy)
+            # one digest for each array of each mesh
+            self.assertEqual(get_digest.call_count, 8)
+
+            # compare again, fingerprints should now be cached
+            get_digest.reset_mock()
+            self.assertTrue(mesh == mesh_copy)
+            get_digest.assert_not_called()
+
+            # change the last point. The other arrays are shared, so only
+            # the changed points need a digest
+            get_digest.reset_mock()
+            P_changed = P.copy()
+            P_changed[-1] += 1.0
+            mesh_changed = mesh_utils.RmanMesh(nverts, verts, P_changed, N)
+            self.assertFalse(mesh == mesh_changed)
+            self.assertEqual(get_digest.call_count, 1)
+
+    def test_transform_points_array(self):
+        mtx = Matrix.Translation((1.0, 2.0, 3.0)) @ Matrix.Rotation(0.5, 4, 'Z')
+        P = np.array([[0.0, 0.0, 0.0], [1.0, 2.0, 3.0], [-4.0, 5.0, 0.5]], dtype=np.float32)
+
+        out = transform_utils.transform_points_array(mtx, P)
+        expected = [mtx @ Vector(p) for p in P]
+        self.assertTrue(np.allclose(out, expected, atol=1e-5))
+
+        out = transform_utils.transform_points_array(mtx, P, row_vector=True)
+        expected = [Vector(p) @ mtx for p in P]
+        self.assertTrue(np.allclose(out, expected, atol=1e-5))
+
+    def test_large_pointcloud_transform_memory(self):
+        from ..rman_translators.rman_pointcloud_translator import _get_points_
+
+        npoints = 1000000
+        P = np.random.default_rng(0).random((npoints, 3), dtype=np.float32)
+        velocity = np.random.default_rng(1).random(npoints*3, dtype=np.float32)
+        mtx = Matrix.Translation((1.0, 2.0, 3.0)) @ Matrix.Rotation(0.5, 4, 'Z')
+        motion_scale = 0.5
+
+        tracemalloc.start()
+        P_out, next_points = _get_points_(P, mtx, velocity=velocity, motion_scale=motion_scale)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # the transformed points, the next points and the scaled velocities
+        self.assertLessEqual(peak, 3.1 * P.nbytes)
+        self.assertEqual(P_out.dtype, np.float32)
+        self.assertEqual(next_points.dtype, np.float32)
+
+        # check against mathutils for a few of the points
+        for i in [0, npoints // 2, npoints - 1]:
+            p = Vector(P[i]) @ mtx
+            v = (Vector(velocity[i*3:i*3+3]) * motion_scale) @ mtx
+            self.assertTrue(np.allclose(P_out[i], p, atol=1e-4))
+            self.assertTrue(np.allclose(next_points[i], p + v, atol=1e-4))
+
+        P_out, next_points = _get_points_(P, mtx)
+        self.assertIsNone(next_points)
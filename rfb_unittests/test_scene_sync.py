@@ -0,0 +1,73 @@
+import unittest
+import time
+from .. import rman_scene_sync
+
+
+class SceneSyncTest(unittest.TestCase):
+
+    @classmethod
+    def add_tests(self, suite):
+        suite.addTest(SceneSyncTest('test_reconcile_prototypes'))
+        suite.addTest(SceneSyncTest('test_reconcile_prototypes_scaling'))
+        suite.addTest(SceneSyncTest('test_reconcile_indexed_instances'))
+
+    class Prototype:
+        def __init__(self, num_instances):
+            self.instances = dict(('instance_%d' % i, i) for i in range(num_instances))
+
+    def test_reconcile_prototypes(self):
+        a = self.Prototype(3)
+        b = self.Prototype(2)
+        need_cleaning = {a: ['instance_0', 'instance_2'], b: ['instance_0', 'instance_1']}
+        deleted, stale = rman_scene_sync.reconcile_prototypes({'a', 'b', 'c'}, {'a', 'b'}, need_cleaning)
+        self.assertEqual(deleted, {'c'})
+        self.assertEqual(stale, {a: {'instance_1'}})
+
+    def test_reconcile_prototypes_scaling(self):
+        def reconcile_time(num_prototypes, num_instances=10):
+            prev_proto_keys = set(range(num_prototypes))
+            # every other prototype was removed, and the rest lost one instance
+            visited_proto_keys = set(range(0, num_prototypes, 2))
+            need_cleaning = dict()
+            for i in visited_proto_keys:
+                proto = self.Prototype(num_instances)
+                need_cleaning[proto] = list(proto.instances.keys())[1:]
+
+            # best of a few runs, to be less sensitive to noise
+            timings = []
+            for i in range(3):
+                start = time.perf_counter()
+                deleted, stale = rman_scene_sync.reconcile_prototypes(prev_proto_keys, visited_proto_keys, need_cleaning)
+                timings.append(time.perf_counter() - start)
+            self.assertEqual(len(deleted), num_prototypes - len(visited_proto_keys))
+            self.assertEqual(len(stale), len(visited_proto_keys))
+            return min(timings)
+
+        small = reconcile_time(10000)
+        large = reconcile_time(40000)
+
+        # four times the prototypes should take roughly four times as long,
+        # a quadratic reconciliation would take sixteen times as long
+        self.assertLess(large, max(small, 0.001) * 8)
+
+    def test_reconcile_indexed_instances(self):
+        a = self.Prototype(3)
+        b = self.Prototype(1)
+        c = self.Prototype(0)
+        rman_prototypes = {'a': a, 'b': b, 'c': c}
+
+        # the object had two instances of a, the instance of b, and used c
+        # without instances. Prototype d was already deleted.
+        ob_index = {'a': {'instance_0', 'instance_1'}, 'b': {'instance_0'}, 'c': set(), 'd': {'instance_0'}}
+
+        # instance_1 of a is gone, and the object no longer uses b or c
+        deleted, stale = rman_scene_sync.reconcile_indexed_instances(ob_index, rman_prototypes, {'a': {'instance_0'}})
+        self.assertEqual(deleted, {'b', 'c'})
+        self.assertEqual(stale, {a: {'instance_1'}, b: {'instance_0'}})
+        self.assertEqual(ob_index, {'a': {'instance_0'}})
+
+        # the object was removed, a is still instanced by something else
+        deleted, stale = rman_scene_sync.reconcile_indexed_instances(ob_index, rman_prototypes, dict())
+        self.assertEqual(deleted, set())
+        self.assertEqual(stale, {a: {'instance_0'}})
+        self.assertEqual(ob_index, dict())
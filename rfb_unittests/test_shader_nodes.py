@@ -1,6 +1,7 @@
 import unittest
 import bpy
-from ..rfb_utils import string_utils, property_utils
+import time
+from ..rfb_utils import string_utils, property_utils, shadergraph_utils
 from .. import rfb_api
 import rman
 
@@ -10,6 +11,9 @@ class ShaderNodesTest(unittest.TestCase):
     def add_tests(self, suite):
         suite.addTest(ShaderNodesTest('test_value_conversion'))
         suite.addTest(ShaderNodesTest('test_rtparamlist'))
+        suite.addTest(ShaderNodesTest('test_gather_nodes_scaling'))
+        suite.addTest(ShaderNodesTest('test_network_digest'))
+        suite.addTest(ShaderNodesTest('test_network_digest_copies'))
 
     # test getvar 
     def test_value_conversion(self):
@@ -90,5 +94,84 @@ class ShaderNodesTest(unittest.TestCase):
         self.assertEqual(params, params_test)
 
         prefs.rman_emit_default_params =  pref_val
-        bpy.data.materials.remove(mat)        
-        
\ No newline at end of file
+        bpy.data.materials.remove(mat)
+
+    # test gather_nodes on large, heavily shared networks
+    def test_gather_nodes_scaling(self):
+        class Socket:
+            def __init__(self, node):
+                self.node = node
+                self.renderman_type = 'color'
+                self.links = []
+
+            @property
+            def is_linked(self):
+                return len(self.links) > 0
+
+        class Link:
+            def __init__(self, from_node, from_socket, to_node, to_socket):
+                self.from_node = from_node
+                self.from_socket = from_socket
+                self.to_node = to_node
+                self.to_socket = to_socket
+
+        class Node:
+            bl_idname = 'PxrLayerMixerPatternOSLNode'
+            renderman_node_type = 'pattern'
+
+            def __init__(self, width):
+                self.inputs = [Socket(self) for i in range(width)]
+                self.outputs = [Socket(self)]
+
+        # layers of nodes, where every node in a layer is connected
+        # to every input of the nodes in the next layer
+        def make_network(num_nodes, width=10):
+            layer = [Node(width) for i in range(width)]
+            for i in range(num_nodes // width - 1):
+                next_layer = [Node(width) for i in range(width)]
+                for node in next_layer:
+                    for from_node, socket in zip(layer, node.inputs):
+                        socket.links = [Link(from_node, from_node.outputs[0], node, socket)]
+                layer = next_layer
+            out = Node(width)
+            for from_node, socket in zip(layer, out.inputs):
+                socket.links = [Link(from_node, from_node.outputs[0], out, socket)]
+            return out
+
+        timings = []
+        for num_nodes in [1000, 2000]:
+            out = make_network(num_nodes)
+            start = time.time()
+            nodes = shadergraph_utils.gather_nodes(out)
+            timings.append(time.time() - start)
+            self.assertEqual(len(nodes), num_nodes + 1)
+            self.assertIs(nodes[-1], out)
+
+        # twice the nodes should take roughly twice as long
+        self.assertLess(timings[1], max(timings[0], 0.01) * 4)
+
+    # test that network digests only change when the network changes
+    def test_network_digest(self):
+        mat, bxdf = rfb_api.create_bxdf('PxrDiffuse')
+        nodes = shadergraph_utils.gather_nodes(bxdf)
+        digest = shadergraph_utils.get_network_digest(mat, nodes)
+        self.assertEqual(digest, shadergraph_utils.get_network_digest(mat, nodes))
+
+        bxdf.diffuseColor = (1.0, 0.0, 0.0)
+        self.assertNotEqual(digest, shadergraph_utils.get_network_digest(mat, nodes))
+
+        bpy.data.materials.remove(mat)
+
+    # test that copies of a material have the same network digest
+    def test_network_digest_copies(self):
+        mat, bxdf = rfb_api.create_bxdf('PxrSurface')
+        ramp = rfb_api.create_pattern('PxrRamp', mat)
+        rfb_api.connect_nodes(ramp, 'resultRGB', bxdf, 'diffuseColor')
+        mat_copy = mat.copy()
+        nodes = shadergraph_utils.gather_nodes(bxdf)
+        nodes_copy = shadergraph_utils.gather_nodes(mat_copy.node_tree.nodes[bxdf.name])
+        self.assertEqual(shadergraph_utils.get_network_digest(mat, nodes),
+                        shadergraph_utils.get_network_digest(mat_copy, nodes_copy))
+
+        bpy.data.materials.remove(mat_copy)
+        bpy.data.materials.remove(mat)
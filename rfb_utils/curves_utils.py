@@ -0,0 +1,57 @@
+import numpy as np
+
+# maximum number of vertices for one curves primitive.
+# This is to avoid a maxint on the array length
+MAX_VERTS_PER_CURVES = 100000
+
+def get_strand_vertex_indices(lengths, first_points=None):
+    '''
+    For strands with lengths points each, return the indices of the points
+    for every vertex in the packed curves, with the first and last point of each
+    strand doubled (as needed by catmull-rom curves).
+
+    Arguments:
+    lengths (numpy.ndarray) - number of points in each strand
+    first_points (numpy.ndarray) - index of the first point of each strand in a flat
+                                   points array. If None, the point indices are
+                                   local to each strand.
+
+    Returns:
+    (tuple) - strand index for each vertex, point index for each vertex,
+              and the number of vertices for each strand
+    '''
+    lengths = np.asarray(lengths)
+    verts_per_strand = lengths + 2
+    offsets = np.cumsum(verts_per_strand) - verts_per_strand
+    nverts = int(verts_per_strand.sum())
+    strand_ids = np.repeat(np.arange(len(lengths)), verts_per_strand)
+    local = np.arange(nverts) - offsets[strand_ids] - 1
+    local = np.clip(local, 0, lengths[strand_ids] - 1)
+    if first_points is not None:
+        local = local + np.asarray(first_points)[strand_ids]
+    return (strand_ids, local, verts_per_strand)
+
+def split_strands(verts_per_strand, max_verts=MAX_VERTS_PER_CURVES):
+    '''
+    Split the strands into chunks. A new chunk is started once a chunk
+    has more than max_verts vertices.
+
+    Arguments:
+    verts_per_strand (numpy.ndarray) - number of vertices in each strand
+    max_verts (int) - maximum number of vertices before starting a new chunk
+
+    Returns:
+    (list) - (start, end) strand ranges for each chunk
+    '''
+    chunks = []
+    cums = np.cumsum(verts_per_strand)
+    nstrands = len(verts_per_strand)
+    start = 0
+    base = 0
+    while start < nstrands:
+        end = int(np.searchsorted(cums, base + max_verts, side='right')) + 1
+        end = min(end, nstrands)
+        chunks.append((start, end))
+        base = int(cums[end-1])
+        start = end
+    return chunks
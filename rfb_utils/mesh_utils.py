@@ -1,47 +1,167 @@
 import numpy as np
+import hashlib
 from ..rman_constants import BLENDER_41
 
+DIGEST_SIZE = 16
+
 class RmanMesh:
-    def __init__(self, *args, **kwargs):
-        self.nverts = args[0]
-        self.verts = args[1]
-        self.P = args[2]
-        self.N = args[3]
+    '''
+    Compact container for the basic primvars needed to render a mesh.
+
+    Equality compares fingerprints (shape, dtype and a digest of the raw bytes)
+    of each array, so arrays with the same dtype are compared bitwise: NaNs with
+    the same bits are equal, and -0.0 is not equal to 0.0. Arrays with different
+    dtypes are compared by value with np.array_equal. Fingerprints are computed
+    lazily and cached, so the arrays should not be modified after comparing.
+
+    Attributes:
+        nverts (numpy.ndarray) - the number of vertices for each face
+        verts (numpy.ndarray) - vertex indices
+        P (numpy.ndarray) - points
+        N (numpy.ndarray) - normals, can be None
+        npolys (int) - number of faces
+        npoints (int) - number of points
+        numnverts (int) - number of vertex indices
+        nnormals (int) - number of normals
+    '''
+
+    __slots__ = ('nverts', 'verts', 'P', 'N', 'npolys', 'npoints', 'numnverts', 'nnormals', '_fingerprints')
+
+    def __init__(self, nverts, verts, P, N=None):
+        self.nverts = np.asarray(nverts)
+        self.verts = np.asarray(verts)
+        self.P = np.asarray(P)
+        self.N = None if N is None else np.asarray(N)
 
         self.npolys = len(self.nverts)
         self.npoints = int(len(self.P) / 3)
         self.numnverts = len(self.verts)
+        self.nnormals = 0
         if self.N is not None:
             self.nnormals = int(len(self.N) / 3)
+        self._fingerprints = dict()
+
+    def fingerprint(self, name):
+        '''
+        Get the (shape, dtype, digest) fingerprint for one of the arrays
+
+        Arguments:
+        name (str) - one of nverts, verts, P or N
+
+        Returns:
+        (tuple) - the fingerprint, or None if the array is None
+        '''
+        if name not in self._fingerprints:
+            val = getattr(self, name)
+            fp = None
+            if val is not None:
+                fp = (val.shape, val.dtype.str, get_digest(val))
+            self._fingerprints[name] = fp
+        return self._fingerprints[name]
+
+    def _array_eq(self, other, name):
+        a = getattr(self, name)
+        b = getattr(other, name)
+        if a is None or b is None:
+            return a is None and b is None
+        if a.shape != b.shape:
+            return False
+        if a is b:
+            return True
+        if a.dtype != b.dtype:
+            # the fingerprints can never match, compare the values
+            return np.array_equal(a, b)
+        # arrays with the same dtype are compared bitwise. Each side is
+        # only hashed once, the fingerprints are cached for the next compare
+        return self.fingerprint(name) == other.fingerprint(name)
 
     def __eq__(self, other):
-        self_nverts = self.nverts
-        self_verts = self.verts
-        self_P = self.P
-        self_N = self.N
-
-        other_nverts = other.nverts
-        other_verts = other.verts
-        other_P = other.P
-        other_N = other.N
-
-        # convert these to lists
-        if isinstance(self.nverts, np.ndarray):
-            self_nverts = self.nverts.tolist()
-            self_verts = self.verts.tolist()
-            self_P = self.P.tolist()
-            self_N = self.N.tolist()
-        if isinstance(other.nverts, np.ndarray):
-            other_nverts = other.nverts.tolist()
-            other_verts = other.verts.tolist()
-            other_P = other.P.tolist()
-            other_N = other.N.tolist()
-
-        if self_nverts != other_nverts or self_verts != other_verts or self_P != other_P or self_N != other_N:
+        if not isinstance(other, RmanMesh):
+            return NotImplemented
+        if (self.npolys, self.npoints, self.numnverts, self.nnormals) != (other.npolys, other.npoints, other.numnverts, other.nnormals):
             return False
+        for name in ('nverts', 'verts', 'P', 'N'):
+            if not self._array_eq(other, name):
+                return False
         return True
 
 
+def _update_digest(hasher, val):
+    if val is None:
+        hasher.update(b'None')
+    elif isinstance(val, np.ndarray):
+        hasher.update(('%s%s' % (val.dtype.str, val.shape)).encode())
+        hasher.update(np.ascontiguousarray(val).data)
+    elif isinstance(val, memoryview):
+        hasher.update(('%s%s' % (val.format, val.shape)).encode())
+        if val.c_contiguous:
+            hasher.update(val)
+        else:
+            hasher.update(val.tobytes())
+    else:
+        hasher.update(repr(val).encode())
+
+def get_digest(*values):
+    '''
+    Compute a content digest over the input values. Numpy arrays and memoryviews
+    are hashed using their raw buffers, without any conversion to lists.
+
+    Arguments:
+    values - numpy arrays, memoryviews or other values with a stable repr()
+
+    Returns:
+    (bytes) - the digest
+    '''
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for val in values:
+        _update_digest(hasher, val)
+    return hasher.digest()
+
+def _update_set_func_digest(hasher, name, args):
+    hasher.update(name.encode())
+    for val in args:
+        _update_digest(hasher, val)
+
+def get_primvars_digest(primvars):
+    '''
+    Compute the digest of a list of packed Set* calls, the same way 
+    RmanPrimVarsDigest would if the calls were made on it.
+
+    Arguments:
+    primvars (list) - (Set* method name, args...) tuples
+
+    Returns:
+    (bytes) - the digest
+    '''
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for name, *args in primvars:
+        _update_set_func_digest(hasher, name, args)
+    return hasher.digest()
+
+class RmanPrimVarsDigest:
+    '''
+    Thin wrapper around an RtParamList that keeps a running digest of every
+    Set* call made on it. All calls are forwarded to the wrapped RtParamList.
+    Note, the wrapper cannot be passed to methods expecting an actual RtParamList
+    (ex: Inherit).
+    '''
+    def __init__(self, primvars):
+        self.primvars = primvars
+        self.hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+    def __getattr__(self, name):
+        attr = getattr(self.primvars, name)
+        if not name.startswith('Set') or not callable(attr):
+            return attr
+
+        def set_func(*args):
+            _update_set_func_digest(self.hasher, name, args)
+            return attr(*args)
+        return set_func
+
+    def digest(self):
+        return self.hasher.digest()
+
 def get_mesh_points_(mesh):
     '''
     Get just the points for the input mesh.
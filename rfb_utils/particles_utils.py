@@ -1,76 +1,154 @@
-from mathutils import Vector
+import numpy as np
+from . import transform_utils
+
+# value of ParticleSystem.particles.alive_state when read with foreach_get
+# see PARS_ALIVE in DNA_particle_types.h
+PARS_ALIVE = 1
+
+class RmanParticleData:
+    '''
+    Particle attributes for a particle system, read in bulk with foreach_get.
+    Create one of these for each particle system per time sample and pass it to
+    get_particles and get_primvars_particle, so that the particles only need to
+    be read once.
+
+    Attributes:
+        count (int) - number of particles in the particle system
+        location (numpy.ndarray) - (count, 3) particle locations
+        velocity (numpy.ndarray) - (count, 3) particle velocities
+        size (numpy.ndarray) - particle sizes
+        birth_time (numpy.ndarray) - particle birth times
+        die_time (numpy.ndarray) - particle die times
+        lifetime (numpy.ndarray) - particle life times
+        alive (numpy.ndarray) - bool mask of the particles that are alive
+    '''
+
+    def __init__(self, psys):
+        self.psys = psys
+        particles = psys.particles
+        self.count = len(particles)
+        self.location = self._get_vector(particles, 'location')
+        self.velocity = self._get_vector(particles, 'velocity')
+        self.size = self._get_float(particles, 'size')
+        self.birth_time = self._get_float(particles, 'birth_time')
+        self.die_time = self._get_float(particles, 'die_time')
+        self.lifetime = self._get_float(particles, 'lifetime')
+        self.alive = self._get_alive(particles)
+        self._angular_velocity = None
+        self._valid_masks = dict()
+
+    def _get_vector(self, particles, attr):
+        arr = np.zeros(self.count*3, dtype=np.float32)
+        particles.foreach_get(attr, arr)
+        arr.shape = (self.count, 3)
+        return arr
+
+    def _get_float(self, particles, attr):
+        arr = np.zeros(self.count, dtype=np.float32)
+        particles.foreach_get(attr, arr)
+        return arr
+
+    def _get_alive(self, particles):
+        alive_state = np.zeros(self.count, dtype=np.int32)
+        try:
+            particles.foreach_get('alive_state', alive_state)
+        except (TypeError, RuntimeError):
+            return np.array([pa.alive_state == 'ALIVE' for pa in particles], dtype=bool)
+        return alive_state == PARS_ALIVE
+
+    @property
+    def angular_velocity(self):
+        if self._angular_velocity is None:
+            self._angular_velocity = self._get_vector(self.psys.particles, 'angular_velocity')
+        return self._angular_velocity
+
+    def valid_mask(self, valid_frames):
+        '''
+        Return a bool mask of the particles that exist for all of valid_frames.
+        '''
+        key = (valid_frames[0], valid_frames[-1])
+        mask = self._valid_masks.get(key, None)
+        if mask is None:
+            mask = (self.die_time >= valid_frames[-1]) & (self.birth_time <= valid_frames[0])
+            self._valid_masks[key] = mask
+        return mask
+
+def _safe_divide(a, b):
+    # particles with a lifetime of 0 get a value of 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = a / b
+    return np.where(b != 0.0, out, 0.0).astype(np.float32)
 
 def valid_particle(pa, valid_frames):
     return pa.die_time >= valid_frames[-1] and pa.birth_time <= valid_frames[0]
 
-def get_particles(ob, psys, inv_mtx, frame, valid_frames=None, get_next_P=False, get_width=True):
-    P = []
-    next_P = []
-    width = []
+def get_particles(ob, psys, inv_mtx, frame, valid_frames=None, get_next_P=False, get_width=True, particle_data=None):
+    '''
+    Get the points for a particle system, in object space.
 
+    Returns:
+    (tuple) - flat float32 arrays of the points, the points for the next frame
+              (using velocity) and the widths of the points.
+    '''
     valid_frames = (frame,
                     frame) if valid_frames is None else valid_frames
-    
+
     rm = psys.settings.renderman
+    if particle_data is None:
+        particle_data = RmanParticleData(psys)
+
+    mask = particle_data.valid_mask(valid_frames)
+    location = particle_data.location[mask]
+    P = transform_utils.transform_points_array(inv_mtx, location).reshape(-1)
+    next_P = np.zeros(0, dtype=np.float32)
+    width = np.zeros(0, dtype=np.float32)
+
+    if get_next_P:
+        # calculate the point for the next frame using velocity
+        lifetime = particle_data.lifetime[mask][:, np.newaxis]
+        vel = _safe_divide(particle_data.velocity[mask], lifetime) * rm.scale_velocity_blur
+        next_P = transform_utils.transform_points_array(inv_mtx, location + vel).reshape(-1)
 
-    for pa in [p for p in psys.particles if valid_particle(p, valid_frames)]:
-        pt = inv_mtx @ pa.location
-        P.append(pt)
-        
-        if get_next_P:
-            # calculate the point for the next frame using velocity
-            vel = Vector(pa.velocity / pa.lifetime ) * rm.scale_velocity_blur
-            next_P.append( inv_mtx @ (Vector(pa.location) + vel))
-
-        if get_width:
-            if pa.alive_state != 'ALIVE':
-                width.append(0.0)
-            else:
-                width.append(pa.size)
-    return (P, next_P, width)    
-
-def get_primvars_particle(primvar, frame, psys, subframes, sample):
+    if get_width:
+        width = np.where(particle_data.alive[mask], particle_data.size[mask], 0.0).astype(np.float32)
+
+    return (P, next_P, width)
+
+def get_primvars_particle(primvar, frame, psys, subframes, sample, particle_data=None):
     rm = psys.settings.renderman
+    if not len(rm.prim_vars):
+        return
+
+    if particle_data is None:
+        particle_data = RmanParticleData(psys)
+    mask = particle_data.valid_mask(subframes)
 
     for p in rm.prim_vars:
-        pvars = []
+        pvars = None
 
         if p.data_source in ('VELOCITY', 'ANGULAR_VELOCITY'):
             if p.data_source == 'VELOCITY':
-                for pa in \
-                        [p for p in psys.particles if valid_particle(p, subframes)]:
-                    pvars.append(pa.velocity)
+                pvars = particle_data.velocity[mask]
             elif p.data_source == 'ANGULAR_VELOCITY':
-                for pa in \
-                        [p for p in psys.particles if valid_particle(p, subframes)]:
-                    pvars.append(pa.angular_velocity)
+                pvars = particle_data.angular_velocity[mask]
 
-            primvar.SetVectorDetail(p.name, pvars, "vertex", sample)
+            pvars = np.ascontiguousarray(pvars).reshape(-1)
+            primvar.SetVectorDetail(p.name, pvars.data, "vertex", sample)
 
         elif p.data_source in \
                 ('SIZE', 'AGE', 'BIRTH_TIME', 'DIE_TIME', 'LIFE_TIME', 'ID'):
             if p.data_source == 'SIZE':
-                for pa in \
-                        [p for p in psys.particles if valid_particle(p, subframes)]:
-                    pvars.append(pa.size)
+                pvars = particle_data.size[mask]
             elif p.data_source == 'AGE':
-                for pa in \
-                        [p for p in psys.particles if valid_particle(p, subframes)]:
-                    pvars.append((frame - pa.birth_time) / pa.lifetime)
+                pvars = _safe_divide(frame - particle_data.birth_time[mask], particle_data.lifetime[mask])
             elif p.data_source == 'BIRTH_TIME':
-                for pa in \
-                        [p for p in psys.particles if valid_particle(p, subframes)]:
-                    pvars.append(pa.birth_time)
+                pvars = particle_data.birth_time[mask]
             elif p.data_source == 'DIE_TIME':
-                for pa in \
-                        [p for p in psys.particles if valid_particle(p, subframes)]:
-                    pvars.append(pa.die_time)
+                pvars = particle_data.die_time[mask]
             elif p.data_source == 'LIFE_TIME':
-                for pa in \
-                        [p for p in psys.particles if valid_particle(p, subframes)]:
-                    pvars.append(pa.lifetime)
+                pvars = particle_data.lifetime[mask]
             elif p.data_source == 'ID':
-                pvars = [id for id, p in psys.particles.items(
-                ) if valid_particle(p, subframes)]
-            
-            primvar.SetFloatDetail(p.name, pvars, "vertex", sample)  
\ No newline at end of file
+                pvars = np.flatnonzero(mask).astype(np.float32)
+
+            pvars = np.ascontiguousarray(pvars, dtype=np.float32)
+            primvar.SetFloatDetail(p.name, pvars.data, "vertex", sample)
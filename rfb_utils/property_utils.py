@@ -48,15 +48,30 @@ __LOBES_ENABLE_PARAMS__ = [
     'enableGlow',
 ]
 
-class BlPropInfo:
+__PARAM_EXPORT_PLANS__ = dict()
+
+class RmanParamExportInfo:
+    '''
+    The parts of a parameter's description that only depend on its meta data,
+    and are therefore the same for every node of the same class. These are
+    computed once per node class (see get_param_export_plan), so that exporting
+    a node only has to look at the current values and connections.
+
+    Attributes:
+        export_kind (str) - how the parameter gets exported: 'ui_struct', 'ui_struct_member',
+                            'displaymetadata', 'array', 'ramp' or 'value'
+        can_export (bool) - False if the parameter is never exported
+        link_only (bool) - True if the parameter is only exported when it's connected
+        is_array (bool) - whether this is an array parameter
+        array_len (int) - the array size, -1 if not an array
+    '''
 
-    def __init__(self, node, prop_name, prop_meta):
+    def __init__(self, prop_name, prop_meta):
 
         from . import shadergraph_utils
 
         self.prop_meta = prop_meta
         self.prop_name = prop_name
-        self.prop = getattr(node, prop_name, None)
         self.renderman_name = prop_meta.get('renderman_name', prop_name)
         self.param_name = self.renderman_name
         self.vstructmember = prop_meta.get('vstructmember', None)
@@ -65,8 +80,6 @@ class BlPropInfo:
         self.read_only = prop_meta.get('readOnly', False)
         self.not_connectable = prop_meta.get('__noconnection', True)
         self.widget = prop_meta.get('widget', 'default')
-        self.prop_hidden = getattr(node, '%s_hidden' % prop_name, False)
-        self.prop_disabled = getattr(node, '%s_disabled' % prop_name, False)
         self.conditionalVisOps = prop_meta.get('conditionalVisOps', dict())
         self.cond_expr = self.conditionalVisOps.get('expr', None)
         self.conditionalLockOps = prop_meta.get('conditionalLockOps', dict())
@@ -81,6 +94,90 @@ class BlPropInfo:
         self.options = prop_meta.get('options', list())
         self.is_ui_struct = prop_meta.get('is_ui_struct', False)
         self.ui_struct = prop_meta.get('ui_struct', None)
+        self.is_texture = shadergraph_utils.is_texture_property(prop_name, prop_meta)
+
+        self.is_array = False
+        self.array_len = -1
+        if self.arraySize:
+            self.is_array = True
+            self.array_len = int(self.arraySize)
+
+        if self.is_ui_struct:
+            self.export_kind = 'ui_struct'
+        elif self.ui_struct:
+            self.export_kind = 'ui_struct_member'
+        elif self.widget == 'displaymetadata':
+            self.export_kind = 'displaymetadata'
+        elif self.renderman_type == 'array':
+            self.export_kind = 'array'
+        elif self.renderman_type in ['colorramp', 'floatramp']:
+            self.export_kind = 'ramp'
+        else:
+            self.export_kind = 'value'
+
+        self.link_only = self.param_type in ['struct', 'enum']
+        self.can_export = self._can_export()
+
+    def _can_export(self):
+        # the checks in BlPropInfo.is_exportable that don't
+        # depend on the param being connected
+        if self.widget == 'null' and not self.vstructmember:
+            return False
+        if self.hide_input:
+            return False
+        if self.param_type == 'page':
+            return False
+        if self.prop_name == 'inputMaterial' or \
+            (self.vstruct is True) or (self.type == 'vstruct'):
+            return False
+        return True
+
+def generate_param_export_plan(prop_meta):
+    '''
+    Build the export plan for a node class. This is the list of RmanParamExportInfo
+    for the params in prop_meta that can be exported, in prop_meta order. ui_struct
+    members are left out, as they are exported with their ui_struct.
+
+    Arguments:
+        prop_meta (dict) - the prop_meta of the node class
+
+    Returns:
+        (list) - list of RmanParamExportInfo
+    '''
+    plan = list()
+    for prop_name, meta in prop_meta.items():
+        param_info = RmanParamExportInfo(prop_name, meta)
+        if not param_info.can_export or param_info.export_kind == 'ui_struct_member':
+            continue
+        plan.append(param_info)
+    return plan
+
+def get_param_export_plan(node):
+    '''
+    Get the export plan for node. Node classes generated by generate_node_type
+    carry their plan in rman_param_export_plan. For any other class with a prop_meta,
+    the plan is generated the first time it's asked for.
+    '''
+    plan = getattr(node, 'rman_param_export_plan', None)
+    if plan is None:
+        node_type = type(node)
+        plan = __PARAM_EXPORT_PLANS__.get(node_type, None)
+        if plan is None:
+            plan = generate_param_export_plan(node.prop_meta)
+            __PARAM_EXPORT_PLANS__[node_type] = plan
+    return plan
+
+class BlPropInfo:
+
+    def __init__(self, node, prop_name, prop_meta, param_info=None):
+
+        if param_info is None:
+            param_info = RmanParamExportInfo(prop_name, prop_meta)
+        self.__dict__.update(param_info.__dict__)
+
+        self.prop = getattr(node, prop_name, None)
+        self.prop_hidden = getattr(node, '%s_hidden' % prop_name, False)
+        self.prop_disabled = getattr(node, '%s_disabled' % prop_name, False)
 
         inputs = getattr(node, 'inputs', dict())
         self.has_input = (prop_name in inputs)
@@ -102,26 +199,15 @@ class BlPropInfo:
         if not self.is_linked:
             self.is_vstruct_and_linked = is_vstruct_and_linked(node, prop_name)
 
-        self.is_texture = shadergraph_utils.is_texture_property(prop_name, prop_meta)
         self.do_export = self.is_exportable()
 
     def is_exportable(self):
         # check if this param needs to be exported.
 
-        if self.widget == 'null' and not self.vstructmember:
-            # if widget is marked null, don't export parameter and rely on default
-            # unless it has a vstructmember
-            return False
-        if self.hide_input:
-            return False
-        if self.param_type == 'page':
+        if not self.can_export:
             return False
 
-        if not self.is_linked and self.param_type in ['struct', 'enum']:
-            return False
-
-        if self.prop_name == 'inputMaterial' or \
-            (self.vstruct is True) or (self.type == 'vstruct'):
+        if not self.is_linked and self.link_only:
             return False
 
         return True
@@ -972,41 +1058,41 @@ def set_node_rixparams(node, rman_sg_node, params, ob=None, mat_name=None, group
         set_pxrosl_params(node, rman_sg_node, params, ob=ob, mat_name=mat_name)
         return params
 
-    for prop_name, meta in node.prop_meta.items():
-        bl_prop_info = BlPropInfo(node, prop_name, meta)
-        param_widget = bl_prop_info.widget 
-        param_type = bl_prop_info.renderman_type 
-        param_name = bl_prop_info.renderman_name      
-        is_linked = bl_prop_info.is_linked
-        prop = bl_prop_info.prop
-        is_array = False 
-        array_len = -1
-        if bl_prop_info.arraySize:
-            is_array = True
-            array_len = int(bl_prop_info.arraySize)        
-
-        if not bl_prop_info.do_export:
-            continue
+    inputs = getattr(node, 'inputs', dict())
+    for param_info in get_param_export_plan(node):
+        prop_name = param_info.prop_name
+        export_kind = param_info.export_kind
+        param_type = param_info.renderman_type
+        param_name = param_info.renderman_name
+        is_array = param_info.is_array
+        array_len = param_info.array_len
+
+        if param_info.link_only:
+            # struct and enum params are only exported when they are connected
+            socket = inputs.get(prop_name, None)
+            if socket is None or not socket.is_linked:
+                continue
 
-        if bl_prop_info.is_ui_struct:
+        if export_kind == 'ui_struct':
             array_len = getattr(node, '%s_arraylen' % prop_name)
             if array_len > 0:
                 set_ui_struct_rixparams(node, rman_sg_node, prop_name, params, ob=ob, mat_name=mat_name, group_node=group_node)
             continue
-        elif bl_prop_info.ui_struct:
-            # Skip if this is a ui_struct member. This should be taken care of above
-            # in set_ui_struct_rix_params
-            continue      
-        elif param_widget == 'displaymetadata':
+        elif export_kind == 'displaymetadata':
             set_dspymeta_params(node, prop_name, params)
             continue
+
+        bl_prop_info = BlPropInfo(node, prop_name, param_info.prop_meta, param_info=param_info)
+        is_linked = bl_prop_info.is_linked
+        prop = bl_prop_info.prop
+
         # array
-        elif param_type == 'array':
+        if export_kind == 'array':
             # this is a regular array
             set_array_rixparams(node, rman_sg_node, mat_name, bl_prop_info, prop_name, prop, params)
             continue
         # ramps
-        elif param_type in ['colorramp', 'floatramp']:
+        elif export_kind == 'ramp':
             set_ramp_rixparams(node, prop_name, prop, param_type, params)        
             continue
        
@@ -0,0 +1,160 @@
+from . import mesh_utils
+from . import object_utils
+from . import scene_utils
+from . import shadergraph_utils
+from . import json_file
+from ..rfb_logger import rfb_log
+import numpy as np
+import os
+
+MANIFEST_NAME = 'manifest.json'
+
+class RibArchiveManifest:
+    '''
+    Record of the per-object RIB archives written during an incremental
+    RIB export. The manifest is saved next to the archives, so a resumed export
+    can skip writing archives that are already up to date.
+
+    Attributes:
+        archive_dir (str) - directory the archives are written to
+        entries (dict) - archive name -> {'digest': str, 'path': str}
+    '''
+
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self.entries = dict()
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self.load()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.archive_dir, MANIFEST_NAME)
+
+    def load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        try:
+            self.entries = json_file.load(self.manifest_path)
+        except (OSError, ValueError) as e:
+            rfb_log().warning("Could not read RIB archive manifest %s: %s" % (self.manifest_path, str(e)))
+            self.entries = dict()
+
+    def save(self):
+        # other RIB export workers may have added archives since we loaded
+        # the manifest, so merge our entries with the ones on disk
+        entries = self.entries
+        self.load()
+        self.entries.update(entries)
+        tmp_path = '%s.%d.tmp' % (self.manifest_path, os.getpid())
+        json_file.save(self.entries, tmp_path)
+        os.replace(tmp_path, self.manifest_path)
+
+    def get_archive_path(self, name, digest):
+        '''
+        Get the path of the archive for the given name and digest. The digest is
+        part of the file name, so frames that were written against an older
+        version of the archive still reference a valid file.
+        '''
+        return os.path.join(self.archive_dir, '%s.%s.rib' % (name, digest))
+
+    def is_current(self, name, digest):
+        '''
+        Return True if an archive with this digest has already been written.
+        '''
+        entry = self.entries.get(name, None)
+        if not entry or entry['digest'] != digest:
+            return False
+        return os.path.exists(entry['path'])
+
+    def set(self, name, digest, path):
+        self.entries[name] = {'digest': digest, 'path': path}
+
+def can_archive(ob, scene):
+    '''
+    Check if an object is static enough to be written into a shared RIB archive.
+    Only non-animated meshes without particle systems are archived, everything else
+    is written into each frame.
+    '''
+    if ob.type != 'MESH' or object_utils._detect_primitive_(ob) != 'MESH':
+        return False
+    if ob.particle_systems:
+        return False
+    if object_utils.is_transforming(ob):
+        return False
+    return not object_utils._is_deforming_(ob, scene)
+
+def _get_mesh_attribute_values(ob, mesh):
+    # the mesh attributes (UVs, colors, creases, etc.) and vertex group
+    # weights that primvars can be exported from
+    from ..rman_translators.rman_mesh_translator import _get_mesh_vgroups_
+
+    values = list()
+    for attr in mesh.attributes:
+        if attr.name.startswith('.'):
+            # internal attributes (selection, hidden, etc.)
+            continue
+        values.append((attr.name, attr.domain, attr.data_type))
+        rman_attr = scene_utils.BlAttribute.parse_attribute(attr, dict())
+        if rman_attr:
+            values.append(rman_attr.values)
+    if ob.vertex_groups:
+        values.append(tuple(ob.vertex_groups.keys()))
+        values.append(_get_mesh_vgroups_(ob, mesh))
+    return values
+
+def get_archive_digest(ob, depsgraph):
+    '''
+    Compute the content digest used to decide if an object's archive can
+    be reused. This covers everything that gets written into the archive: 
+    the world transform, the evaluated mesh and its attributes, the object's
+    RenderMan properties and the shading networks of the materials assigned
+    to the object.
+
+    Arguments:
+        ob (bpy.types.Object) - evaluated mesh object
+        depsgraph (bpy.types.Depsgraph) - the depsgraph ob was evaluated in
+
+    Returns:
+        (str) - hex digest
+    '''
+    mesh = ob.data
+    rman_mesh = mesh_utils.get_mesh(mesh, get_normals=True)
+    material_ids = np.zeros(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get('material_index', material_ids)
+    smooth = np.zeros(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get('use_smooth', smooth)
+    mtx = np.array(ob.matrix_world, dtype=np.float32)
+
+    mats = list()
+    for slot in ob.material_slots:
+        if slot.material:
+            mat = slot.material.evaluated_get(depsgraph)
+            mats.append((mat.name_full, shadergraph_utils.get_material_digest(mat)))
+        else:
+            mats.append(None)
+
+    digest = mesh_utils.get_digest(mtx, rman_mesh.P, rman_mesh.verts, rman_mesh.nverts, rman_mesh.N,
+                                   material_ids, smooth, mats, ob.renderman.primitive,
+                                   shadergraph_utils.get_properties_digest(ob.original.renderman),
+                                   shadergraph_utils.get_properties_digest(ob.original.data.renderman),
+                                   *_get_mesh_attribute_values(ob, mesh))
+    return digest.hex()
+
+def get_archive_bounds(ob):
+    '''
+    Get the world space bounding box of an object, to use as the bound
+    of the procedural that reads its archive.
+
+    Arguments:
+        ob (bpy.types.Object) - evaluated object
+
+    Returns:
+        (tuple) - (xmin, xmax, ymin, ymax, zmin, zmax)
+    '''
+    mtx = np.array(ob.matrix_world, dtype=np.float32)
+    corners = np.array(ob.bound_box, dtype=np.float32)
+    corners = corners @ mtx[:3, :3].T + mtx[:3, 3]
+    bmin = corners.min(axis=0)
+    bmax = corners.max(axis=0)
+    return (float(bmin[0]), float(bmax[0]), float(bmin[1]),
+            float(bmax[1]), float(bmin[2]), float(bmax[2]))
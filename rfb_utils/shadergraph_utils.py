@@ -34,6 +34,9 @@ class RmanConvertNode:
         if type(other) != RmanConvertNode:
             return False
         return (self.node_type == other.node_type and self.from_node == other.from_node and self.from_socket == other.from_socket and self.to_node == other.to_node and self.to_socket == other.to_socket)
+
+    def __hash__(self):
+        return hash((self.node_type, self.from_node, self.from_socket, self.to_node, self.to_socket))
     
 def find_blimage_nodes(nt):
     '''
@@ -478,11 +481,66 @@ def find_node_input(node, name):
 
     return None
 
+def _gather_node_steps(node, for_solo_node, nodes, seen):
+    # generator that yields each node connected to node's inputs, in input order,
+    # so the caller can visit it first, and then adds any conversion nodes needed
+    # for that connection. Finally, node itself is added, once all of its inputs
+    # have been visited.
+    for socket in node.inputs:
+        if not socket.is_linked:
+            continue
+        link = socket.links[0]
+        from_node = link.from_node
+        if for_solo_node and from_node.bl_idname == "NodeGroupInput":
+            # for solo nodes, if the current node we are looking at is a NodeGroupInput
+            # we know we are inside a NodeGroup.
+            # we need to do some special handling here because we don't want to stop
+            # collecting nodes when we hit a NodeGroupInput node, we need to look
+            # for connected nodes on the "outside". So we get the NodeGroup node, where
+            # these inner nodes belong to.
+
+            # we don't need to do this for regular, non-solo node networks because
+            # we already do a gather for NodeGroup nodes in RmanMaterialTranslator's
+            # translate_node_group method
+            from_node = get_group_node(from_node)
+        yield from_node
+
+        if node.bl_idname == 'NodeReroute':
+            continue
+
+        if link.from_node.bl_idname == 'NodeReroute':
+            # if the from node is a reroute node
+            # look for the incoming node
+            while from_node.bl_idname == 'NodeReroute':
+                link = from_node.inputs[0].links[0]
+                from_node = link.from_node
+
+        # if this is a float->float3 type or float3->float connections, insert
+        # either PxrToFloat3 or PxrToFloat conversion nodes
+        convert_node = None
+        if is_socket_float_type(link.from_socket) and is_socket_float3_type(socket):
+            convert_node = RmanConvertNode('PxrToFloat3', link.from_node, link.from_socket, link.to_node, link.to_socket)
+        elif is_socket_float3_type(link.from_socket) and is_socket_float_type(socket):
+            convert_node = RmanConvertNode('PxrToFloat', link.from_node, link.from_socket, link.to_node, link.to_socket)
+        if convert_node and convert_node not in seen:
+            seen.add(convert_node)
+            nodes.append(convert_node)
+
+    if hasattr(node, 'renderman_node_type') and node.renderman_node_type != 'output':
+        nodes.append(node)
+    elif not hasattr(node, 'renderman_node_type') and node.bl_idname not in ['ShaderNodeOutputMaterial', 'NodeGroupInput', 'NodeGroupOutput']:
+        nodes.append(node)
+
 # walk the tree for nodes to export
 def gather_nodes(node, for_solo_node=False):
     '''gather all of the nodes that are connected
     to the given node
 
+    The network is walked depth first, in input order, and each node is only visited
+    once, so shared sub-networks are not walked again for every path that leads to them.
+    Nodes are returned in topological order: every node comes after all of the nodes
+    connected to its inputs.
+
     Arguments:        
         node (byp.types.Node) - the input node we are interested in
         for_solo_node (bool) - whether we are looking for connected nodes for a solo node
@@ -492,59 +550,184 @@ def gather_nodes(node, for_solo_node=False):
     '''
 
     nodes = []
+    seen = set()
+    visited = {node}
+    # use an explicit stack, rather than recursion, so long chains of
+    # nodes don't hit Python's recursion limit
+    stack = [_gather_node_steps(node, for_solo_node, nodes, seen)]
+    while stack:
+        try:
+            from_node = next(stack[-1])
+        except StopIteration:
+            stack.pop()
+            continue
+        if from_node in visited:
+            continue
+        visited.add(from_node)
+        stack.append(_gather_node_steps(from_node, for_solo_node, nodes, seen))
+
+    return nodes    
+
+__NODE_UI_PROPS__ = None
+
+def _get_node_ui_props():
+    # properties that every shader node has (location, select, parent, etc.)
+    # These don't change what gets exported, so are left out of network digests.
+    # Inputs and outputs are dealt with separately.
+    global __NODE_UI_PROPS__
+    if __NODE_UI_PROPS__ is None:
+        __NODE_UI_PROPS__ = set(bpy.types.ShaderNode.bl_rna.properties.keys())
+    return __NODE_UI_PROPS__
+
+__ID_PROPS__ = None
+
+def _get_id_props():
+    # properties that every ID has (name, users, session_uid, etc.)
+    # These are either not exported or not stable between sessions.
+    global __ID_PROPS__
+    if __ID_PROPS__ is None:
+        __ID_PROPS__ = set(bpy.types.ID.bl_rna.properties.keys())
+    return __ID_PROPS__
+
+def _to_digest_value(val):
+    # convert arrays (bpy_prop_array, mathutils types) to tuples
+    # and enum flag sets to sorted tuples, so they have a stable repr()
+    if isinstance(val, (str, int, float)):
+        return val
+    if isinstance(val, set):
+        return tuple(sorted(val))
+    try:
+        return tuple(_to_digest_value(v) for v in val)
+    except TypeError:
+        return val
+
+def _get_struct_digest_values(struct, values, depth, skip=()):
+    for prop in struct.bl_rna.properties:
+        prop_name = prop.identifier
+        if prop_name == 'rna_type' or prop_name in skip:
+            continue
+        val = getattr(struct, prop_name, None)
+        if prop.type == 'POINTER':
+            if val is None:
+                values.append((prop_name, None))
+            elif isinstance(val, bpy.types.ID):
+                values.append((prop_name, val.name_full, getattr(val, 'filepath', '')))
+            elif depth > 0:
+                _get_struct_digest_values(val, values, depth-1)
+        elif prop.type == 'COLLECTION':
+            if depth > 0:
+                values.append((prop_name, len(val)))
+                for item in val:
+                    _get_struct_digest_values(item, values, depth-1)
+        elif prop.type == 'STRING':
+            values.append((prop_name, string_utils.expand_string(val)))
+        else:
+            values.append((prop_name, _to_digest_value(val)))
+
+def _get_node_digest_values(mat, node, values):
+    from . import texture_utils
+
+    if isinstance(node, RmanConvertNode):
+        values.append((node.node_type, node.from_node.name, node.from_socket.identifier,
+                        node.to_node.name, node.to_socket.identifier))
+        return
+
+    values.append((node.bl_idname, node.name))
+    prop_meta = getattr(node, 'prop_meta', None)
+
+    # txm_id and the names of the ramp nodes are different for every copy
+    # of a node, so leave them out. The ramps are added below.
+    skip = set(_get_node_ui_props())
+    skip.add('txm_id')
+    if prop_meta:
+        skip.update(nm for nm, meta in prop_meta.items() if meta.get('renderman_type', '') in ['colorramp', 'floatramp'])
+    _get_struct_digest_values(node, values, 3, skip=skip)
+
     for socket in node.inputs:
         if socket.is_linked:
             link = socket.links[0]
-            from_node = link.from_node
-            if for_solo_node and from_node.bl_idname == "NodeGroupInput":
-                # for solo nodes, if the current node we are looking at is a NodeGroupInput
-                # we know we are inside a NodeGroup.
-                # we need to do some special handling here because we don't want to stop
-                # collecting nodes when we hit a NodeGroupInput node, we need to look
-                # for connected nodes on the "outside". So we get the NodeGroup node, where
-                # these inner nodes belong to.
-
-                # we don't need to do this for regular, non-solo node networks because
-                # we already do a gather for NodeGroup nodes in RmanMaterialTranslator's
-                # translate_node_group method
-                from_node = get_group_node(from_node)
-            for sub_node in gather_nodes(from_node, for_solo_node=for_solo_node):
-                if sub_node not in nodes:
-                    nodes.append(sub_node)
+            values.append((socket.identifier, link.from_node.name, link.from_socket.identifier))
+        elif hasattr(socket, 'default_value'):
+            values.append((socket.identifier, _to_digest_value(socket.default_value)))
+
+    if prop_meta:
+        for prop_name, meta in prop_meta.items():
+            param_type = meta.get('renderman_type', '')
+            if param_type in ['colorramp', 'floatramp']:
+                # ramps are stored on nodes in our fake node group
+                nt = node.rman_fake_node_group_ptr
+                ramp_node = nt.nodes.get(getattr(node, prop_name), None) if nt else None
+                if ramp_node:
+                    _get_struct_digest_values(ramp_node, values, 3, skip=_get_node_ui_props())
+            elif param_type == 'string' and is_texture_property(prop_name, meta):
+                param_name = meta.get('renderman_name', prop_name)
+                val = string_utils.expand_string(getattr(node, prop_name))
+                tx_val = texture_utils.get_txmanager().lookup_output_tex_from_path(node, param_name, val, ob=mat)
+                values.append((prop_name, tx_val))
+
+    if node.bl_idname == 'ShaderNodeGroup' and node.node_tree:
+        out = next((n for n in node.node_tree.nodes if n.bl_idname == 'NodeGroupOutput'), None)
+        if out:
+            for n in gather_nodes(out):
+                _get_node_digest_values(mat, n, values)
+
+def get_network_digest(mat, nodes, *extra_values):
+    '''
+    Compute a structural digest of a shading network. This covers the node
+    types and names, parameter values, connections and the output paths of
+    any textures the network references. Frame dependent strings are expanded,
+    so the digest changes if the network needs to be re-exported on a frame change.
 
-            
-            if node.bl_idname == 'NodeReroute':
-                continue
+    Arguments:
+        mat (bpy.types.Material) - the material the network belongs to
+        nodes (list) - the nodes in the network, as returned by gather_nodes
+        extra_values - any other values the exported network depends on
 
-            if link.from_node.bl_idname == 'NodeReroute':
-                # if the from node is a reroute node
-                # look for the incoming node
-                found = False
-                while found is False:
-                    incoming_socket = from_node.inputs[0]
-                    link = incoming_socket.links[0]
-                    from_node = link.from_node
-                    if from_node.bl_idname == 'NodeReroute':
-                        continue
-                    found = True
-            
-            # if this is a float->float3 type or float3->float connections, insert
-            # either PxrToFloat3 or PxrToFloat conversion nodes         
-            if is_socket_float_type(link.from_socket) and is_socket_float3_type(socket):
-                convert_node = RmanConvertNode('PxrToFloat3', link.from_node, link.from_socket, link.to_node, link.to_socket)
-                if convert_node not in nodes:
-                    nodes.append(convert_node)
-            elif is_socket_float3_type(link.from_socket) and is_socket_float_type(socket):
-                convert_node = RmanConvertNode('PxrToFloat', link.from_node, link.from_socket, link.to_node, link.to_socket)
-                if convert_node not in nodes:
-                    nodes.append(convert_node)
+    Returns:
+        (bytes) - the digest
+    '''
+    from . import mesh_utils
 
-    if hasattr(node, 'renderman_node_type') and node.renderman_node_type != 'output':
-        nodes.append(node)
-    elif not hasattr(node, 'renderman_node_type') and node.bl_idname not in ['ShaderNodeOutputMaterial', 'NodeGroupInput', 'NodeGroupOutput']:
-        nodes.append(node)
+    values = list(extra_values)
+    for node in nodes:
+        _get_node_digest_values(mat, node, values)
+    return mesh_utils.get_digest(*values)
 
-    return nodes    
+def get_properties_digest(struct, depth=3):
+    '''
+    Compute a digest of the property values of a Blender struct, ex: an
+    object's RenderMan properties. Pointers to other structs and collections
+    are followed up to depth levels deep.
+
+    Arguments:
+        struct (bpy_struct) - the struct to digest
+        depth (int) - how many levels of pointers and collections to follow
+
+    Returns:
+        (bytes) - the digest
+    '''
+    from . import mesh_utils
+
+    values = list()
+    _get_struct_digest_values(struct, values, depth)
+    return mesh_utils.get_digest(*values)
+
+def get_material_digest(mat):
+    '''
+    Compute a digest of everything that gets exported for a material. This covers
+    every node in the material's node tree, as well as the material's own properties
+    (ex: the viewport display color used when there is no RenderMan node tree).
+
+    Arguments:
+        mat (bpy.types.Material) - the material
+
+    Returns:
+        (bytes) - the digest
+    '''
+    values = list()
+    _get_struct_digest_values(mat, values, 3, skip=_get_id_props())
+    nodes = list(mat.node_tree.nodes) if mat.node_tree else list()
+    return get_network_digest(mat, nodes, *values)
 
 def gather_all_textured_nodes(ob, nodes_list):   
     nt = None
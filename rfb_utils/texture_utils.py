@@ -73,6 +73,10 @@ class RfBTxManager(object):
                                         )
         self.rman_scene = None
 
+        # textures that finished converting, waiting to be
+        # sent to the scene by flush_textures_updated
+        self.pending_textures = dict()
+
     @property
     def rman_scene(self):
         return self.__rman_scene
@@ -104,19 +108,42 @@ class RfBTxManager(object):
 
     def done_callback(self, nodeID, txfile):
         def tex_done():
-            try:
-                # try and refresh the texture manager UI
-                bpy.ops.rman_txmgr_list.refresh('EXEC_DEFAULT')
-            except:
-                pass
-            from .. import rman_render
-            output_texture = self.get_output_tex(txfile)
-            rr = rman_render.RmanRender.get_rman_render()
-            rr.rman_scene_sync.flush_texture_cache([output_texture])
-            rr.rman_scene_sync.texture_updated(nodeID)
+            # textures tend to finish converting in bursts, so collect them
+            # and send them to the scene together from a timer
+            if not self.pending_textures:
+                bpy.app.timers.register(self.flush_textures_updated, first_interval=0.1)
+            self.pending_textures[nodeID] = txfile
             
         return tex_done    
 
+    def flush_textures_updated(self):
+        txfiles = self.pending_textures
+        self.pending_textures = dict()
+        if txfiles:
+            self.textures_updated(txfiles)
+        # returning None unregisters the timer
+        return None
+
+    def textures_updated(self, txfiles):
+        '''
+        Notify the scene that textures have been updated. The texture cache
+        is flushed for all of the textures in a single scene edit.
+
+        Arguments:
+            txfiles (dict) - nodeID -> TxFile
+        '''
+        try:
+            # try and refresh the texture manager UI
+            bpy.ops.rman_txmgr_list.refresh('EXEC_DEFAULT')
+        except:
+            pass
+        from .. import rman_render
+        output_textures = [self.get_output_tex(txfile) for txfile in txfiles.values()]
+        rr = rman_render.RmanRender.get_rman_render()
+        rr.rman_scene_sync.flush_texture_cache(output_textures)
+        for nodeID in txfiles.keys():
+            rr.rman_scene_sync.texture_updated(nodeID)
+
     def get_output_tex(self, txfile):
         '''
         Get the real output texture path given a TxFile 
@@ -155,6 +182,19 @@ class RfBTxManager(object):
 
         return file_path
         
+    def lookup_output_tex_from_path(self, node, param_name, file_path, ob=None):
+        '''
+        Same as get_output_tex_from_path, but never adds the texture
+        to the texture manager. Returns file_path if the texture manager
+        doesn't know about this texture yet.
+        '''
+        node_name = generate_node_name(node, param_name, ob=ob)
+        plug_uuid = self.txmanager.get_plug_id(node_name, param_name)
+        txfile = self.txmanager.get_txfile_from_id(plug_uuid)
+        if txfile:
+            return self.get_output_tex(txfile)
+        return file_path
+
     def get_output_tex_from_id(self, nodeID):
         '''
         Get the real output texture path given a nodeID
@@ -204,6 +244,51 @@ class RfBTxManager(object):
                         if ociconvert:
                             update_txfile_colorspace(txfile, ociconvert)
 
+    def add_textures(self, entries):
+        '''
+        Register a batch of textures with the texture manager. This is the
+        batched version of add_texture: the texture manager UI list is
+        refreshed once and the txmake queue is started once. The scene is
+        notified as the textures finish converting (see done_callback).
+
+        Arguments:
+            entries (list) - list of (nodeID, file_path, node_type, category, colorspace)
+                             tuples, see update_texture
+
+        Returns:
+            (list) - the nodeIDs of the textures that were added
+        '''
+        from ..rman_ui import rman_ui_txmanager
+
+        txfiles = dict()
+        removed = list()
+        for nodeID, file_path, node_type, category, colorspace in entries:
+            txfile = self.txmanager.get_txfile_from_id(nodeID)
+            if file_path == "":
+                if txfile:
+                    self.txmanager.remove_texture(nodeID)
+                    removed.append(nodeID)
+                continue
+            if txfile and txfile.input_image == file_path:
+                continue
+            self.txmanager.add_texture(nodeID, file_path, nodetype=node_type, category=category)
+            txfile = self.txmanager.get_txfile_from_id(nodeID)
+            if not txfile:
+                continue
+            txfiles[nodeID] = txfile
+            if colorspace and not txfile.source_is_tex():
+                set_txfile_colorspace(txfile, colorspace)
+
+        if not txfiles and not removed:
+            return list()
+
+        rman_txmgr_list = bpy.context.scene.rman_txmgr_list
+        for nodeID in removed:
+            bpy.ops.rman_txmgr_list.remove_texture('EXEC_DEFAULT', nodeID=nodeID)
+        rman_ui_txmanager.add_txmgr_list_items(rman_txmgr_list, txfiles.keys())
+        self.txmake_all(blocking=False)
+        return list(txfiles.keys())
+
     def is_file_src_tex(self, node, prop_name):
         id = scene_utils.find_node_owner(node)
         nodeID = generate_node_id(node, prop_name, ob=id)
@@ -248,7 +333,12 @@ def get_txmanager():
         __RFB_TXMANAGER__ = RfBTxManager()
     return __RFB_TXMANAGER__    
 
-def update_texture(node, ob=None, check_exists=False, is_library=False):
+def update_texture(node, ob=None, check_exists=False, is_library=False, batch=None):
+    '''
+    Add the textures for node to the texture manager. If batch is a list,
+    the textures are appended to it as (nodeID, file_path, node_type, category, colorspace)
+    tuples instead, to be registered later with RfBTxManager.add_textures.
+    '''
     bl_idname = getattr(node, 'bl_idname', '')
     if bl_idname == "PxrOSLPatternNode":
         for input_name, input in node.inputs.items():
@@ -256,13 +346,16 @@ def update_texture(node, ob=None, check_exists=False, is_library=False):
                 prop = input.default_value
                 nodeID = generate_node_id(node, input_name)
                 real_file = filepath_utils.get_real_path(prop)
+                if batch is not None:
+                    batch.append((nodeID, real_file, 'PxrTexture', 'pattern', ''))
+                    continue
                 get_txmanager().txmanager.add_texture(nodeID, real_file)    
                 bpy.ops.rman_txmgr_list.add_texture('EXEC_DEFAULT', filepath=real_file, nodeID=nodeID)                                                      
         return
     elif node.bl_idname == 'ShaderNodeGroup':
         nt = node.node_tree
         for node in nt.nodes:
-            update_texture(node, ob=ob)
+            update_texture(node, ob=ob, batch=batch)
         return
 
     prop_meta = getattr(node, 'prop_meta', dict())
@@ -301,11 +394,20 @@ def update_texture(node, ob=None, check_exists=False, is_library=False):
             fpath = fpath.replace('<udim>', '<UDIM>')
 
         category = getattr(node, 'renderman_node_type', 'pattern') 
+        if batch is not None:
+            nodeID = generate_node_id(node, prop_name, ob=ob)
+            colorspace = getattr(node, '%s_colorspace' % prop_name, '')
+            batch.append((nodeID, fpath, node_type, category, colorspace))
+            continue
         get_txmanager().add_texture(node, ob, prop_name, fpath, node_type=node_type, category=category)        
 
-def update_txfile_colorspace(txfile, ociconvert, blocking=False):
+def set_txfile_colorspace(txfile, ociconvert):
+    '''
+    Set the ocioconvert param of txfile, without starting txmake.
+    Returns True if the texture needs to be re-made.
+    '''
     if ociconvert == '0':
-        return
+        return False
     params = txfile.params.as_dict()     
     if params['ocioconvert'] != ociconvert:
         params['ocioconvert'] = ociconvert
@@ -314,7 +416,12 @@ def update_txfile_colorspace(txfile, ociconvert, blocking=False):
         txfile.build_texture_dict()
         if txfile.check_dirty(force_check=True):
             txfile.delete_texture_files()            
-            get_txmanager().txmake_all(blocking=blocking)                 
+            return True
+    return False
+
+def update_txfile_colorspace(txfile, ociconvert, blocking=False):
+    if set_txfile_colorspace(txfile, ociconvert):
+        get_txmanager().txmake_all(blocking=blocking)                 
 
 def generate_node_name(node, prop_name, ob=None, nm=None):
     node_name = ''
@@ -345,7 +452,7 @@ def generate_node_id(node, prop_name, ob=None):
     plug_uuid = get_txmanager().txmanager.get_plug_id(node_name, prop_name)
     return plug_uuid
 
-def get_textures(id, check_exists=False, mat=None):
+def get_textures(id, check_exists=False, mat=None, batch=None):
     if id is None or not id.node_tree:
         return
 
@@ -360,7 +467,7 @@ def get_textures(id, check_exists=False, mat=None):
     elif hasattr(id, 'library_weak_reference') and id.library_weak_reference:
         is_library = True
     for node in nodes_list:
-        update_texture(node, ob=ob, check_exists=check_exists, is_library=is_library)
+        update_texture(node, ob=ob, check_exists=check_exists, is_library=is_library, batch=batch)
 
 def get_blender_image_path(bl_image):
     if bl_image.packed_file:
@@ -386,6 +493,10 @@ def parse_scene_for_textures(bl_scene=None):
 
     #add_images_from_image_editor()
 
+    # collect all of the textures first, so they can be
+    # registered with the texture manager in one go
+    batch = list()
+
     if bl_scene:
         for o in scene_utils.renderable_objects(bl_scene):
             is_library = False
@@ -398,25 +509,27 @@ def parse_scene_for_textures(bl_scene=None):
             elif o.type == 'CAMERA':
                 node = shadergraph_utils.find_projection_node(o) 
                 if node:
-                    update_texture(node, ob=o, is_library=is_library)
+                    update_texture(node, ob=o, is_library=is_library, batch=batch)
             elif o.type == 'LIGHT':
                 node = o.data.renderman.get_light_node()
                 if node:
-                    update_texture(node, ob=o, is_library=is_library)
+                    update_texture(node, ob=o, is_library=is_library, batch=batch)
    
     for world in bpy.data.worlds:
         if not world.use_nodes:
             continue
         node = shadergraph_utils.find_integrator_node(world)
         if node:
-            update_texture(node, ob=world)
+            update_texture(node, ob=world, batch=batch)
         for node in shadergraph_utils.find_displayfilter_nodes(world):
-            update_texture(node, ob=world)
+            update_texture(node, ob=world, batch=batch)
         for node in shadergraph_utils.find_samplefilter_nodes(world):
-            update_texture(node, ob=world)            
+            update_texture(node, ob=world, batch=batch)            
  
     for mat in bpy.data.materials:
-        get_textures(mat)
+        get_textures(mat, batch=batch)
+
+    get_txmanager().add_textures(batch)
             
 def parse_for_textures(bl_scene):    
     rfb_log().debug("Parsing scene for textures.")                                   
@@ -1,4 +1,5 @@
 import rman
+import numpy as np
 from mathutils import Matrix,Vector
 
 def convert_matrix(m):
@@ -81,4 +82,30 @@ def transform_points(transform_mtx, P):
         transform_pts.append(pt.y)
         transform_pts.append(pt.z)
 
-    return transform_pts 
\ No newline at end of file
+    return transform_pts
+
+def transform_points_array(transform_mtx, P, row_vector=False):
+    '''
+    Transform an array of points by a 4x4 matrix using numpy, instead of 
+    creating a mathutils.Vector for each point.
+
+    Args:
+    transform_mtx (mathutils.Matrix) - the 4x4 matrix to transform by
+    P (numpy.ndarray) - (npoints, 3) array of points
+    row_vector (bool) - multiply the points as row vectors, i.e.: the 
+                        equivalent of Vector(p) @ transform_mtx, instead of
+                        transform_mtx @ Vector(p)
+
+    Returns:
+    (numpy.ndarray) - (npoints, 3) float32 array of the transformed points
+    '''
+    m = np.array(transform_mtx, dtype=np.float32)
+    if row_vector:
+        rot = m[:3, :3]
+        offset = m[3, :3]
+    else:
+        rot = m[:3, :3].T
+        offset = m[:3, 3]
+    out = np.asarray(P, dtype=np.float32) @ rot
+    out += offset
+    return out
@@ -2,6 +2,7 @@ from ..rfb_utils.rfb_node_desc_utils.rfb_node_desc import RfbNodeDesc
 from ..rfb_utils import filepath_utils
 from ..rfb_utils.filepath import FilePath
 from ..rfb_utils import generate_property_utils
+from ..rfb_utils import property_utils
 from ..rfb_utils.property_callbacks import *
 from ..rfb_utils.rman_socket_utils import node_add_inputs
 from ..rfb_utils.rman_socket_utils import node_add_outputs
@@ -565,6 +566,9 @@ def generate_node_type(node_desc, is_oso=False):
                 default=has_textured_params)        
 
     class_generate_properties(ntype, name, node_desc)
+    # precompute which params get exported, and how, so that
+    # set_node_rixparams only needs to look at current values and links
+    ntype.rman_param_export_plan = property_utils.generate_param_export_plan(ntype.prop_meta)
     if nodeType == 'light':
         ntype.__annotations__['light_primary_visibility'] = BoolProperty(
             name="Light Primary Visibility",
@@ -624,6 +628,7 @@ def generate_node_type(node_desc, is_oso=False):
                     default=has_textured_params)                                                
                 
         class_generate_properties(osl_node_type, name, node_desc)
+        osl_node_type.rman_param_export_plan = property_utils.generate_param_export_plan(osl_node_type.prop_meta)
         register_utils.rman_register_class(osl_node_type)
 
     return (typename, ntype)
@@ -12,6 +12,7 @@ from .rman_constants import (
 from .rman_scene import RmanScene
 from .rman_scene_sync import RmanSceneSync
 from. import rman_spool
+from. import rman_rib_workers
 from. import chatserver
 from .rfb_logger import rfb_log
 import socketserver
@@ -37,6 +38,8 @@ from .rfb_utils import scene_utils
 from .rfb_utils import render_utils
 from .rfb_utils.render_utils import RmanRenderContext
 from .rfb_utils import transform_utils
+from .rfb_utils import object_utils
+from .rfb_utils import rib_archive_utils
 from .rfb_utils.prefs_utils import get_pref
 from .rfb_utils.timer_utils import time_this
 
@@ -54,6 +57,10 @@ from .rman_denoiser import RmanDenoiser
 RMAN_RENDER = None
 RMAN_IT_PORT = -1
 BLENDER_DSPY_PLUGIN = None
+# code reference: https://asiffer.github.io/posts/numpy/
+RMAN_NUMPY_POINTER = numpy.ctypeslib.ndpointer(dtype=numpy.float32, 
+                                      ndim=1,
+                                      flags="C")
 D_QUICKLYNOISELESS = None
 DRAW_THREAD = None
 RMAN_STATS_THREAD = None
@@ -694,6 +701,83 @@ class BlRenderResultHelper:
                         filepath = '%s.%s' % (toks[0], ext)                            
                         img.Save(filepath, img_format)        
 
+class RmanViewportFramebuffer(object):
+    '''
+    Holds onto the pixel buffer and texture used to draw the viewport, 
+    so that they can be reused between redraws. Everything is reallocated
+    when the viewport is resized.
+
+    Attributes:
+        width (int) - width of the buffer
+        height (int) - height of the buffer
+        num_channels (int) - number of channels in the buffer
+        buffer (numpy.ndarray) - flat float32 pixel buffer, filled in by the display driver
+        pixels (gpu.types.Buffer) - GPU buffer that shares its memory with buffer, if 
+                                    gpu.types.Buffer supports the buffer protocol
+        texture (gpu.types.GPUTexture) - the last texture created from the buffer
+        needs_full_copy (bool) - the buffer was just allocated, and all of the pixels need to be fetched
+        generation (int) - the display driver buffer generation of the pixels in buffer
+        region (tuple) - the region (xmin, xmax, ymin, ymax) of the buffer that changed on the last 
+                         fetch, or None if nothing changed
+    '''
+
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.num_channels = 0
+        self.buffer = None
+        self.pixels = None
+        self.texture = None
+        self.needs_full_copy = True
+        self.region = None
+        self.generation = 0
+
+    def invalidate(self):
+        self.width = 0
+        self.height = 0
+        self.num_channels = 0
+        self.buffer = None
+        self.pixels = None
+        self.texture = None
+        self.needs_full_copy = True
+        self.region = None
+        self.generation = 0
+
+    def get_buffer(self, width, height, num_channels):
+        if self.buffer is None or (width, height, num_channels) != (self.width, self.height, self.num_channels):
+            self.invalidate()
+            size = width * height * num_channels
+            try:
+                # write directly into the memory of the GPU buffer
+                self.pixels = gpu.types.Buffer('FLOAT', size)
+                self.buffer = numpy.frombuffer(self.pixels, dtype=numpy.float32)
+                if not self.buffer.flags.writeable:
+                    raise ValueError("gpu.types.Buffer is not writeable")
+                self.buffer.fill(0.0)
+            except (TypeError, ValueError, BufferError):
+                self.pixels = None
+                self.buffer = numpy.zeros(size, dtype=numpy.float32)
+            self.width = width
+            self.height = height
+            self.num_channels = num_channels
+            self.needs_full_copy = True
+
+        # callers are allowed to reshape the buffer
+        self.buffer.shape = (-1)
+        return self.buffer
+
+    def update_texture(self, buffer):
+        '''
+        Create a texture from buffer. buffer should be the RGBA buffer returned 
+        by RmanRender._get_buffer.
+        '''
+        if self.pixels is not None and buffer is self.buffer and self.num_channels == 4:
+            pixels = self.pixels
+        else:
+            pixels = gpu.types.Buffer('FLOAT', self.width * self.height * 4, buffer)
+        self.texture = gpu.types.GPUTexture((self.width, self.height), format='RGBA32F', data=pixels)
+        return self.texture
+
 class RmanRender(object):
     '''
     RmanRender class. This class is responsible for starting and stopping
@@ -734,6 +818,14 @@ class RmanRender(object):
         self.bl_rr_helper = None
 
         self.bufer_is_zero = False
+        self.viewport_framebuffer = RmanViewportFramebuffer()
+
+        # this process is a background worker for a
+        # frame parallel RIB export (see rman_rib_workers)
+        self.rib_export_worker = False
+
+        # set if the last call to start_external_render failed
+        self.rib_export_failed = False
 
         # hold onto this or python will unload it
         self.preloaded_dsos = list()
@@ -1105,6 +1197,8 @@ class RmanRender(object):
         return True   
 
     def start_external_render(self, depsgraph):  
+        # cleared again when the export finishes successfully
+        self.rib_export_failed = True
         if self._do_prman_render_begin():
             return False        
 
@@ -1131,8 +1225,33 @@ class RmanRender(object):
             do_persistent_data = rm.do_persistent_data
             rfb_log().debug("Writing to RIB...")     
             time_start = time.time()
-
-            if do_persistent_data:
+            num_workers = rm.rib_export_workers
+            if num_workers > 1 and not self.rib_export_worker and not bpy.data.is_saved:
+                rfb_log().warning("The blend file needs to be saved to export RIB with multiple workers. Exporting in this process instead.")
+                num_workers = 1
+            elif num_workers > 1 and not self.rib_export_worker and bpy.data.is_dirty:
+                rfb_log().warning("RIB export workers use the saved blend file, which has unsaved changes. Exporting in this process instead.")
+                num_workers = 1
+
+            if num_workers > 1 and not self.rib_export_worker:
+                self.rman_scene.set_bl_scene(depsgraph)
+                workers = rman_rib_workers.RmanRibExportWorkers(self, depsgraph, num_workers)
+                if not workers.run():
+                    self.bl_engine.report({'ERROR'}, 'Export failed. See the log for details.')
+                    self.stop_render(stop_draw_thread=False)
+                    self.del_bl_engine()
+                    return False
+            elif rm.rib_incremental_archives:
+                try:
+                    self._export_incremental_rib(depsgraph, rib_options)
+                except Exception as e:      
+                    self.bl_engine.report({'ERROR'}, 'Export failed: %s' % str(e))
+                    rfb_log().error('Export Failed:\n%s' % traceback.format_exc())
+                    self.rman_scene.rib_archives = dict()
+                    self.stop_render(stop_draw_thread=False)
+                    self.del_bl_engine()
+                    return False
+            elif do_persistent_data:
                         
                 for frame in range(bl_scene.frame_start, bl_scene.frame_end + 1, bl_scene.frame_step):
                     bl_view_layer = depsgraph.view_layer_eval
@@ -1236,13 +1355,87 @@ class RmanRender(object):
                 self.del_bl_engine()
                 return False                         
 
-        spooler = rman_spool.RmanSpool(self, self.rman_scene, depsgraph)
-        spooler.batch_render()
+        if not self.rib_export_worker:
+            spooler = rman_spool.RmanSpool(self, self.rman_scene, depsgraph)
+            spooler.batch_render()
         self.rman_context.stop()
         self.del_bl_engine()
         self._do_prman_render_end()
+        self.rib_export_failed = False
         return True          
 
+    def _write_rib_archive(self, depsgraph, ob, archive_path, rib_options):
+        config = rman.Types.RtParamList()
+        render_config = rman.Types.RtParamList()
+        self.create_scene(config, render_config)
+        rfb_log().debug("Writing RIB archive: %s" % archive_path)
+        self.rman_scene.export_for_rib_archive(depsgraph, self.sg_scene, depsgraph.view_layer_eval, [ob])
+        # write to a temporary file first, in case another RIB export
+        # worker is writing the same archive
+        tmp_path = '%s.%d.tmp' % (archive_path, os.getpid())
+        self.sg_scene.Render("rib %s %s -archive" % (tmp_path, rib_options))
+        self.sgmngr.DeleteScene(self.sg_scene)
+        self.sg_scene = None
+        self.rman_scene.reset()
+        os.replace(tmp_path, archive_path)
+
+    def _export_incremental_rib(self, depsgraph, rib_options):
+        '''
+        Export each frame of the animation to RIB. Static objects are written into
+        shared per-object RIB archives, which are referenced from each frame's RIB.
+        Archives are only written when their content digest changes. A manifest
+        next to the archives allows a resumed export to skip archives that
+        are already up to date.
+        '''
+        bl_scene = depsgraph.scene_eval
+        rm = bl_scene.renderman
+        manifest = None
+        num_written = 0
+
+        for frame in range(bl_scene.frame_start, bl_scene.frame_end + 1, bl_scene.frame_step):
+            bl_view_layer = depsgraph.view_layer_eval
+            self.bl_engine.frame_set(frame, subframe=0.0)
+            rfb_log().debug("Frame: %d" % frame)
+            rib_output = string_utils.expand_string(rm.path_rib_output, 
+                                                    asFilePath=True)
+            if manifest is None:
+                manifest = rib_archive_utils.RibArchiveManifest(os.path.join(os.path.dirname(rib_output), 'archives'))
+
+            rib_archives = dict()
+            manifest_dirty = False
+            for ob_inst in depsgraph.object_instances:
+                if ob_inst.is_instance:
+                    continue
+                ob = ob_inst.object
+                if not rib_archive_utils.can_archive(ob, bl_scene):
+                    continue
+                name = object_utils.get_db_name(ob)
+                digest = rib_archive_utils.get_archive_digest(ob, depsgraph)
+                archive_path = manifest.get_archive_path(name, digest)
+                if not manifest.is_current(name, digest):
+                    self._write_rib_archive(depsgraph, ob.original, archive_path, rib_options)
+                    manifest.set(name, digest, archive_path)
+                    manifest_dirty = True
+                    num_written += 1
+                rib_archives[ob.original] = archive_path
+            if manifest_dirty:
+                manifest.save()
+
+            config = rman.Types.RtParamList()
+            render_config = rman.Types.RtParamList()
+            self.create_scene(config, render_config)
+            self.rman_scene.rib_archives = rib_archives
+            self.rman_context.set_render_state(RmanRenderContext.k_render_state_exporting)
+            self.rman_scene.export_for_final_render(depsgraph, self.sg_scene, bl_view_layer)
+            self.rman_context.set_render_state(RmanRenderContext.k_render_state_rendering)
+            self.sg_scene.Render("rib %s %s" % (rib_output, rib_options))
+            self.sgmngr.DeleteScene(self.sg_scene)
+            self.sg_scene = None
+            self.rman_scene.rib_archives = dict()
+            self.rman_scene.reset()
+
+        rfb_log().debug("Wrote %d RIB archives" % num_written)
+
     def start_bake_render(self, depsgraph, for_background=False):
         self.reset()
         if self._do_prman_render_begin():
@@ -1745,6 +1938,7 @@ class RmanRender(object):
         #self.stats_mgr.reset()
         self.rman_scene.reset()
         self.viewport_buckets.clear()
+        self.viewport_framebuffer.invalidate()
         self._draw_viewport_buckets = False                
         __update_areas__()
         self.stop_render_mtx.release()
@@ -1759,6 +1953,20 @@ class RmanRender(object):
             if RFB_PLATFORM == "windows":
                     ext = '.dll'
             BLENDER_DSPY_PLUGIN = ctypes.CDLL(os.path.join(envconfig().rmantree, 'lib', 'plugins', 'd_blender%s' % ext))
+            BLENDER_DSPY_PLUGIN.GetFloatFramebuffer.argtypes = [ctypes.c_size_t, ctypes.c_size_t, RMAN_NUMPY_POINTER]
+            try:
+                f = BLENDER_DSPY_PLUGIN.GetFloatFramebufferRegion
+                f.argtypes = [ctypes.c_size_t, ctypes.c_size_t, RMAN_NUMPY_POINTER, ctypes.c_bool, ctypes.POINTER(ctypes.c_int)]
+                f.restype = ctypes.c_bool
+            except AttributeError:
+                # older display driver
+                rfb_log().debug("d_blender does not support GetFloatFramebufferRegion")
+            try:
+                f = BLENDER_DSPY_PLUGIN.GetBufferGeneration
+                f.argtypes = [ctypes.c_size_t]
+                f.restype = ctypes.c_uint64
+            except AttributeError:
+                rfb_log().debug("d_blender does not support GetBufferGeneration")
 
         return BLENDER_DSPY_PLUGIN
 
@@ -1779,10 +1987,26 @@ class RmanRender(object):
         dspy_plugin = self.get_blender_dspy_plugin()
         dspy_plugin.SetRedrawCallback(None)        
 
+    def get_buffer_generation(self, image_num=0):
+        """Return the generation of the display driver's pixel buffer. The generation
+        changes every time new pixels arrive, and is 0 if there are no pixels yet.
+
+        Returns:
+        (int) - the buffer generation, or None if the display driver does not support it
+        """
+        dspy_plugin = self.get_blender_dspy_plugin()
+        f = getattr(dspy_plugin, 'GetBufferGeneration', None)
+        if not f:
+            return None
+        return f(ctypes.c_size_t(image_num))
+
     def has_buffer_updated(self):        
         if RFB_PLATFORM == "macOS":
             # for now, always return True on macOS
             return True               
+        generation = self.get_buffer_generation()
+        if generation is not None:
+            return generation != self.viewport_framebuffer.generation
         dspy_plugin = self.get_blender_dspy_plugin()
         return dspy_plugin.HasBufferUpdated()      
 
@@ -1801,18 +2025,35 @@ class RmanRender(object):
         res_mult = self.rman_scene.viewport_render_res_mult
         width = int(self.viewport_res_x * res_mult)
         height = int(self.viewport_res_y * res_mult)
-        buffer = self._get_buffer(width, height, num_channels=4)
-        if buffer is None:
-            rfb_log().debug("Buffer is None")
-            return
-        self.bufer_is_zero = numpy.all(buffer == 0.0)
-        if self.bufer_is_zero:
-            rfb_log().debug("Buffer is all zero")
+        framebuffer = self.viewport_framebuffer
+        generation = self.get_buffer_generation()
+        if generation == 0:
+            # no pixels have arrived yet
+            self.bufer_is_zero = True
             return
 
-        pixels = gpu.types.Buffer('FLOAT', width * height * 4, buffer)
+        texture = framebuffer.texture
+        if texture is None or generation is None or generation != framebuffer.generation or \
+                (width, height) != (framebuffer.width, framebuffer.height):
+            buffer = self._get_buffer(width, height, num_channels=4, framebuffer=framebuffer)
+            if buffer is None:
+                rfb_log().debug("Buffer is None")
+                return
 
-        texture = gpu.types.GPUTexture((width, height), format='RGBA32F', data=pixels)
+            if framebuffer.region is None and framebuffer.texture is not None:
+                # nothing has changed since the last redraw
+                texture = framebuffer.texture
+            else:
+                if generation is None:
+                    # the display driver can't tell us if there are pixels
+                    self.bufer_is_zero = numpy.all(buffer == 0.0)
+                    if self.bufer_is_zero:
+                        rfb_log().debug("Buffer is all zero")
+                        return
+                texture = framebuffer.update_texture(buffer)
+            if generation is not None:
+                framebuffer.generation = generation
+        self.bufer_is_zero = False
         draw_texture_2d(texture, (0, 0), self.viewport_res_x, self.viewport_res_y)          
 
         if BLENDER_41:
@@ -1887,18 +2128,27 @@ class RmanRender(object):
         num_channels = dspy_plugin.GetNumberOfChannels(ctypes.c_size_t(image_num))
         return num_channels
     
-    def _get_buffer_from_dspy_plugin(self, width, height, image_num, num_channels):
+    def _get_buffer_from_dspy_plugin(self, width, height, image_num, num_channels, framebuffer=None):
         dspy_plugin = self.get_blender_dspy_plugin()
 
-        # code reference: https://asiffer.github.io/posts/numpy/
-        RMAN_NUMPY_POINTER = numpy.ctypeslib.ndpointer(dtype=numpy.float32, 
-                                      ndim=1,
-                                      flags="C")
         f = dspy_plugin.GetFloatFramebuffer
-        f.argtypes = [ctypes.c_size_t, ctypes.c_size_t, RMAN_NUMPY_POINTER]        
         try:
-            array_size = width * height * num_channels
-            buffer = numpy.zeros(array_size, dtype=numpy.float32)
+            if framebuffer:
+                buffer = framebuffer.get_buffer(width, height, num_channels)
+                f_region = getattr(dspy_plugin, 'GetFloatFramebufferRegion', None)
+                if f_region:
+                    # only copy the pixels that have changed since the last fetch
+                    region = (ctypes.c_int * 4)()
+                    if f_region(ctypes.c_size_t(image_num), buffer.size, buffer, framebuffer.needs_full_copy, region):
+                        framebuffer.region = tuple(region)
+                        framebuffer.needs_full_copy = False
+                    else:
+                        framebuffer.region = None
+                    return buffer
+                framebuffer.region = (0, width, 0, height)
+            else:
+                array_size = width * height * num_channels
+                buffer = numpy.zeros(array_size, dtype=numpy.float32)
             f(ctypes.c_size_t(image_num), buffer.size, buffer)  
             return buffer  
         except Exception as e:
@@ -1968,7 +2218,7 @@ class RmanRender(object):
 
         return all_passes
 
-    def _get_buffer(self, width, height, image_num=0, num_channels=-1, raw_buffer=False, as_flat=True, render=None, render_border=None):
+    def _get_buffer(self, width, height, image_num=0, num_channels=-1, raw_buffer=False, as_flat=True, render=None, render_border=None, framebuffer=None):
         """Return a numpy array of the selected image's pixel buffer from the display driver
 
         Args:
@@ -1981,6 +2231,8 @@ class RmanRender(object):
         as_flat (bool) - whether the buffer should be returned as 1D array or 2D array 
         render (bpy.types.RenderSettings) - current scene's render settings; needed to figure out
         if we need to resize the buffer because of render borders
+        framebuffer (RmanViewportFramebuffer) - if set, reuse the pixel buffer held by framebuffer
+        instead of allocating a new one
 
         Returns:
         (numpy.ndarray) - pixel buffer
@@ -1993,7 +2245,7 @@ class RmanRender(object):
         if num_channels == -1:
             num_channels = dspy_num_channels   
         try:
-            buffer = self._get_buffer_from_dspy_plugin(width, height, image_num, dspy_num_channels)
+            buffer = self._get_buffer_from_dspy_plugin(width, height, image_num, dspy_num_channels, framebuffer=framebuffer)
 
             if raw_buffer:
                 if not as_flat:
@@ -0,0 +1,189 @@
+import subprocess
+import sys
+import os
+import time
+import bpy
+from .rfb_utils import string_utils
+from .rfb_utils import json_file
+from .rfb_logger import rfb_log
+
+MANIFEST_NAME = 'rib_export_job.json'
+
+__WORKER_SCRIPT__ = '''
+import sys
+from %s.rman_rib_workers import run_worker
+argv = sys.argv[sys.argv.index('--') + 1:]
+run_worker(argv[0], int(argv[1]))
+''' % __package__
+
+def get_frame_ranges(frames, num_workers):
+    '''
+    Split frames into num_workers disjoint, contiguous ranges of frames.
+
+    Arguments:
+        frames (list) - the frames to export
+        num_workers (int) - the number of workers
+
+    Returns:
+        (list) - list of frame lists, one for each worker that has any frames
+    '''
+    num_workers = max(1, min(num_workers, len(frames)))
+    chunk, extra = divmod(len(frames), num_workers)
+    ranges = []
+    start = 0
+    for i in range(num_workers):
+        end = start + chunk + (1 if i < extra else 0)
+        ranges.append(frames[start:end])
+        start = end
+    return [r for r in ranges if r]
+
+def _write_status(status_file, data):
+    # write to a temporary file first, so the coordinator never
+    # reads a partially written file
+    tmp_file = '%s.tmp' % status_file
+    json_file.save(data, tmp_file)
+    os.replace(tmp_file, status_file)
+
+def run_worker(manifest_path, worker_index):
+    '''
+    Entry point for a background Blender worker process. Exports
+    this worker's frames to RIB, and records the last frame started
+    in the worker's status file.
+
+    Arguments:
+        manifest_path (str) - path to the job manifest
+        worker_index (int) - index of this worker in the manifest
+    '''
+    from .rman_render import RmanRender
+
+    manifest = json_file.load(manifest_path)
+    worker = manifest['workers'][worker_index]
+    frames = worker['frames']
+    status_file = worker['status_file']
+
+    bl_scene = bpy.data.scenes[manifest['scene']]
+    rm = bl_scene.renderman
+    bl_scene.frame_start = frames[0]
+    bl_scene.frame_end = frames[-1]
+    rm.enable_external_rendering = True
+    rm.external_animation = True
+    rm.rib_export_workers = 1
+
+    # the version and take tokens may have been incremented
+    # since the blend file was saved
+    rm.version_token = manifest['version_token']
+    string_utils.set_var('version', rm.version_token)
+    rm.take_token = manifest['take_token']
+    string_utils.set_var('take', rm.take_token)
+
+    def frame_changed(scene, depsgraph=None):
+        _write_status(status_file, {'frame': scene.frame_current})
+    bpy.app.handlers.frame_change_post.append(frame_changed)
+
+    # the coordinator takes care of spooling
+    rman_render = RmanRender.get_rman_render()
+    rman_render.rib_export_worker = True
+    bpy.ops.render.render(layer=manifest['view_layer'], scene=bl_scene.name)
+    if rman_render.rib_export_failed:
+        rfb_log().error("RIB export failed for frames %d-%d" % (frames[0], frames[-1]))
+        sys.exit(1)
+    _write_status(status_file, {'frame': frames[-1], 'done': True})
+
+class RmanRibExportWorkers(object):
+    '''
+    Export the frames of an animation to RIB in parallel, using background Blender
+    processes that each export a disjoint range of frames from the saved blend file.
+    The workers are coordinated with a job manifest written next to the RIB files,
+    which lists the frames for each worker and the status file each worker
+    updates as it goes.
+
+    Attributes:
+        rman_render (RmanRender) - pointer back to the current RmanRender object
+        bl_scene (bpy.types.Scene) - the Blender scene being exported
+        num_workers (int) - the number of worker processes to launch
+    '''
+
+    def __init__(self, rman_render, depsgraph, num_workers):
+        self.rman_render = rman_render
+        self.bl_scene = depsgraph.scene_eval
+        self.bl_view_layer = depsgraph.view_layer_eval
+        self.num_workers = num_workers
+
+    def write_manifest(self, frames):
+        rm = self.bl_scene.renderman
+        rib_output = string_utils.expand_string(rm.path_rib_output, frame=frames[0], asFilePath=True)
+        job_dir = os.path.dirname(rib_output)
+        if not os.path.exists(job_dir):
+            os.makedirs(job_dir)
+
+        manifest_path = os.path.join(job_dir, MANIFEST_NAME)
+        workers = []
+        for i, worker_frames in enumerate(get_frame_ranges(frames, self.num_workers)):
+            status_file = os.path.join(job_dir, 'rib_export_worker%d.json' % i)
+            if os.path.exists(status_file):
+                os.remove(status_file)
+            workers.append({'frames': worker_frames, 'status_file': status_file})
+        manifest = {
+            'blend_file': bpy.data.filepath,
+            'scene': self.bl_scene.name,
+            'view_layer': self.bl_view_layer.name,
+            'version_token': rm.version_token,
+            'take_token': rm.take_token,
+            'workers': workers
+        }
+        json_file.save(manifest, manifest_path)
+        return manifest_path, manifest
+
+    def get_num_frames_done(self, worker, proc):
+        frames = worker['frames']
+        if proc.poll() == 0:
+            return len(frames)
+        if not os.path.exists(worker['status_file']):
+            return 0
+        try:
+            status = json_file.load(worker['status_file'])
+        except (OSError, ValueError):
+            return 0
+        if status.get('done', False):
+            return len(frames)
+        # the current frame is still being exported
+        frame = status.get('frame', frames[0])
+        return frames.index(frame) if frame in frames else 0
+
+    def run(self):
+        '''
+        Launch the workers and wait for them to finish.
+
+        Returns:
+            (bool) - True if all of the workers succeeded
+        '''
+        frames = list(range(self.bl_scene.frame_start, self.bl_scene.frame_end + 1, self.bl_scene.frame_step))
+        manifest_path, manifest = self.write_manifest(frames)
+        procs = []
+        for i, worker in enumerate(manifest['workers']):
+            args = [bpy.app.binary_path, '-b', manifest['blend_file'], '--python-exit-code', '1',
+                    '--python-expr', __WORKER_SCRIPT__, '--', manifest_path, str(i)]
+            rfb_log().debug("Launching RIB export worker %d for frames %d-%d" % (i, worker['frames'][0], worker['frames'][-1]))
+            procs.append(subprocess.Popen(args))
+
+        total = len(frames)
+        stats_mgr = self.rman_render.stats_mgr
+        bl_engine = self.rman_render.bl_engine
+        while any(proc.poll() is None for proc in procs):
+            if bl_engine and bl_engine.test_break():
+                rfb_log().info("Cancelling RIB export workers")
+                for proc in procs:
+                    if proc.poll() is None:
+                        proc.terminate()
+                return False
+            done = sum(self.get_num_frames_done(w, p) for w, p in zip(manifest['workers'], procs))
+            stats_mgr.set_export_stats("Exporting RIB (%d/%d frames)" % (done, total), done / total)
+            time.sleep(0.5)
+
+        failed = [i for i, proc in enumerate(procs) if proc.returncode != 0]
+        for i in failed:
+            worker = manifest['workers'][i]
+            rfb_log().error("RIB export worker %d (frames %d-%d) failed with exit code %d" %
+                            (i, worker['frames'][0], worker['frames'][-1], procs[i].returncode))
+        stats_mgr.set_export_stats("Finished Export", 1.0)
+        return not failed
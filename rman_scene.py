@@ -40,6 +40,7 @@ from .rfb_utils.prefs_utils import get_pref
 from .rfb_utils import shadergraph_utils
 from .rfb_utils import color_manager_blender
 from .rfb_utils import scenegraph_utils
+from .rfb_utils import rib_archive_utils
 
 # config
 from .rman_config import __RFB_CONFIG_DICT__ as rfb_config
@@ -51,6 +52,8 @@ from .rman_sg_nodes.rman_sg_node import RmanSgNode
 import bpy
 import os
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 class RmanScene(object):
     '''
@@ -73,6 +76,8 @@ class RmanScene(object):
         is_viewport_render (bool) - whether we are rendering into Blender's viewport
         scene_solo_light (bool) - user has solo'd a light (all other lights are muted)
         rman_materials (dict) - dictionary of scene's materials
+        rman_shared_materials (dict) - share digest -> RmanSgMaterial. When share_identical_materials is on,
+                                    materials with identical shading networks all point at one RmanSgMaterial.
         rman_translators (dict) - dictionary of all RmanTranslator(s)
         rman_particles (dict) - dictionary of all particle systems used
         rman_cameras (dict) - dictionary of all cameras in the scene
@@ -92,6 +97,16 @@ class RmanScene(object):
         num_objects_in_viewlayer (int) - the current number of objects in the current view layer. We're using this
                                        to keep track if an object was removed from a collection
         objects_in_viewlayer (list) - the list of objects (bpy.types.Object) in this view layer.
+        rman_instance_index (dict) - persistent index of object name -> prototype key -> set of group db names.
+                                    This is used during IPR to resolve edits, adds and deletes without walking
+                                    every instance in the depsgraph. Instances are recorded under the object that
+                                    owns them: the object itself, or the instancer (ex: particle instancer). Objects
+                                    that don't get instances (ex: empties) are recorded with no group db names.
+        rman_instanced_objects (set) - names of the objects that are instanced by other objects
+        rib_archives (dict) - objects -> RIB archive paths. During incremental RIB exports, these objects
+                                    are not exported, and their archives are referenced instead.
+        meta_family_index (dict) - metaball family name -> list of (bpy.types.MetaBall, owner bpy.types.Object).
+                                    This is built once per export, the first time a metaball family is exported.
     '''
 
     def __init__(self, rman_render=None):
@@ -110,12 +125,15 @@ class RmanScene(object):
         self.scene_any_lights = False
 
         self.rman_materials = dict()
+        self.rman_shared_materials = dict()
         self.rman_translators = dict()
         self.rman_particles = dict()
         self.rman_cameras = dict()
         self.obj_hash = dict()
         self.moving_objects = dict()
         self.rman_prototypes = dict()
+        self.meta_family_index = None
+        self.rib_archives = dict()
 
         self.motion_steps = set()
         self.main_camera = None
@@ -129,6 +147,8 @@ class RmanScene(object):
         self.num_object_instances = 0
         self.num_objects_in_viewlayer = 0
         self.objects_in_viewlayer = list()
+        self.rman_instance_index = dict()
+        self.rman_instanced_objects = set()
 
         self.ipr_render_into = 'blender'
 
@@ -210,6 +230,7 @@ class RmanScene(object):
     def reset(self):
         # clear out dictionaries etc.
         self.rman_materials.clear()
+        self.rman_shared_materials.clear()
         self.rman_particles.clear()
         self.rman_cameras.clear()
         self.obj_hash.clear()
@@ -224,6 +245,10 @@ class RmanScene(object):
         self.num_object_instances = 0
         self.num_objects_in_viewlayer = 0
         self.objects_in_viewlayer.clear()
+        self.rman_instance_index.clear()
+        self.rman_instanced_objects.clear()
+        self.meta_family_index = None
+        self.rman_translators['GPENCIL'].clear_layer_frame_cache()
 
         try:
             if self.is_viewport_render:
@@ -288,6 +313,30 @@ class RmanScene(object):
         self.export_materials([m for m in self.depsgraph.ids if isinstance(m, bpy.types.Material)])
         self.export_data_blocks(selected_objects=True)
 
+    def export_for_rib_archive(self, depsgraph, sg_scene, bl_view_layer, objects_list):
+        '''
+        Export only the objects in objects_list, along with their materials, 
+        so that they can be written out as a RIB archive.
+        '''
+        self.reset()
+        self.sg_scene = sg_scene
+        self.context = bpy.context
+        self.bl_scene = depsgraph.scene_eval
+        self.bl_frame_current = self.bl_scene.frame_current
+        self.bl_view_layer = bl_view_layer
+        self._find_renderman_layer()
+        self.depsgraph = depsgraph
+        self.do_motion_blur = False
+
+        self.export_root_sg_node()
+        materials = set()
+        for ob in objects_list:
+            for slot in ob.material_slots:
+                if slot.material:
+                    materials.add(slot.material.evaluated_get(depsgraph))
+        self.export_materials(list(materials))
+        return self.export_data_blocks(objects_list=objects_list)
+
     def export_for_swatch_render(self, depsgraph, sg_scene):
         self.sg_scene = sg_scene
         self.context = bpy.context #None
@@ -327,6 +376,7 @@ class RmanScene(object):
         rfb_log().debug("Calling export_data_blocks()")
         if not self.export_data_blocks():
             return False
+        self.export_rib_archives()
 
         self.export_searchpaths()
         self.export_global_options()
@@ -583,12 +633,90 @@ class RmanScene(object):
         return self.sg_scene.Root()
 
     def export_materials(self, materials):
+        share_materials = self.bl_scene.renderman.share_identical_materials
         for mat in materials:
+            if share_materials and self.export_shared_material(mat):
+                continue
             db_name = object_utils.get_db_name(mat)
             rman_sg_material = self.rman_translators['MATERIAL'].export(mat.original, db_name)
             if rman_sg_material:
                 self.rman_materials[mat.original] = rman_sg_material
 
+    def get_material_db_name(self, mat):
+        '''
+        Get a db_name for mat that isn't used by any other exported material.
+        A shared material keeps the db_name of the material that was translated
+        first, even after that material stops sharing it, so the material's own
+        db_name may already be taken.
+
+        Arguments:
+            mat (bpy.types.Material) - the material
+
+        Returns:
+            (str) - the db_name
+        '''
+        db_name = object_utils.get_db_name(mat)
+        rman_sg_material = self.rman_materials.get(mat.original, None)
+        taken = set(m.db_name for m in self.rman_materials.values() if m is not rman_sg_material)
+        if db_name not in taken:
+            return db_name
+        i = 1
+        while '%s_%d' % (db_name, i) in taken:
+            i += 1
+        return '%s_%d' % (db_name, i)
+
+    def export_shared_material(self, mat, db_name=None):
+        '''
+        Export a material, sharing the scene graph material with any other material
+        that has identical shading networks. The first material with a given set of
+        networks is translated, every later one just points at the same RmanSgMaterial.
+
+        Arguments:
+            mat (bpy.types.Material) - the material to export
+            db_name (str) - the db_name to translate the material with, if it isn't shared. 
+                            Defaults to the material's db_name.
+
+        Returns:
+            (RmanSgMaterial) - the material, or None if mat cannot be shared
+        '''
+        translator = self.rman_translators['MATERIAL']
+        share_digest = translator.get_share_digest(mat.original)
+        if share_digest is None:
+            return None
+
+        if db_name is None:
+            db_name = object_utils.get_db_name(mat)
+        rman_sg_material = self.rman_shared_materials.get(share_digest, None)
+        if rman_sg_material is None:
+            rman_sg_material = translator.export(mat.original, db_name)
+            rman_sg_material.share_digest = share_digest
+            self.rman_shared_materials[share_digest] = rman_sg_material
+        else:
+            rfb_log().debug("Material %s shares its shading network with %s" % (mat.name, rman_sg_material.db_name))
+        rman_sg_material.users.add(mat.original)
+        self.rman_materials[mat.original] = rman_sg_material
+        return rman_sg_material
+
+    def set_share_digest(self, rman_sg_material, share_digest):
+        '''
+        Change the share digest of a material, after its shading networks have changed.
+        '''
+        if self.rman_shared_materials.get(rman_sg_material.share_digest, None) is rman_sg_material:
+            self.rman_shared_materials.pop(rman_sg_material.share_digest)
+        rman_sg_material.share_digest = share_digest
+        if share_digest is not None and share_digest not in self.rman_shared_materials:
+            self.rman_shared_materials[share_digest] = rman_sg_material
+
+    def release_shared_material(self, mat, rman_sg_material):
+        '''
+        Stop mat from sharing rman_sg_material with other materials.
+        '''
+        rman_sg_material.users.discard(mat.original)
+        if not rman_sg_material.users and self.rman_shared_materials.get(rman_sg_material.share_digest, None) is rman_sg_material:
+            self.rman_shared_materials.pop(rman_sg_material.share_digest)
+        if self.rman_materials.get(mat.original, None) is rman_sg_material:
+            self.rman_materials.pop(mat.original)
+
     def check_visibility(self, instance, ob_eval=None):
         if not self.is_interactive:
             return True
@@ -635,9 +763,39 @@ class RmanScene(object):
             rman_sg_group = rman_group_translator.export(None, group_db_name)
             rman_sg_group.sg_node.AddChild(rman_sg_node.sg_node)       
             rman_sg_node.instances[group_db_name] = rman_sg_group
+            if self.is_interactive:
+                self.index_instance(ob_inst, object_utils.prototype_key(ob_inst), group_db_name)
 
         return rman_sg_group       
 
+    def index_instance(self, ob_inst, proto_key, group_db_name=None):
+        # record the instance under the object that owns it: the object
+        # itself, or the instancing parent. Without a group_db_name, this
+        # only records that the object uses this prototype.
+        if ob_inst.is_instance:
+            ob = ob_inst.parent.original
+            self.rman_instanced_objects.add(ob_inst.instance_object.original.name_full)
+        else:
+            ob = ob_inst.object.original
+        ob_index = self.rman_instance_index.setdefault(ob.name_full, dict())
+        group_db_names = ob_index.setdefault(proto_key, set())
+        if group_db_name:
+            group_db_names.add(group_db_name)
+
+    def get_indexed_instances(self, ob):
+        # return the prototype key -> group db names index for this object,
+        # pruning any entries whose prototype or instance no longer exist
+        ob_index = self.rman_instance_index.get(ob.name_full, None)
+        if ob_index is None:
+            return None
+        for proto_key in list(ob_index):
+            rman_sg_node = self.rman_prototypes.get(proto_key, None)
+            if rman_sg_node is None:
+                del ob_index[proto_key]
+                continue
+            ob_index[proto_key] = set(nm for nm in ob_index[proto_key] if nm in rman_sg_node.instances)
+        return ob_index
+
     def update_instance_attributes(self, translator, rman_sg_node, ob_eval, ob_inst, remove=False): 
         # we want to export attributes for the instance
         # as we still want the instance to be able override attributes        
@@ -731,6 +889,12 @@ class RmanScene(object):
 
 
     def export_data_blocks(self, selected_objects=False, objects_list=False):
+        self.meta_family_index = None
+        if not self.is_interactive and not selected_objects and not objects_list:
+            if not self.export_mesh_prototypes():
+                return False
+
+        is_interactive = self.is_interactive
         total = len(self.depsgraph.object_instances)
         for i, ob_inst in enumerate(self.depsgraph.object_instances):
             if self.cancel_requested():
@@ -754,10 +918,16 @@ class RmanScene(object):
             if objects_list and ob.original not in objects_list:
                 continue
 
+            # this object was written into a RIB archive
+            if not ob_inst.is_instance and ob.original in self.rib_archives:
+                continue
+
             ob_eval = ob.evaluated_get(self.depsgraph)
             psys = None
             instance_parent = None
             proto_key = object_utils.prototype_key(ob_inst)
+            if is_interactive:
+                self.index_instance(ob_inst, proto_key)
             if ob_inst.is_instance:
                 psys = ob_inst.particle_system
                 instance_parent = ob_inst.parent
@@ -778,6 +948,91 @@ class RmanScene(object):
             self.rman_render.stats_mgr.set_export_stats("Exported (%s)" % ob.name,i/total, total) 
         return True
 
+    def export_rib_archives(self):
+        '''
+        Reference the RIB archives for the objects in self.rib_archives.
+        '''
+        for ob, archive_path in self.rib_archives.items():
+            bounds = rib_archive_utils.get_archive_bounds(ob.evaluated_get(self.depsgraph))
+            db_name = '%s-ARCHIVE' % object_utils.get_db_name(ob)
+            sg_node = self.sg_scene.CreateProcedural(db_name)
+            sg_node.Define("DelayedReadArchive", None)
+            primvar = sg_node.GetPrimVars()
+            primvar.SetString(self.rman.Tokens.Rix.k_filename, archive_path)
+            primvar.SetFloatArray(self.rman.Tokens.Rix.k_bound, bounds, 6)
+            sg_node.SetPrimVars(primvar)
+            self.get_root_sg_node().AddChild(sg_node)
+
+    def export_mesh_prototypes(self):
+        '''
+        Export the mesh prototypes in the scene, with the packing of the primvars
+        and the digests running in a thread pool. Blender data is only read on this 
+        thread, and only the Set* calls on the scene graph are made on this thread, 
+        in depsgraph order, inside a single scene graph edit. Meshes are read ahead 
+        of the one being set, up to the rman_export_prefetch_memory budget, so that 
+        processing overlaps with reading and setting.
+
+        Meshes that cannot use the staged export are exported in 
+        export_data_blocks as usual.
+
+        Returns:
+            (bool) - False if the render was cancelled
+        '''
+        num_workers = get_pref('rman_export_workers', 0)
+        if num_workers < 1:
+            num_workers = os.cpu_count() or 1
+        if num_workers < 2:
+            return True
+
+        # the read-ahead window is bounded by the size of the mesh data read, 
+        # not the number of meshes
+        budget = get_pref('rman_export_prefetch_memory', 1024) * 1024 * 1024
+        translator = self.rman_translators['MESH']
+        window = deque()
+        window_bytes = 0
+        visited = set()
+        ret = True
+
+        rfb_log().debug("Exporting mesh prototypes with %d workers" % num_workers)
+        with ThreadPoolExecutor(max_workers=num_workers) as executor, \
+                self.rman.SGManager.ScopedEdit(self.sg_scene):
+            for ob_inst in self.depsgraph.object_instances:
+                if self.cancel_requested():
+                    ret = False
+                    break
+                if ob_inst.is_instance:
+                    continue
+                ob = ob_inst.object
+                if ob.type != 'MESH' or ob.original in self.rib_archives:
+                    continue
+                proto_key = object_utils.prototype_key(ob_inst)
+                if proto_key in visited or proto_key in self.rman_prototypes:
+                    continue
+                visited.add(proto_key)
+
+                ob_eval = ob.evaluated_get(self.depsgraph)
+                if object_utils._detect_primitive_(ob_eval) != 'MESH':
+                    continue
+                nbytes = translator.prefetch(ob_eval, executor)
+                if nbytes is None:
+                    continue
+                window.append((proto_key, ob_eval, nbytes))
+                window_bytes += nbytes
+                while len(window) > 1 and window_bytes > budget:
+                    proto_key, ob_eval, nbytes = window.popleft()
+                    window_bytes -= nbytes
+                    self.export_data_block(proto_key, ob_eval)
+
+            while window and ret:
+                if self.cancel_requested():
+                    ret = False
+                    break
+                proto_key, ob_eval, nbytes = window.popleft()
+                self.export_data_block(proto_key, ob_eval)
+
+        translator.clear_prefetched()
+        return ret
+
     def export_data_block(self, proto_key, ob):
         rman_type = object_utils._detect_primitive_(ob)
 
@@ -997,6 +1252,35 @@ class RmanScene(object):
         num_lights = len(scene_utils.get_all_lights(self.bl_scene, include_light_filters=False))
         return num_lights > 0
 
+    def get_meta_family(self, family):
+        '''
+        Get all of the metaballs that belong to a metaball family. 
+
+        Args:
+            family (str) - the family name (see object_utils.get_meta_family)
+
+        Returns:
+            (list) - list of (bpy.types.MetaBall, bpy.types.Object) tuples, where the object
+                     is the owner of the metaball
+        '''
+        if self.meta_family_index is None:
+            # Metaball datablocks don't have a link back to the object that
+            # uses them, so find the owners once for all metaballs
+            owners = dict()
+            for ob in bpy.data.objects:
+                if ob.type == 'META' and ob.data not in owners:
+                    owners[ob.data] = ob
+
+            self.meta_family_index = dict()
+            for mball in bpy.data.metaballs:
+                parent = owners.get(mball, None)
+                if parent is None:
+                    continue
+                mball_family = object_utils.get_meta_family(parent)
+                self.meta_family_index.setdefault(mball_family, list()).append((mball, parent))
+
+        return self.meta_family_index.get(family, list())
+
     def get_rman_prototype(self, proto_key, ob=None, create=False):
         if proto_key in self.rman_prototypes:
             return self.rman_prototypes[proto_key]
@@ -37,6 +37,69 @@ class RmanUpdate:
         self.updated_prop_name = None
         self.do_clear_instances = True  
 
+def reconcile_prototypes(prev_proto_keys, visited_proto_keys, need_cleaning):
+    '''
+    Work out what needs to be deleted after check_instances has visited all of the
+    instances in the depsgraph. The cost of this is linear in the number of prototypes
+    and instances.
+
+    Arguments:
+        prev_proto_keys (set) - the prototype keys that existed before the update
+        visited_proto_keys (set) - the prototype keys seen during the update
+        need_cleaning (dict) - prototype node -> list of the group db names of
+                               the instances that are still in the depsgraph
+
+    Returns:
+        (tuple) - the set of prototype keys to delete, and a dict of
+                  prototype node -> set of the instance keys to delete
+    '''
+    deleted_obj_keys = prev_proto_keys - visited_proto_keys
+    stale_instances = dict()
+    for rman_sg_node, lst in need_cleaning.items():
+        # get the difference in the keys; what's left is what needs to be deleted
+        to_delete = rman_sg_node.instances.keys() - set(lst)
+        if to_delete:
+            stale_instances[rman_sg_node] = to_delete
+    return deleted_obj_keys, stale_instances
+
+def reconcile_indexed_instances(ob_index, rman_prototypes, visited_protos):
+    '''
+    Work out what needs to be deleted for one object of the instance index,
+    given what was seen of the object during the update. The cost of this is
+    linear in the number of instances of the object.
+
+    Arguments:
+        ob_index (dict) - prototype key -> set of group db names, from the instance index.
+                          This is updated to only hold the instances that were seen.
+        rman_prototypes (dict) - prototype key -> prototype node
+        visited_protos (dict) - prototype key -> set of the group db names seen for
+                                this object. Empty if the object was removed.
+
+    Returns:
+        (tuple) - the set of prototype keys to delete, and a dict of
+                  prototype node -> set of the instance keys to delete
+    '''
+    deleted_obj_keys = set()
+    stale_instances = dict()
+    for proto_key in list(ob_index):
+        rman_sg_node = rman_prototypes.get(proto_key, None)
+        if rman_sg_node is None:
+            del ob_index[proto_key]
+            continue
+        visited = visited_protos.get(proto_key, None)
+        to_delete = (ob_index[proto_key] - (visited or set())) & rman_sg_node.instances.keys()
+        if to_delete:
+            stale_instances[rman_sg_node] = to_delete
+        if visited is None:
+            # the object no longer uses this prototype. Delete it
+            # if nothing else instances it.
+            del ob_index[proto_key]
+            if not (rman_sg_node.instances.keys() - to_delete):
+                deleted_obj_keys.add(proto_key)
+        else:
+            ob_index[proto_key] &= visited
+    return deleted_obj_keys, stale_instances
+
 class RmanSceneSync(object):
     '''
     The RmanSceneSync class handles keeping the RmanScene object in sync
@@ -213,18 +276,69 @@ class RmanSceneSync(object):
             # Double check if we can't find the material because of an undo
             rman_sg_material = self.update_materials_dict(mat)
 
+        was_shared = False
         with self.rman_scene.rman.SGManager.ScopedEdit(self.rman_scene.sg_scene):              
+            if rman_sg_material and rman_sg_material.is_shared():
+                if not self.shared_material_updated(mat, rman_sg_material):
+                    # this material no longer matches the materials it was sharing
+                    # its shading network with, split it off
+                    rfb_log().debug("Material %s no longer shares its shading network" % mat.name)
+                    self.rman_scene.release_shared_material(mat, rman_sg_material)
+                    rman_sg_material = None
+                    was_shared = True
+
             if not rman_sg_material:
                 rfb_log().debug("New material: %s" % mat.name)
-                db_name = object_utils.get_db_name(mat)
-                rman_sg_material = translator.export(mat, db_name)
-                self.rman_scene.rman_materials[mat.original] = rman_sg_material            
-            else:
+                db_name = self.rman_scene.get_material_db_name(mat)
+                if self.rman_scene.bl_scene.renderman.share_identical_materials:
+                    rman_sg_material = self.rman_scene.export_shared_material(mat, db_name=db_name)
+                if not rman_sg_material:
+                    rman_sg_material = translator.export(mat, db_name)
+                    self.rman_scene.rman_materials[mat.original] = rman_sg_material            
+            elif not rman_sg_material.is_shared():
                 rfb_log().debug("Material, call update")
                 translator.update(mat, rman_sg_material)   
+                if rman_sg_material.share_digest is not None:
+                    # keep the digest up to date, so that only materials
+                    # identical to this one can share it
+                    self.rman_scene.set_share_digest(rman_sg_material, translator.get_share_digest(mat))
+
+        if was_shared:
+            # objects using this material are still pointing at
+            # the shared one, re-export them
+            self._mesh_light_update(mat)
+
+        if rman_sg_material.is_shared():
+            # keep the db_name of the material that was translated
+            return
 
         # update db_name
-        rman_sg_material.db_name = db_name
+        if rman_sg_material.db_name != db_name:
+            rman_sg_material.db_name = self.rman_scene.get_material_db_name(mat)
+
+    def shared_material_updated(self, mat, rman_sg_material):
+        '''
+        Update a material that shares its scene graph material with other materials.
+
+        Returns:
+            (bool) - False if the material's shading networks are now different from the
+                    other materials sharing them, and it should be split off
+        '''
+        translator = self.rman_scene.rman_translators["MATERIAL"]
+        share_digest = translator.get_share_digest(mat)
+        if share_digest == rman_sg_material.share_digest:
+            return True
+
+        # check if all of the materials changed together (ex: a frame change
+        # for frame sensitive materials), by checking one of the other users
+        other_mat = next(m for m in rman_sg_material.users if m != mat.original)
+        if translator.get_share_digest(other_mat) != share_digest:
+            return False
+
+        rfb_log().debug("Shared material %s, call update" % rman_sg_material.db_name)
+        self.rman_scene.set_share_digest(rman_sg_material, share_digest)
+        translator.update(mat, rman_sg_material)
+        return True
 
     def light_filter_transform_updated(self, ob, rman_sg_lightfilter):
         translator = self.rman_scene.rman_translators['LIGHTFILTER']
@@ -434,9 +548,12 @@ class RmanSceneSync(object):
         for id, rman_sg_node in self.rman_scene.rman_materials.items():
             if rman_sg_node:
                 db_name = object_utils.get_db_name(mat)
-                if rman_sg_node.db_name == db_name:
+                if rman_sg_node.db_name == db_name or mat.original in rman_sg_node.users:
                     self.rman_scene.rman_materials[mat.original] = rman_sg_node
-                    del self.rman_scene.rman_materials[id]
+                    if not rman_sg_node.is_shared():
+                        # shared materials have an entry for each of their
+                        # users, we can't tell which one belongs to this material
+                        del self.rman_scene.rman_materials[id]
                     rman_sg_material = rman_sg_node 
                     break
         
@@ -557,6 +674,13 @@ class RmanSceneSync(object):
         if dps_update.is_updated_transform:
             self.check_focus_object(ob_eval)       
 
+    def grease_pencil_updated(self, dps_update):
+        # the strokes may have been edited, so the cached
+        # layer frames for this datablock are no longer valid
+        rfb_log().debug("GreasePencil updated: %s" % dps_update.id.name)
+        translator = self.rman_scene.rman_translators['GPENCIL']
+        translator.clear_layer_frame_cache(dps_update.id.original)
+
     def check_particle_settings(self, dps_update):    
         rfb_log().debug("ParticleSettings updated: %s" % dps_update.id.name)             
 
@@ -668,6 +792,8 @@ class RmanSceneSync(object):
 
                 elif isinstance(dps_update.id, bpy.types.Object):                
                     self.check_object_datablock(dps_update)
+                elif isinstance(dps_update.id, bpy.types.GreasePencil):
+                    self.grease_pencil_updated(dps_update)
                 elif isinstance(dps_update.id, bpy.types.GeometryNodeTree):
                     # create an empty RmanUpdate
                     self.create_rman_update(dps_update.id.original, clear_instances=False)                    
@@ -682,7 +808,8 @@ class RmanSceneSync(object):
             self.check_instances(batch_mode=True)
 
             # update any materials
-            for id, rman_sg_material in self.rman_scene.rman_materials.items():              
+            # material_updated can split a shared material, which changes rman_materials
+            for id, rman_sg_material in list(self.rman_scene.rman_materials.items()):
                 if rman_sg_material.is_frame_sensitive or id.original in self.rman_updates:
                     mat = id.evaluated_get(self.rman_scene.depsgraph)
                     self.material_updated(mat, rman_sg_material)    
@@ -710,6 +837,7 @@ class RmanSceneSync(object):
         self.rman_scene.bl_scene = depsgraph.scene
         self.rman_scene.context = context       
         self.rman_scene.bl_view_layer = depsgraph.view_layer_eval
+        self.rman_scene.meta_family_index = None
 
         rfb_log().debug("------Start update scene--------")    
        
@@ -769,6 +897,9 @@ class RmanSceneSync(object):
             elif isinstance(dps_update.id, bpy.types.Object):                
                 self.check_object_datablock(dps_update)                     
 
+            elif isinstance(dps_update.id, bpy.types.GreasePencil):
+                self.grease_pencil_updated(dps_update)
+
             elif isinstance(dps_update.id, bpy.types.Collection):
                 rfb_log().debug("Collection updated: %s" % dps_update.id.name)
                 #self.update_collection(dps_update.id)           
@@ -779,15 +910,24 @@ class RmanSceneSync(object):
             else:
                 rfb_log().debug("Not handling %s update: %s" % (str(type(dps_update.id)), dps_update.id.name))
 
-        if not self.rman_updates and self.num_instances_changed:
-            # The number of instances changed, but we are not able
-            # to determine what changed. We are forced to check
-            # all instances.
-            rfb_log().debug("Set check_all_instances to True")
-            self.check_all_instances = True
+        index_cleaning = False
+        if self.num_instances_changed and not self.check_all_instances:
+            # The number of instances changed. Diff our instance index against
+            # the depsgraph, to find out which objects were added or deleted.
+            # If we don't have an index, or it can't account for the change, 
+            # and we are not able to determine what changed, we are forced 
+            # to check all instances.
+            if self.rman_scene.rman_instance_index:
+                index_cleaning = self.check_indexed_instances() or bool(self.rman_updates)
+            if not index_cleaning and not self.rman_updates:
+                rfb_log().debug("Set check_all_instances to True")
+                self.check_all_instances = True
+
+        if self.rman_updates and not self.check_all_instances:
+            self.update_indexed_transforms()
                          
         if self.check_all_instances or self.rman_updates:
-            self.check_instances()
+            self.check_instances(index_cleaning=index_cleaning)
                             
         # call txmake all in case of new textures
         texture_utils.get_txmanager().txmake_all(blocking=False)      
@@ -795,6 +935,127 @@ class RmanSceneSync(object):
         self.rman_scene.context = None             
         rfb_log().debug("------End update scene----------")    
 
+    def check_indexed_instances(self):
+        '''
+        Diff the objects in the depsgraph against the instance index, to find the
+        objects that were added or removed, without walking every instance.
+        The instances of removed objects are deleted, and added objects get an
+        RmanUpdate, so that check_instances exports them.
+
+        Returns:
+            (bool) - True if any objects were added or removed
+        '''
+        rman_instance_index = self.rman_scene.rman_instance_index
+        current_obs = dict()
+        for ob in self.rman_scene.depsgraph.objects:
+            if ob.type == 'CAMERA':
+                continue
+            current_obs[ob.name_full] = ob.original
+        removed_obs = rman_instance_index.keys() - current_obs.keys()
+        added_obs = current_obs.keys() - rman_instance_index.keys()
+
+        if removed_obs:
+            rfb_log().debug("\tResolving deletes from instance index")
+            deleted_obj_keys = set()
+            with self.rman_scene.rman.SGManager.ScopedEdit(self.rman_scene.sg_scene):
+                for name in removed_obs:
+                    deleted, stale_instances = reconcile_indexed_instances(rman_instance_index.pop(name), self.rman_scene.rman_prototypes, dict())
+                    deleted_obj_keys.update(deleted)
+                    for rman_sg_node, to_delete in stale_instances.items():
+                        for k in to_delete:
+                            g = rman_sg_node.instances.pop(k)
+                            del g
+                    self.rman_scene.rman_instanced_objects.discard(name)
+                if deleted_obj_keys:
+                    self.delete_objects(deleted_obj_keys)
+
+        for name in added_obs:
+            ob = current_obs[name]
+            rfb_log().debug("\tObject added: %s" % name)
+            if ob not in self.rman_updates:
+                self.create_rman_update(ob, update_shading=True, update_transform=True)
+
+        return bool(removed_obs or added_obs)
+
+    def update_indexed_transforms(self):
+        '''
+        Fast path for objects that have only been moved. Transform only edits to
+        objects that are neither instancers, nor instanced by other objects, are
+        updated directly from the instance index, without walking the depsgraph
+        instances. This does the same as the transform update in check_instances. 
+        The depsgraph instance of an object that is not an instance has the same 
+        matrix and attributes as the evaluated object, so the evaluated object 
+        is used in its place.
+
+        The updates handled here are removed from rman_updates. Instancers are left
+        for check_instances, as the matrices of their instances only come from the
+        depsgraph instances.
+        '''
+        updates = list()
+        for ob_key, rman_update in self.rman_updates.items():
+            if not isinstance(ob_key, bpy.types.Object):
+                continue
+            if not rman_update.is_updated_transform:
+                continue
+            if rman_update.is_updated_geometry or rman_update.is_updated_shading or rman_update.is_updated_attributes:
+                continue
+            if ob_key.name_full in self.rman_scene.rman_instanced_objects:
+                continue
+            ob_index = self.rman_scene.get_indexed_instances(ob_key)
+            if not ob_index:
+                continue
+            group_db_name = object_utils.get_group_db_name(ob_key)
+            if any(group_db_names != {group_db_name} for group_db_names in ob_index.values()):
+                continue
+            ob_eval = ob_key.evaluated_get(self.rman_scene.depsgraph)
+            rman_type = object_utils._detect_primitive_(ob_eval)
+            rman_sg_nodes = [(proto_key, self.rman_scene.get_rman_prototype(proto_key)) for proto_key in ob_index]
+            if any(rman_sg_node.rman_type != rman_type for proto_key, rman_sg_node in rman_sg_nodes):
+                # types don't match, let check_instances re-export
+                continue
+            updates.append((ob_key, ob_eval, rman_type, group_db_name, rman_sg_nodes))
+
+        if not updates:
+            return
+
+        rfb_log().debug("Updating indexed transforms")
+        rman_group_translator = self.rman_scene.rman_translators['GROUP']
+        with self.rman_scene.rman.SGManager.ScopedEdit(self.rman_scene.sg_scene):
+            for ob_key, ob_eval, rman_type, group_db_name, rman_sg_nodes in updates:
+                for proto_key, rman_sg_node in rman_sg_nodes:
+                    rman_sg_group = rman_sg_node.instances[group_db_name]
+                    rfb_log().debug("\tUpdating Transform: %s" % proto_key)
+                    self.rman_scene.update_instance_attributes(rman_group_translator, rman_sg_group, ob_eval, ob_eval, remove=True)
+                    rman_group_translator.update_transform(ob_eval, rman_sg_group)
+                    self.check_light_and_particles(ob_eval, rman_sg_node, rman_type, proto_key)
+                del self.rman_updates[ob_key]
+
+    def check_light_and_particles(self, ob_eval, rman_sg_node, rman_type, proto_key):
+        if rman_type == 'LIGHT':
+            # We are dealing with a light. Check if it's a solo light, or muted
+            self.rman_scene.check_solo_light(rman_sg_node, ob_eval)
+
+            # check portal lights
+            self.update_portals(ob_eval)
+            
+            # Hide the default light
+            if self.rman_scene.default_light.GetHidden() != 1:
+                self.rman_scene.default_light.SetHidden(1)                
+
+        # Delete any removed partcle systems
+        if proto_key in self.rman_scene.rman_particles:                                                
+            ob_psys = self.rman_scene.rman_particles[proto_key]
+            rman_particle_nodes = list(ob_psys)
+            for psys in ob_eval.particle_systems:
+                try:
+                    rman_particle_nodes.remove(psys.settings.original)
+                except:
+                    continue
+            if rman_particle_nodes:
+                rfb_log().debug("\t\tRemoving particle nodes: %s" % proto_key)
+            for k in rman_particle_nodes:                        
+                del ob_psys[k]
+
     def add_to_need_cleaning(self, instance, rman_sg_node):
         group_db_name = object_utils.get_group_db_name(instance)
         lst = self.need_cleaning.get(rman_sg_node, list())
@@ -826,10 +1087,25 @@ class RmanSceneSync(object):
         return False
 
     @time_this
-    def check_instances(self, batch_mode=False):
-        deleted_obj_keys = list(self.rman_scene.rman_prototypes) # list of potential objects to delete
+    def check_instances(self, batch_mode=False, index_cleaning=False):
+        '''
+        Update the instances of the objects in rman_updates.
+
+        Args:
+            batch_mode (bool) - whether we are doing a batch update
+            index_cleaning (bool) - the number of instances changed, and the instance index
+                                    accounts for the added and removed objects. Only the
+                                    instances of the updated objects need cleaning, and we 
+                                    use the index to do it. Otherwise, all instances are checked
+                                    for cleaning.
+        '''
+        prev_proto_keys = set(self.rman_scene.rman_prototypes) # prototypes that existed before this update
+        visited_proto_keys = set() # prototypes we've seen during our loop
+        visited_obs = dict() # object name -> prototype key -> group db names seen during our loop
         already_udpated = set() # set of objects already updated during our loop     
         self.need_cleaning = dict()     
+        full_cleaning = self.num_instances_changed and not index_cleaning
+        is_interactive = self.rman_scene.is_interactive
         rfb_log().debug("Updating instances")  
 
         '''
@@ -877,7 +1153,7 @@ class RmanSceneSync(object):
 
                     else:    
                         # skip this object
-                        if self.num_instances_changed:
+                        if full_cleaning:
                             rman_sg_node = self.rman_scene.get_rman_prototype(object_utils.prototype_key(instance))
                             if rman_sg_node and len(rman_sg_node.instances) > 0:
                                 self.add_to_need_cleaning(instance, rman_sg_node)                  
@@ -893,8 +1169,14 @@ class RmanSceneSync(object):
                     instance_parent = instance.parent 
                     is_empty_instancer = object_utils.is_empty_instancer(instance_parent)                    
                     
-                if proto_key in deleted_obj_keys:
-                    deleted_obj_keys.remove(proto_key)                         
+                visited_proto_keys.add(proto_key)
+                if is_interactive:
+                    self.rman_scene.index_instance(instance, proto_key)
+                    # only objects with their own update get all of their instances visited
+                    ob_owner = instance.parent.original if is_instance else instance.object.original
+                    if self.check_all_instances or ob_owner in self.rman_updates:
+                        visited_groups = visited_obs.setdefault(ob_owner.name_full, dict()).setdefault(proto_key, set())
+                        visited_groups.add(object_utils.get_group_db_name(instance))
                 
                 if rman_sg_node is None:
                     rman_sg_node = self.rman_scene.get_rman_prototype(proto_key)
@@ -987,7 +1269,7 @@ class RmanSceneSync(object):
                 rman_sg_group = self.rman_scene.get_rman_sg_instance(instance, rman_sg_node, instance_parent, psys, create=False)
                 rman_group_translator = self.rman_scene.rman_translators['GROUP']
 
-                if self.num_instances_changed:
+                if full_cleaning:
                     self.add_to_need_cleaning(instance, rman_sg_node)  
 
                 if rman_sg_group:
@@ -1015,40 +1297,32 @@ class RmanSceneSync(object):
                     self.rman_scene.export_instance(ob_eval, instance, rman_sg_node, rman_type, instance_parent, psys)
                             
                 if not batch_mode:
-                    if rman_type == 'LIGHT':
-                        # We are dealing with a light. Check if it's a solo light, or muted
-                        self.rman_scene.check_solo_light(rman_sg_node, ob_eval)
-
-                        # check portal lights
-                        self.update_portals(ob_eval)
-                        
-                        # Hide the default light
-                        if self.rman_scene.default_light.GetHidden() != 1:
-                            self.rman_scene.default_light.SetHidden(1)                
-
-                    # Delete any removed partcle systems
-                    if proto_key in self.rman_scene.rman_particles:                                                
-                        ob_psys = self.rman_scene.rman_particles[proto_key]
-                        rman_particle_nodes = list(ob_psys)
-                        for psys in ob_eval.particle_systems:
-                            try:
-                                rman_particle_nodes.remove(psys.settings.original)
-                            except:
-                                continue
-                        if rman_particle_nodes:
-                            rfb_log().debug("\t\tRemoving particle nodes: %s" % proto_key)
-                        for k in rman_particle_nodes:                        
-                            del ob_psys[k]
+                    self.check_light_and_particles(ob_eval, rman_sg_node, rman_type, proto_key)
                                                                         
-            if self.num_instances_changed:
-                # delete objects
+            if index_cleaning:
+                # only the instances of the objects we visited can be gone
+                rman_instance_index = self.rman_scene.rman_instance_index
+                deleted_obj_keys = set()
+                stale_instances = dict()
+                for name, visited_protos in visited_obs.items():
+                    deleted, stale = reconcile_indexed_instances(rman_instance_index[name], self.rman_scene.rman_prototypes, visited_protos)
+                    deleted_obj_keys.update(deleted)
+                    for rman_sg_node, to_delete in stale.items():
+                        stale_instances.setdefault(rman_sg_node, set()).update(to_delete)
+            elif full_cleaning:
+                # whatever prototypes we did not visit are the ones that need deleting
+                deleted_obj_keys, stale_instances = reconcile_prototypes(prev_proto_keys, visited_proto_keys, self.need_cleaning)
+                if self.check_all_instances:
+                    # we've seen all objects, forget the ones that are gone
+                    for name in self.rman_scene.rman_instance_index.keys() - visited_obs.keys():
+                        del self.rman_scene.rman_instance_index[name]
+
+            if index_cleaning or full_cleaning:
                 if deleted_obj_keys:
                     self.delete_objects(deleted_obj_keys)    
 
-                # finally, check what instances need to be deleted
-                for rman_sg_node, lst in self.need_cleaning.items():
-                    # get the difference in the keys; what's left is what needs to be deleted
-                    to_delete = set(rman_sg_node.instances.keys()) - set(lst)
+                # finally, delete the instances that are gone
+                for rman_sg_node, to_delete in stale_instances.items():
                     for k in to_delete:
                         if k in rman_sg_node.instances:
                             g = rman_sg_node.instances.pop(k)
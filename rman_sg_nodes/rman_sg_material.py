@@ -10,9 +10,15 @@ class RmanSgMaterial(RmanSgNode):
         self.sg_stroke_mat = None
         self.sg_fill_mat = None
         self.nodes_to_blnodeinfo = dict()
+        self.network_digests = dict() # network type ('bxdf', 'light', 'displace') -> digest of the exported network
+        self.share_digest = None # digest used to share this material with identical materials
+        self.users = set() # the materials (mat.original) sharing this material
         self.sg_group = rman_scene.sg_scene.CreateGroup("__lightFilterParent") 
         self.sg_lightfilters = list() # list to hold light filter transforms
 
+    def is_shared(self):
+        return len(self.users) > 1
+
     @property
     def has_meshlight(self):
         return self.__has_meshlight
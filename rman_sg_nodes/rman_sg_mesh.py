@@ -14,6 +14,11 @@ class RmanSgMesh(RmanSgNode):
         self.multi_material_children = []
         self.sg_mesh = None
 
+        # content digests of the last topology and primvars
+        # set on sg_mesh. Used to skip re-exporting unchanged geometry
+        self.topology_digest = None
+        self.primvars_digest = None
+
     def __del__(self):
         if self.rman_scene.rman_render.rman_context.is_render_running() and self.rman_scene.rman_render.sg_scene:
             with self.rman_scene.rman.SGManager.ScopedEdit(self.rman_scene.sg_scene): 
@@ -269,6 +269,11 @@ class RfBStatsManager(object):
         self.export_stat_label = 'Exporting'
         self.export_stat_progress = 0.0
 
+        # number of times unchanged geometry was (or was not)
+        # skipped during export
+        self.geo_cache_hits = 0
+        self.geo_cache_misses = 0
+
         self._integrator = 'PxrPathTracer'
         self._maxSamples = 0
         self._iterations = 0
@@ -307,6 +312,8 @@ class RfBStatsManager(object):
         self._prevTotalRaysValid = True      
         self.export_stat_label = ''
         self.export_stat_progress = 0.0
+        self.geo_cache_hits = 0
+        self.geo_cache_misses = 0
         self._isRendering = True    
         self.use_export_timer = False
         self.export_timer = None          
@@ -581,6 +588,12 @@ class RfBStatsManager(object):
             else:
                 self.rman_render.progress_bar_app.processEvents()
 
+    def update_geo_cache_stats(self, hit=True):
+        if hit:
+            self.geo_cache_hits += 1
+        else:
+            self.geo_cache_misses += 1
+
     def draw_stats(self):
         if self.rman_render.rman_context.is_exporting_state():
             self.draw_export_stats()
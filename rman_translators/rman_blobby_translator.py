@@ -1,16 +1,9 @@
 from .rman_translator import RmanTranslator
 from ..rman_sg_nodes.rman_sg_blobby import RmanSgBlobby
 from ..rfb_utils import object_utils
-from ..rfb_utils import string_utils
-from mathutils import Matrix
 
 import bpy
-import math
-
-def get_mball_parent(mball):
-    for ob in bpy.data.objects:
-        if ob.data == mball:
-            return ob
+import numpy as np
 
 class RmanBlobbyTranslator(RmanTranslator):
     '''
@@ -44,57 +37,53 @@ class RmanBlobbyTranslator(RmanTranslator):
         family = object_utils.get_meta_family(ob)
         master = bpy.data.objects[family]
 
-        fam_blobs = []
-
-        for mball in bpy.data.metaballs:
-            fam_blobs.extend([el for el in mball.elements if get_mball_parent(
-                el.id_data).name.split('.')[0] == family])
+        fam_mballs = self.rman_scene.get_meta_family(family)
 
         # transform
-        tform = []
-
-        # opcodes
-        op = []
-        count = len(fam_blobs)
-        for i in range(count):
-            op.append(1001)  # only blobby ellipsoids for now...
-            op.append(i * 16)
-
-        for meta_el in fam_blobs:
+        tforms = []
+        for mball, parent in fam_mballs:
+            num_elements = len(mball.elements)
+            if num_elements < 1:
+                continue
+            co = np.zeros(num_elements*3, dtype=np.float32)
+            radius = np.zeros(num_elements, dtype=np.float32)
+            mball.elements.foreach_get('co', co)
+            mball.elements.foreach_get('radius', radius)
 
             # Because all meta elements are stored in a single collection,
             # these elements have a link to their parent MetaBall, but NOT the actual tree parent object.
-            # So I have to go find the parent that owns it.  We need the tree parent in order
-            # to get any world transforms that alter position of the metaball.
-            parent = get_mball_parent(meta_el.id_data)
-
-            m = {}
-            loc = meta_el.co
-
+            # We need the tree parent in order to get any world transforms that 
+            # alter position of the metaball.
             # mballs that are only linked to the master by name have their own position,
             # and have to be transformed relative to the master
             ploc, prot, psc = parent.matrix_world.decompose()
+            ro = np.array(prot.to_matrix(), dtype=np.float32)
 
-            m = Matrix.Translation(loc)
+            # translation @ scale @ rotation for each element
+            m2 = np.zeros((num_elements, 4, 4), dtype=np.float32)
+            m2[:, :3, :3] = radius[:, np.newaxis, np.newaxis] * ro
+            m2[:, :3, 3] = np.reshape(co, (num_elements, 3))
+            m2[:, 3, 3] = 1.0
+            m = np.array(parent.matrix_world, dtype=np.float32) @ m2
 
-            sc = Matrix(((meta_el.radius, 0, 0, 0),
-                        (0, meta_el.radius, 0, 0),
-                        (0, 0, meta_el.radius, 0),
-                        (0, 0, 0, 1)))
+            # column major, like string_utils.convert_val
+            tforms.append(np.transpose(m, (0, 2, 1)).reshape(-1))
 
-            ro = prot.to_matrix().to_4x4()
+        tform = np.concatenate(tforms) if tforms else np.zeros(0, dtype=np.float32)
+        count = len(tform) // 16
 
-            m2 = m @ sc @ ro
-            tform = tform + string_utils.convert_val(parent.matrix_world @ m2)
-
-        op.append(0)  # blob operation:add
-        op.append(count)
-        for n in range(count):
-            op.append(n)
+        # opcodes
+        # only blobby ellipsoids for now...
+        ellipsoids = np.zeros((count, 2), dtype=np.int32)
+        ellipsoids[:, 0] = 1001
+        ellipsoids[:, 1] = np.arange(count) * 16
+        op = np.concatenate((ellipsoids.reshape(-1), 
+                            [0, count], # blob operation:add
+                            np.arange(count))).astype(np.int32)
 
         primvar = rman_sg_blobby.sg_node.GetPrimVars()  
         rman_sg_blobby.sg_node.Define(count)
-        primvar.SetIntegerArray(self.rman_scene.rman.Tokens.Rix.k_Ri_code, op, len(op))            
-        primvar.SetFloatArray(self.rman_scene.rman.Tokens.Rix.k_Ri_floats, tform, len(tform))      
+        primvar.SetIntegerArray(self.rman_scene.rman.Tokens.Rix.k_Ri_code, op.data, len(op))            
+        primvar.SetFloatArray(self.rman_scene.rman.Tokens.Rix.k_Ri_floats, tform.data, len(tform))      
         super().export_object_primvars(ob, primvar)
-        rman_sg_blobby.sg_node.SetPrimVars(primvar)        
+        rman_sg_blobby.sg_node.SetPrimVars(primvar)
@@ -5,92 +5,104 @@ from ..rfb_utils import property_utils
 
 import numpy as np
 
-def get_bspline_curve(curve):
-    P = []
-    widths = []
-    nvertices = []
-    name = ''
-    num_curves = len(curve.splines)
-
-    for spline in curve.splines:
-
-        npoints = len(spline.points)
-        pts = np.zeros(npoints*4, dtype=np.float32)
-        width = np.zeros(npoints, dtype=np.float32)
-
-        spline.points.foreach_get('co', pts)
-        spline.points.foreach_get('radius', width)
-        width = np.where(width >= 1.0, width*0.01, 0.01)
-
-        delete_w = np.arange(3, pts.size, 4)
-        pts = np.delete(pts, delete_w)
-        P.extend(pts.tolist())
-        widths.append(width.tolist())
-        nvertices.append(npoints)
-        name = spline.id_data.name
-
-    index = np.arange(num_curves)
-    
-    return (P, num_curves, nvertices, widths, index, name)
+def _get_widths(radius):
+    return np.where(radius >= 1.0, radius*0.01, 0.01).astype(np.float32)
+
+def _get_point_counts(splines, points_attr='points'):
+    '''
+    Get the number of points of each spline. Splines of another type have
+    no points in points_attr, and get a count of 0.
+    '''
+    return np.fromiter((len(getattr(spline, points_attr)) for spline in splines),
+                       dtype=np.int32, count=len(splines))
+
+def _get_spline_attr(splines, counts, attr, size, points_attr='points'):
+    '''
+    Read an attribute for all of the points of all splines into one
+    flat array, with one foreach_get per spline.
+    '''
+    arr = np.zeros(int(counts.sum())*size, dtype=np.float32)
+    start = 0
+    for spline, npoints in zip(splines, counts):
+        end = start + int(npoints)*size
+        if end > start:
+            getattr(spline, points_attr).foreach_get(attr, arr[start:end])
+        start = end
+    return arr
 
 def get_curve(curve):
-    P = []
-    widths = []
-    nvertices = []
-    name = ''
-    num_curves = len(curve.splines)
-
-    for spline in curve.splines:
-
-        npoints = len(spline.points)
-        pts = np.zeros(npoints*4, dtype=np.float32)
-        width = np.zeros(npoints, dtype=np.float32)
-
-        spline.points.foreach_get('co', pts)
-        spline.points.foreach_get('radius', width)
-        width = np.where(width >= 1.0, width*0.01, 0.01)
-
-        delete_w = np.arange(3, pts.size, 4)
-        pts = np.delete(pts, delete_w)
-        P.extend(pts.tolist())
-        widths.append(width)
-        nvertices.append(npoints)
-        name = spline.id_data.name
-
-    index = np.arange(num_curves)
-    
-    return (P, num_curves, nvertices, widths, index, name)
+    '''
+    Get the points of all splines of a poly, b-spline or nurbs curve,
+    to be exported as one curves primitive.
+
+    Returns:
+    (tuple) - flat float32 array of points, number of curves, int32 array of the number of
+              vertices of each curve, float32 widths, int32 index of each curve, name
+    '''
+    splines = curve.splines
+    counts = _get_point_counts(splines)
+
+    pts = _get_spline_attr(splines, counts, 'co', 4)
+    P = np.ascontiguousarray(pts.reshape(-1, 4)[:, :3]).reshape(-1)
+    widths = _get_widths(_get_spline_attr(splines, counts, 'radius', 1))
+
+    # skip bezier splines, they have no points
+    index = np.flatnonzero(counts).astype(np.int32)
+    num_curves = len(index)
+    nvertices = counts[index]
+
+    return (P, num_curves, nvertices, widths, index, curve.name)
 
 def get_bezier_curve(curve):
-    splines = []
-
-    for spline in curve.splines:
-        P = []
-        width = []
-
-        for bp in spline.bezier_points:
-            P.append(bp.handle_left)
-            P.append(bp.co)
-            P.append(bp.handle_right)
-            w = bp.radius * 0.01
-            if w < 0.01:
-                w = 0.01
-            width.extend( 3 * [w])
-
-        if spline.use_cyclic_u:
-            period = 'periodic'
-            # wrap the initial handle around to the end, to begin on the CV
-            P = P[1:] + P[:1]
+    '''
+    Get the control vertices of all bezier splines of a curve. Splines are batched
+    into one set of curves for each wrap mode.
+
+    Returns:
+    (list) - list of (P, widths, nvertices, index, period, name) tuples
+    '''
+    splines = curve.splines
+    num_splines = len(splines)
+    counts = _get_point_counts(splines, points_attr='bezier_points')
+    cyclic = np.zeros(num_splines, dtype=bool)
+    splines.foreach_get('use_cyclic_u', cyclic)
+
+    # each bezier point has 3 vertices: handle_left, co, handle_right
+    cvs = np.zeros((int(counts.sum()), 3, 3), dtype=np.float32)
+    for i, attr in enumerate(['handle_left', 'co', 'handle_right']):
+        cvs[:, i, :] = _get_spline_attr(splines, counts, attr, 3, points_attr='bezier_points').reshape(-1, 3)
+    cvs = cvs.reshape(-1, 3)
+    radius = _get_spline_attr(splines, counts, 'radius', 1, points_attr='bezier_points')
+    widths = np.repeat(_get_widths(radius), 3)
+    first_cvs = (np.cumsum(counts) - counts) * 3
+
+    curves = []
+    for period, is_cyclic in (('nonperiodic', False), ('periodic', True)):
+        index = np.flatnonzero((cyclic == is_cyclic) & (counts > 0)).astype(np.int32)
+        if len(index) < 1:
+            continue
+        num_cvs = counts[index] * 3
+        if is_cyclic:
+            nvertices = num_cvs
         else:
-            period = 'nonperiodic'
             # remove the two unused handles
-            P = P[1:-1]
-            width = width[1:-1]
+            nvertices = num_cvs - 2
+        offsets = np.cumsum(nvertices) - nvertices
+        curve_ids = np.repeat(np.arange(len(index)), nvertices)
+        local = np.arange(int(nvertices.sum())) - offsets[curve_ids]
+        start = first_cvs[index][curve_ids]
+        if is_cyclic:
+            # wrap the initial handle around to the end, to begin on the CV
+            cv_ids = start + (local + 1) % num_cvs[curve_ids]
+            width_ids = start + local
+        else:
+            cv_ids = start + local + 1
+            width_ids = cv_ids
 
-        name = spline.id_data.name
-        splines.append((P, width, period, name))
+        P = np.ascontiguousarray(cvs[cv_ids]).reshape(-1)
+        curves.append((P, widths[width_ids], nvertices.astype(np.int32), index, period, curve.name))
 
-    return splines      
+    return curves
 
 
 def get_is_cyclic(curve):
@@ -162,17 +174,17 @@ class RmanCurveTranslator(RmanMeshTranslator):
         property_utils.set_primvar_bl_props(primvar, rm, inherit_node=rm_scene)          
 
     def update_bspline_curve(self, ob, rman_sg_curve):
-        P, num_curves, nvertices, widths, index, name = get_bspline_curve(ob.data)
-        num_pts = int(len(P)/3)
+        P, num_curves, nvertices, widths, index, name = get_curve(ob.data)
+        num_pts = len(P) // 3
          
         curves_sg = self.rman_scene.sg_scene.CreateCurves(name)
         curves_sg.Define(self.rman_scene.rman.Tokens.Rix.k_cubic, 'nonperiodic', "b-spline", num_curves, num_pts)
         
         primvar = curves_sg.GetPrimVars()
-        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P, "vertex")   
-        primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, nvertices, "uniform")
-        if widths:
-            primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, widths, "vertex")
+        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P.data, "vertex")   
+        primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, nvertices.data, "uniform")
+        if len(widths):
+            primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, widths.data, "vertex")
         primvar.SetIntegerDetail("index", index.data, "uniform")
         #self.update_primvars(ob, primvar)           
         super().export_object_primvars(ob, primvar)
@@ -183,16 +195,16 @@ class RmanCurveTranslator(RmanMeshTranslator):
 
     def update_curve(self, ob, rman_sg_curve):
         P, num_curves, nvertices, widths, index, name = get_curve(ob.data)
-        num_pts = int(len(P)/3)
+        num_pts = len(P) // 3
          
         curves_sg = self.rman_scene.sg_scene.CreateCurves(name)
         curves_sg.Define(self.rman_scene.rman.Tokens.Rix.k_linear, 'nonperiodic', "linear", num_curves, num_pts)
         
         primvar = curves_sg.GetPrimVars()
-        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P, "vertex")   
-        primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, nvertices, "uniform")
-        if widths:
-            primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, widths, "vertex")
+        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P.data, "vertex")   
+        primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, nvertices.data, "uniform")
+        if len(widths):
+            primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, widths.data, "vertex")
         primvar.SetIntegerDetail("index", index.data, "uniform")
         curves_sg.SetPrimVars(primvar)     
 
@@ -200,21 +212,20 @@ class RmanCurveTranslator(RmanMeshTranslator):
 
     def update_bezier_curve(self, ob, rman_sg_curve):
         curves = get_bezier_curve(ob.data)
-        for P, width, period, name in curves:
-            num_pts = len(P)
-            if num_pts < 1:
-                continue
-            curves_sg = self.rman_scene.sg_scene.CreateCurves(name)
-            curves_sg.Define(self.rman_scene.rman.Tokens.Rix.k_cubic, period, "bezier", 1, num_pts)
+        for P, widths, nvertices, index, period, name in curves:
+            num_pts = len(P) // 3
+            curves_sg = self.rman_scene.sg_scene.CreateCurves('%s-%s' % (name, period))
+            curves_sg.Define(self.rman_scene.rman.Tokens.Rix.k_cubic, period, "bezier", len(nvertices), num_pts)
             
             primvar = curves_sg.GetPrimVars()
-            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P, "vertex")   
-            primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, [num_pts], "uniform")
-            if width:
-                primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, width, "vertex")
+            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P.data, "vertex")   
+            primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, nvertices.data, "uniform")
+            if len(widths):
+                primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, widths.data, "vertex")
+            primvar.SetIntegerDetail("index", index.data, "uniform")
 
             #self.update_primvars(ob, primvar)   
             super().export_object_primvars(ob, primvar)               
             curves_sg.SetPrimVars(primvar)
 
-            rman_sg_curve.sg_node.AddChild(curves_sg)        
\ No newline at end of file
+            rman_sg_curve.sg_node.AddChild(curves_sg)
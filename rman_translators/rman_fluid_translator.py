@@ -12,6 +12,24 @@ from mathutils import Matrix
 import bpy
 import os
 import gzip
+import numpy as np
+
+# cache dir -> (mtime, density vdb files, {frame: vdb file})
+__VDB_CACHE_LISTINGS__ = dict()
+
+def get_openVDB_cache_files(cacheDir):
+    '''
+    Get the density vdb files in a fluid cache dir, along with a dictionary
+    to memoize the file for each frame. The listing is only re-read
+    when the modification time of the directory changes.
+    '''
+    mtime = os.stat(cacheDir).st_mtime
+    listing = __VDB_CACHE_LISTINGS__.get(cacheDir, None)
+    if listing is None or listing[0] != mtime:
+        vdb_files = [f for f in sorted(os.listdir(cacheDir)) if os.path.splitext(f)[1] == '.vdb' and 'density' in f]
+        listing = (mtime, vdb_files, dict())
+        __VDB_CACHE_LISTINGS__[cacheDir] = listing
+    return listing[1], listing[2]
 
 def locate_openVDB_cache(cache_dir, frameNum):
     if not bpy.data.is_saved:
@@ -19,13 +37,20 @@ def locate_openVDB_cache(cache_dir, frameNum):
     cacheDir = os.path.join(bpy.path.abspath(cache_dir), 'data')
     if not os.path.exists(cacheDir):
         return None
-    for f in os.listdir(cacheDir):
-        if os.path.splitext(f)[1] != '.vdb':
-            continue
-        if 'density' in f and "%04d" % frameNum in f:
-            return os.path.join(cacheDir, f)
+    vdb_files, frame_files = get_openVDB_cache_files(cacheDir)
+    if frameNum not in frame_files:
+        frame_str = "%04d" % frameNum
+        frame_files[frameNum] = next((os.path.join(cacheDir, f) for f in vdb_files if frame_str in f), None)
 
-    return None   
+    return frame_files[frameNum]
+
+def get_fluid_grid(grid):
+    '''
+    Read a fluid domain grid into a flat float32 array.
+    '''
+    arr = np.zeros(len(grid), dtype=np.float32)
+    grid.foreach_get(arr)
+    return arr
 
 def find_fluid_modifier(ob):
     fluid_modifier = None
@@ -154,12 +179,13 @@ class RmanFluidTranslator(RmanTranslator):
         inv_mtx = ob.matrix_world.inverted_safe()
         cur_frame = self.rman_scene.bl_scene.frame_current
         do_motion = self.rman_scene.do_motion_blur
-        P, next_P, width = particles_utils.get_particles(ob, psys, inv_mtx, cur_frame, get_next_P=do_motion)        
+        particle_data = particles_utils.RmanParticleData(psys)
+        P, next_P, width = particles_utils.get_particles(ob, psys, inv_mtx, cur_frame, get_next_P=do_motion, particle_data=particle_data)        
 
-        if not P:
+        if not len(P):
             return
 
-        nm_pts = len(P)
+        nm_pts = len(P) // 3
         sg_node.Define(nm_pts)          
 
         primvar = sg_node.GetPrimVars()
@@ -168,14 +194,14 @@ class RmanFluidTranslator(RmanTranslator):
         if do_motion and rman_sg_fluid.motion_steps:
             super().set_primvar_times(rman_sg_fluid.motion_steps, primvar)
         
-        particles_utils.get_primvars_particle(primvar, cur_frame, psys, [cur_frame], 0)      
+        particles_utils.get_primvars_particle(primvar, cur_frame, psys, [cur_frame], 0, particle_data=particle_data)      
         
         if do_motion:
-            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P, "vertex", 0) 
-            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, next_P, "vertex", 1)  
+            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P.data, "vertex", 0) 
+            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, next_P.data, "vertex", 1)  
         else:
-            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P, "vertex")               
-        primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, width, "vertex")
+            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P.data, "vertex")               
+        primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, width.data, "vertex")
         super().export_object_primvars(ob, primvar)
         sg_node.SetPrimVars(primvar)
 
@@ -217,12 +243,14 @@ class RmanFluidTranslator(RmanTranslator):
         primvar.SetString(self.rman_scene.rman.Tokens.Rix.k_Ri_type, "box")
         primvar.SetFloatArray(self.rman_scene.rman.Tokens.Rix.k_Ri_Bound, transform_utils.convert_ob_bounds(ob.bound_box), 6)
 
-        primvar.SetFloatDetail("density", fluid_data.density_grid, "varying")
-        primvar.SetFloatDetail("flame", fluid_data.flame_grid, "varying")   
-        primvar.SetFloatDetail("heat", fluid_data.heat_grid, "varying")
-        primvar.SetColorDetail("color", [item for index, item in enumerate(fluid_data.color_grid) if index % 4 != 0], "varying")
-        primvar.SetVectorDetail("velocity", fluid_data.velocity_grid, "varying")
-        primvar.SetFloatDetail("temperature", fluid_data.temperature_grid, "varying")
+        primvar.SetFloatDetail("density", get_fluid_grid(fluid_data.density_grid).data, "varying")
+        primvar.SetFloatDetail("flame", get_fluid_grid(fluid_data.flame_grid).data, "varying")   
+        primvar.SetFloatDetail("heat", get_fluid_grid(fluid_data.heat_grid).data, "varying")
+        # the color grid is RGBA, strip the alpha
+        color = get_fluid_grid(fluid_data.color_grid).reshape(-1, 4)[:, :3]
+        primvar.SetColorDetail("color", np.ascontiguousarray(color).data, "varying")
+        primvar.SetVectorDetail("velocity", get_fluid_grid(fluid_data.velocity_grid).data, "varying")
+        primvar.SetFloatDetail("temperature", get_fluid_grid(fluid_data.temperature_grid).data, "varying")
         scenegraph_utils.export_vol_aggregate(self.rman_scene.bl_scene, primvar, ob)
         super().export_object_primvars(ob, primvar)
         rman_sg_fluid.rman_sg_volume_node.SetPrimVars(primvar)         
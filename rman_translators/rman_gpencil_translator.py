@@ -1,28 +1,132 @@
 from .rman_translator import RmanTranslator
 from ..rman_sg_nodes.rman_sg_gp import RmanSgGreaseP
 from ..rfb_utils import object_utils
-from ..rfb_utils import string_utils
 from ..rfb_utils import scenegraph_utils
+from ..rfb_utils import curves_utils
 from ..rfb_logger import rfb_log
-from mathutils import Vector, Matrix
 
 import bpy
-import math
 import numpy as np
 
 _BIAS_ = 0.0000001
 _ADJUST_POINT_ = False
 _ADJUST_IN_NORMAL_DIR_FOR_FILLS_ = False
 
+class RmanGPencilStrokes:
+    '''
+    Packed data for a set of strokes in a layer frame.
+
+    Attributes:
+        stroke_ids (numpy.ndarray) - index of each stroke in the layer frame
+        num_points (numpy.ndarray) - number of points in each stroke
+        num_triangles (numpy.ndarray) - number of fill triangles in each stroke
+        line_width (numpy.ndarray) - line width of each stroke
+        P (numpy.ndarray) - (n, 3) points of all strokes
+        pressure (numpy.ndarray) - pressure of all points
+        st (numpy.ndarray) - (n, 2) fill uvs of all points, or None
+        triangles (numpy.ndarray) - (t, 3) fill triangles, indexing into P
+    '''
+
+    def __init__(self, stroke_ids, num_points, num_triangles, line_width, P, pressure, st, triangles):
+        self.stroke_ids = stroke_ids
+        self.num_points = num_points
+        self.num_triangles = num_triangles
+        self.line_width = line_width
+        self.P = P
+        self.pressure = pressure
+        self.st = st
+        self.triangles = triangles
+
+    @property
+    def first_points(self):
+        return np.cumsum(self.num_points) - self.num_points
+
+    def subset(self, mask):
+        '''
+        Return a new RmanGPencilStrokes with only the strokes in mask.
+        '''
+        pt_mask = np.repeat(mask, self.num_points)
+        tri_mask = np.repeat(mask, self.num_triangles)
+        num_points = self.num_points[mask]
+
+        # shift the triangle indices to the new position of their stroke's points
+        shift = np.zeros(len(mask), dtype=np.int32)
+        shift[mask] = (np.cumsum(num_points) - num_points) - self.first_points[mask]
+        tri_strokes = np.repeat(np.arange(len(mask)), self.num_triangles)[tri_mask]
+        triangles = self.triangles[tri_mask] + shift[tri_strokes][:, np.newaxis]
+
+        st = self.st[pt_mask] if self.st is not None else None
+        return RmanGPencilStrokes(self.stroke_ids[mask], num_points, self.num_triangles[mask],
+                                self.line_width[mask], self.P[pt_mask], self.pressure[pt_mask],
+                                st, triangles)
+
+def _read_stroke_attr(strokes, counts, collection, attr, size, dtype=np.float32):
+    # one foreach_get per stroke, into a slice of the packed array
+    arr = np.zeros(int(counts.sum())*size, dtype=dtype)
+    start = 0
+    for stroke, count in zip(strokes, counts):
+        end = start + int(count)*size
+        if end > start:
+            getattr(stroke, collection).foreach_get(attr, arr[start:end])
+        start = end
+    return arr
+
+def get_layer_frame_strokes(frame):
+    '''
+    Read all of the strokes of a layer frame, and group them by material.
+
+    Arguments:
+        frame (bpy.types.GPencilFrame) - the layer frame
+
+    Returns:
+        (dict) - material index -> RmanGPencilStrokes
+    '''
+    strokes = frame.strokes
+    num_strokes = len(strokes)
+    if num_strokes < 1:
+        return dict()
+
+    material_index = np.zeros(num_strokes, dtype=np.int32)
+    line_width = np.zeros(num_strokes, dtype=np.int32)
+    strokes.foreach_get('material_index', material_index)
+    strokes.foreach_get('line_width', line_width)
+    num_points = np.array([len(s.points) for s in strokes], dtype=np.int32)
+    num_triangles = np.array([len(s.triangles) for s in strokes], dtype=np.int32)
+
+    P = _read_stroke_attr(strokes, num_points, 'points', 'co', 3).reshape(-1, 3)
+    pressure = _read_stroke_attr(strokes, num_points, 'points', 'pressure', 1)
+
+    st = None
+    first_stroke = next((s for s in strokes if len(s.points) > 0), None)
+    if first_stroke and hasattr(first_stroke.points[0], 'uv_fill'):
+        st = _read_stroke_attr(strokes, num_points, 'points', 'uv_fill', 2).reshape(-1, 2)
+
+    triangles = np.zeros((3, int(num_triangles.sum())), dtype=np.int32)
+    for i, attr in enumerate(['v1', 'v2', 'v3']):
+        triangles[i] = _read_stroke_attr(strokes, num_triangles, 'triangles', attr, 1, dtype=np.int32)
+    # triangle indices are local to their stroke
+    first_points = np.cumsum(num_points) - num_points
+    triangles = triangles.T + np.repeat(first_points, num_triangles)[:, np.newaxis]
+
+    all_strokes = RmanGPencilStrokes(np.arange(num_strokes, dtype=np.int32), num_points, num_triangles,
+                                    line_width, P, pressure, st, triangles)
+    batches = dict()
+    for mat_index in np.unique(material_index):
+        batches[int(mat_index)] = all_strokes.subset(material_index == mat_index)
+    return batches
+
 class RmanGPencilTranslator(RmanTranslator):
 
     def __init__(self, rman_scene):
         super().__init__(rman_scene)
-        self.bl_type = 'GPENCIL' 
+        self.bl_type = 'GPENCIL'
+
+        # grease pencil datablock -> {(layer, frame number): {material index: RmanGPencilStrokes}}
+        self.layer_frame_cache = dict()
 
     def export(self, ob, db_name):
         prim_type = object_utils._detect_primitive_(ob)
-        
+
         sg_node = self.rman_scene.sg_scene.CreateGroup(db_name)
         rman_sg_gpencil = RmanSgGreaseP(self.rman_scene, sg_node, db_name)
 
@@ -31,179 +135,170 @@ class RmanGPencilTranslator(RmanTranslator):
     def update(self, ob, rman_sg_gpencil):
         for c in [ rman_sg_gpencil.sg_node.GetChild(i) for i in range(0, rman_sg_gpencil.sg_node.GetNumChildren())]:
             rman_sg_gpencil.sg_node.RemoveChild(c)
-            self.rman_scene.sg_scene.DeleteDagNode(c)        
-        
-        self._get_strokes_(ob, rman_sg_gpencil)     
-
-        return True    
-
-    def _create_mesh(self, ob, i, lyr, stroke, mat, rman_sg_gpencil, rman_sg_material, adjust_point=False):
-
-        gp_ob = ob.data     
-
-        pts = stroke.points
-        nverts = []
-        verts = []
-        st = []
-
-        mesh_sg = self.rman_scene.sg_scene.CreateMesh('%s-MESH-%d' % (lyr.info, i))
-
-        # get points
-        num_pts = len(pts)
-        P = np.zeros(num_pts*3, dtype=np.float32)
-        pts.foreach_get('co', P)
-        P = np.reshape(P, (num_pts, 3))
-        P = P.tolist()
-
-        if hasattr(pts[0], 'uv_fill'):
-            st = np.zeros(num_pts*2, dtype=np.float32)
-            pts.foreach_get('uv_fill', st)
-            st = np.reshape(st, (num_pts, 2))
-            st = st.tolist()                
-
-        for t in stroke.triangles:
-            nverts.append(3)
-            verts.append(t.v1)
-            verts.append(t.v2)
-            verts.append(t.v3)       
-
-            if adjust_point:
-
-                if _ADJUST_IN_NORMAL_DIR_FOR_FILLS_:
-                    # move each point in the normal direction a little bit
-                    # for fills                
-                    p1 = Vector(pts[t.v1].co)
-                    p2 = Vector(pts[t.v2].co)
-                    p3 = Vector(pts[t.v3].co)
-                    vec1 = p1 - p2
-                    vec2 = p1 - p3
-                    normal = vec2.cross(vec1).normalized()
-                    epsilon = normal * i * _BIAS_
-
-                    P[t.v1] = Vector(P[t.v1]) + epsilon
-                    P[t.v2] = Vector(P[t.v2]) + epsilon
-                    P[t.v3] = Vector(P[t.v3]) + epsilon
-
-                else:
-                    # get camera position
-                    cam_pos, rot, sca = self.rman_scene.main_camera.bl_camera.matrix_world.decompose()
-
-                    epsilon = i * _BIAS_
-                    P[t.v1] = Vector(P[t.v1]) + ((cam_pos - Vector(P[t.v1])).normalized() * epsilon)
-                    P[t.v2] = Vector(P[t.v2]) + ((cam_pos - Vector(P[t.v2])).normalized() * epsilon)
-                    P[t.v3] = Vector(P[t.v3]) + ((cam_pos - Vector(P[t.v3])).normalized() * epsilon)
+            self.rman_scene.sg_scene.DeleteDagNode(c)
+
+        self._get_strokes_(ob, rman_sg_gpencil)
+
+        return True
+
+    def clear_layer_frame_cache(self, gp_data=None):
+        '''
+        Clear the cached layer frames for a grease pencil datablock, or
+        for all datablocks if gp_data is None.
+        '''
+        if gp_data is None:
+            self.layer_frame_cache.clear()
+        else:
+            self.layer_frame_cache.pop(gp_data, None)
+
+    def _adjust_points(self, P, bias):
+        # move each point towards the camera a little bit
+        cam_pos, rot, sca = self.rman_scene.main_camera.bl_camera.matrix_world.decompose()
+        vec = np.array(cam_pos, dtype=np.float32) - P
+        length = np.linalg.norm(vec, axis=1)[:, np.newaxis]
+        vec = np.divide(vec, length, out=np.zeros_like(vec), where=length != 0.0)
+        return (P + vec * (bias * _BIAS_)[:, np.newaxis]).astype(np.float32)
+
+    def _create_mesh(self, ob, name, strokes, bias, mat, rman_sg_gpencil, rman_sg_material, adjust_point=False):
+        P = strokes.P
+        triangles = strokes.triangles
 
+        if adjust_point:
+            tri_bias = np.repeat(bias, strokes.num_triangles)
+            if _ADJUST_IN_NORMAL_DIR_FOR_FILLS_:
+                # move each point in the normal direction a little bit
+                # for fills
+                p1 = P[triangles[:, 0]]
+                normal = np.cross(p1 - P[triangles[:, 2]], p1 - P[triangles[:, 1]])
+                length = np.linalg.norm(normal, axis=1)[:, np.newaxis]
+                normal = np.divide(normal, length, out=np.zeros_like(normal), where=length != 0.0)
+                epsilon = normal * (tri_bias * _BIAS_)[:, np.newaxis]
+                P = P.copy()
+                for k in range(3):
+                    np.add.at(P, triangles[:, k], epsilon)
+            else:
+                # each triangle a point belongs to moves it
+                pt_bias = np.zeros(len(P), dtype=np.float32)
+                for k in range(3):
+                    np.add.at(pt_bias, triangles[:, k], tri_bias)
+                P = self._adjust_points(P, pt_bias)
+
+        num_pts = len(P)
+        num_polygons = len(triangles)
+        nverts = np.full(num_polygons, 3, dtype=np.int32)
+        verts = np.ascontiguousarray(triangles, dtype=np.int32).reshape(-1)
+        P = np.ascontiguousarray(P, dtype=np.float32).reshape(-1)
+        stroke_ids = np.repeat(strokes.stroke_ids, strokes.num_triangles).astype(np.int32)
+
+        mesh_sg = self.rman_scene.sg_scene.CreateMesh('%s-MESH' % name)
+        mesh_sg.Define( num_polygons, num_pts, len(verts) )
 
-        num_polygons = len(stroke.triangles)
-        num_verts = len(verts)
-        mesh_sg.Define( num_polygons, num_pts, num_verts )
-                            
         primvar = mesh_sg.GetPrimVars()
-        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P, "vertex")
-
-        primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, nverts, "uniform")
-        primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_vertices, verts, "facevarying")  
-        if st:
-            primvar.SetFloatArrayDetail("st", st, 2, "vertex")  
-        super().export_object_primvars(ob, primvar)            
+        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P.data, "vertex")
+
+        primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, nverts.data, "uniform")
+        primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_vertices, verts.data, "facevarying")
+        primvar.SetIntegerDetail("stroke_id", stroke_ids.data, "uniform")
+        if strokes.st is not None:
+            st = np.ascontiguousarray(strokes.st, dtype=np.float32).reshape(-1)
+            primvar.SetFloatArrayDetail("st", st.data, 2, "vertex")
+        super().export_object_primvars(ob, primvar)
         mesh_sg.SetPrimVars(primvar)
         if rman_sg_material:
             scenegraph_utils.set_material(mesh_sg, rman_sg_material.sg_fill_mat, rman_sg_material, mat=mat, ob=ob)
-        rman_sg_gpencil.sg_node.AddChild(mesh_sg)     
+        rman_sg_gpencil.sg_node.AddChild(mesh_sg)
 
-    def _create_points(self, ob, i, lyr, stroke, mat, rman_sg_gpencil, rman_sg_material, adjust_point=False):
-        gp_ob = ob.data 
+    def _create_points(self, ob, name, strokes, bias, mat, rman_sg_gpencil, rman_sg_material, adjust_point=False):
+        num_pts = len(strokes.P)
+        if num_pts < 1:
+            return
 
-        num_pts = len(stroke.points)
-        points = np.zeros(num_pts*3, dtype=np.float32)
-        widths = np.zeros(num_pts, dtype=np.float32)
-        stroke.points.foreach_get('co', points)
-        stroke.points.foreach_get('pressure', widths)
+        points = strokes.P
+        if adjust_point:
+            points = self._adjust_points(points, np.repeat(bias, strokes.num_points))
+        points = np.ascontiguousarray(points, dtype=np.float32).reshape(-1)
 
-        points = np.reshape(points, (num_pts, 3))
-        points = points.tolist()    
+        width_factor = 0.0012 * np.repeat(strokes.line_width, strokes.num_points)
+        widths = (strokes.pressure * width_factor).astype(np.float32) #0.03
+        stroke_ids = np.repeat(strokes.stroke_ids, strokes.num_points).astype(np.int32)
 
-        if adjust_point:
-            cam_pos, rot, sca = self.rman_scene.main_camera.bl_camera.matrix_world.decompose()
-            for j, pt in enumerate(points):
-                epsilon = i * _BIAS_            
-                points[j] = Vector(pt) + ((cam_pos - Vector(pt)).normalized() * epsilon)              
-        
-        width_factor = 0.0012 * stroke.line_width
-        widths = widths * width_factor #0.03
-        widths = widths.tolist()
-
-        points_sg = self.rman_scene.sg_scene.CreatePoints("%s-DOTS-%d" % (lyr.info, i))
-        i += 1                
+        points_sg = self.rman_scene.sg_scene.CreatePoints("%s-DOTS" % name)
         points_sg.Define(num_pts)
         primvar = points_sg.GetPrimVars()
 
-        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, points, "vertex")  
-        primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, widths, "vertex")              
-                    
-        super().export_object_primvars(ob, primvar)                    
+        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, points.data, "vertex")
+        primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, widths.data, "vertex")
+        primvar.SetIntegerDetail("stroke_id", stroke_ids.data, "vertex")
+
+        super().export_object_primvars(ob, primvar)
         points_sg.SetPrimVars(primvar)
 
         # Attach material
         if rman_sg_material:
-            scenegraph_utils.set_material(points_sg, rman_sg_material.sg_strok_mat, rman_sg_material, mat=mat, ob=ob)
-
-        rman_sg_gpencil.sg_node.AddChild(points_sg)                     
-        
-    def _create_curve(self, ob, i, lyr, stroke, mat, rman_sg_gpencil, rman_sg_material, adjust_point=False):
-        gp_ob = ob.data       
-
-        vertsArray = []
-        num_pts = len(stroke.points)
-        points = np.zeros(num_pts*3, dtype=np.float32)
-        widths = np.zeros(num_pts, dtype=np.float32)
-        stroke.points.foreach_get('co', points)
-        stroke.points.foreach_get('pressure', widths)
-
-        points = np.reshape(points, (num_pts, 3))
-        points = points.tolist()        
-        
-        width_factor = 0.00083 * stroke.line_width
-        widths = widths * width_factor #0.05
-        widths = widths.tolist()
-
-        # double the first and last
-        points = points[:1] + \
-            points + points[-1:]
-
-        if len(points) < 4:
-            # not enough points to be a curve. export as points
-            self._create_points(ob, i, lyr, stroke, mat, rman_sg_gpencil, rman_sg_material, adjust_point=adjust_point)
+            scenegraph_utils.set_material(points_sg, rman_sg_material.sg_stroke_mat, rman_sg_material, mat=mat, ob=ob)
+
+        rman_sg_gpencil.sg_node.AddChild(points_sg)
+
+    def _create_curves(self, ob, name, strokes, bias, mat, rman_sg_gpencil, rman_sg_material, adjust_point=False):
+        # strokes with less than 2 points are not enough to be a curve. export as points
+        is_curve = strokes.num_points >= 2
+        if not is_curve.all():
+            self._create_points(ob, name, strokes.subset(~is_curve), bias[~is_curve], mat, rman_sg_gpencil, rman_sg_material, adjust_point=adjust_point)
+            strokes = strokes.subset(is_curve)
+            bias = bias[is_curve]
+        num_curves = len(strokes.num_points)
+        if num_curves < 1:
             return
 
-        if adjust_point:
-            cam_pos, rot, sca = self.rman_scene.main_camera.bl_camera.matrix_world.decompose()            
-            for j, pt in enumerate(points):
-                epsilon = i * _BIAS_            
-                points[j] = Vector(pt) + ((cam_pos - Vector(pt)).normalized() * epsilon)            
-
-        widths = widths[:1] + widths + widths[-1:]
-        vertsArray.append(len(points))
+        width_factor = 0.00083 * np.repeat(strokes.line_width, strokes.num_points)
+        widths = strokes.pressure * width_factor #0.05
 
-        curves_sg = self.rman_scene.sg_scene.CreateCurves("%s-STROKE-%d" % (lyr.info, i))
-        i += 1                
-        curves_sg.Define(self.rman_scene.rman.Tokens.Rix.k_cubic, "nonperiodic", "catmull-rom", len(vertsArray), len(points))
+        # double the first and last
+        strand_ids, point_ids, nvertices = curves_utils.get_strand_vertex_indices(strokes.num_points, strokes.first_points)
+        points = strokes.P[point_ids]
+        if adjust_point:
+            points = self._adjust_points(points, bias[strand_ids])
+        points = np.ascontiguousarray(points, dtype=np.float32).reshape(-1)
+        widths = widths[point_ids].astype(np.float32)
+        nvertices = nvertices.astype(np.int32)
+        index = np.arange(num_curves, dtype=np.int32)
+        stroke_ids = strokes.stroke_ids.astype(np.int32)
+
+        curves_sg = self.rman_scene.sg_scene.CreateCurves("%s-STROKE" % name)
+        curves_sg.Define(self.rman_scene.rman.Tokens.Rix.k_cubic, "nonperiodic", "catmull-rom", num_curves, len(points) // 3)
         primvar = curves_sg.GetPrimVars()
 
-        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, points, "vertex")                
-        primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, vertsArray, "uniform")
-        primvar.SetIntegerDetail("index", range(len(vertsArray)), "uniform")
+        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, points.data, "vertex")
+        primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, nvertices.data, "uniform")
+        primvar.SetIntegerDetail("index", index.data, "uniform")
+        primvar.SetIntegerDetail("stroke_id", stroke_ids.data, "uniform")
+
+        primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, widths.data, "vertex")
 
-        primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, widths, "vertex")
-                    
-        super().export_object_primvars(ob, primvar)                    
+        super().export_object_primvars(ob, primvar)
         curves_sg.SetPrimVars(primvar)
 
         # Attach material
-        if rman_sg_material:      
+        if rman_sg_material:
             scenegraph_utils.set_material(curves_sg, rman_sg_material.sg_stroke_mat, rman_sg_material, mat=mat, ob=ob)
 
-        rman_sg_gpencil.sg_node.AddChild(curves_sg)    
+        rman_sg_gpencil.sg_node.AddChild(curves_sg)
+
+    def _get_layer_frame_strokes(self, ob, lyr, frame):
+        # modifiers can change the evaluated strokes on every frame, so
+        # only cache layer frames for objects without any
+        if len(ob.grease_pencil_modifiers) > 0:
+            return get_layer_frame_strokes(frame)
+
+        cache = self.layer_frame_cache.setdefault(ob.data.original, dict())
+        key = (lyr.info, frame.frame_number)
+        batches = cache.get(key, None)
+        if batches is None:
+            batches = get_layer_frame_strokes(frame)
+            cache[key] = batches
+        else:
+            rfb_log().debug("Using cached strokes for layer: %s, frame: %d" % (lyr.info, frame.frame_number))
+        return batches
 
     def _get_strokes_(self, ob, rman_sg_gpencil):
 
@@ -217,25 +312,32 @@ class RmanGPencilTranslator(RmanTranslator):
             frame = lyr.active_frame
             if not frame:
                 continue
-            for i, stroke in enumerate(frame.strokes):
-                j += i
-                mat =  gp_ob.materials[stroke.material_index]
-                if mat.grease_pencil.hide:
-                    continue      
-                rman_sg_material = self.rman_scene.rman_materials.get(mat.original, None)
-
-                if len(stroke.triangles) > 0 and rman_sg_material.sg_fill_mat:
-                    self._create_mesh(ob, j, lyr, stroke, mat, rman_sg_gpencil, rman_sg_material, adjust_point=_ADJUST_POINT_) 
-                    if rman_sg_material.sg_stroke_mat:
-                        if mat.grease_pencil.mode in ['DOTS', 'BOX']:
-                            self._create_points(ob, j, lyr, stroke, mat, rman_sg_gpencil, rman_sg_material, adjust_point=_ADJUST_POINT_)
-                        else:
-                            self._create_curve(ob, j, lyr, stroke, mat, rman_sg_gpencil, rman_sg_material, adjust_point=_ADJUST_POINT_)                        
 
+            batches = self._get_layer_frame_strokes(ob, lyr, frame)
+            for mat_index, strokes in batches.items():
+                mat =  gp_ob.materials[mat_index]
+                if not mat or mat.grease_pencil.hide:
+                    continue
+                rman_sg_material = self.rman_scene.rman_materials.get(mat.original, None)
+                name = '%s-%d' % (lyr.info, mat_index)
+                bias = j + strokes.stroke_ids
+
+                # strokes with triangles get a fill mesh, and are only outlined
+                # if the material has a stroke
+                has_fill = strokes.num_triangles > 0
+                if not (rman_sg_material and rman_sg_material.sg_fill_mat):
+                    has_fill[:] = False
+                if has_fill.any():
+                    self._create_mesh(ob, name, strokes.subset(has_fill), bias[has_fill], mat, rman_sg_gpencil, rman_sg_material, adjust_point=_ADJUST_POINT_)
+
+                has_outline = ~has_fill
+                if rman_sg_material and rman_sg_material.sg_stroke_mat:
+                    has_outline[:] = True
+                if not has_outline.any():
+                    continue
+                outlines = strokes.subset(has_outline)
+                if mat.grease_pencil.mode in ['DOTS', 'BOX']:
+                    self._create_points(ob, name, outlines, bias[has_outline], mat, rman_sg_gpencil, rman_sg_material, adjust_point=_ADJUST_POINT_)
                 else:
-                    if mat.grease_pencil.mode in ['DOTS', 'BOX']:
-                        self._create_points(ob, j, lyr, stroke, mat, rman_sg_gpencil, rman_sg_material, adjust_point=_ADJUST_POINT_)
-                    else:
-                        self._create_curve(ob, j, lyr, stroke, mat, rman_sg_gpencil, rman_sg_material, adjust_point=_ADJUST_POINT_)               
-                i +=1
-            j += 1
\ No newline at end of file
+                    self._create_curves(ob, name, outlines, bias[has_outline], mat, rman_sg_gpencil, rman_sg_material, adjust_point=_ADJUST_POINT_)
+            j += len(frame.strokes)
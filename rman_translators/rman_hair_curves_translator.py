@@ -3,22 +3,22 @@ from ..rfb_utils import transform_utils
 from ..rfb_utils import scenegraph_utils
 from ..rfb_utils.timer_utils import time_this
 from ..rfb_utils.scene_utils import BlAttribute
+from ..rfb_utils import curves_utils
 from ..rfb_logger import rfb_log
 from ..rman_sg_nodes.rman_sg_haircurves import RmanSgHairCurves
-from mathutils import Vector
 import math
 import bpy    
 import numpy as np
-from copy import deepcopy
+from copy import copy
 
 class BlHair:
 
     def __init__(self):        
-        self.points = []
-        self.vertsArray = []
+        self.points = np.zeros(0, dtype=np.float32)
+        self.vertsArray = np.zeros(0, dtype=np.int32)
         self.nverts = 0
-        self.hair_width = []
-        self.index = []
+        self.hair_width = np.zeros(0, dtype=np.float32)
+        self.index = np.zeros(0, dtype=np.int32)
         self.bl_hair_attributes = dict()
 class RmanHairCurvesTranslator(RmanTranslator):
 
@@ -48,7 +48,7 @@ class RmanHairCurvesTranslator(RmanTranslator):
                 continue
             primvar = curves_sg.GetPrimVars()
 
-            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, bl_curve.points, "vertex", time_sample)  
+            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, bl_curve.points.data, "vertex", time_sample)  
             curves_sg.SetPrimVars(primvar)
 
     def get_child(self, i, rman_sg_hair):
@@ -69,16 +69,16 @@ class RmanHairCurvesTranslator(RmanTranslator):
 
         for i, bl_curve in enumerate(curves):
             curves_sg = self.get_child(i, rman_sg_hair)
-            curves_sg.Define(self.rman_scene.rman.Tokens.Rix.k_cubic, "nonperiodic", "catmull-rom", len(bl_curve.vertsArray), len(bl_curve.points))
+            curves_sg.Define(self.rman_scene.rman.Tokens.Rix.k_cubic, "nonperiodic", "catmull-rom", len(bl_curve.vertsArray), bl_curve.nverts)
             primvar = curves_sg.GetPrimVars()                  
-            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, bl_curve.points, "vertex")
+            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, bl_curve.points.data, "vertex")
 
-            primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, bl_curve.vertsArray, "uniform")
+            primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, bl_curve.vertsArray.data, "uniform")
             index_nm = 'index'
-            primvar.SetIntegerDetail(index_nm, bl_curve.index, "uniform")
+            primvar.SetIntegerDetail(index_nm, bl_curve.index.data, "uniform")
 
             width_detail = "vertex" 
-            primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, bl_curve.hair_width, width_detail)
+            primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, bl_curve.hair_width.data, width_detail)
             
             BlAttribute.set_rman_primvars(primvar, bl_curve.bl_hair_attributes)
                     
@@ -92,36 +92,46 @@ class RmanHairCurvesTranslator(RmanTranslator):
         
     def get_attributes(self, ob, bl_hair_attributes):
         detail_map = { len(ob.data.points): 'vertex', len(ob.data.curves): 'uniform'}
-        BlAttribute.parse_attributes(bl_hair_attributes, ob, detail_map, values_as_list=True)
+        BlAttribute.parse_attributes(bl_hair_attributes, ob, detail_map)
         if 'color' in bl_hair_attributes:
             # rename color to Cs
             v = bl_hair_attributes['color']
             v.rman_name = 'Cs'
             bl_hair_attributes['color'] = v
-            
-    def get_attributes_for_curves(self, ob, bl_hair_attributes, bl_curve, idx, fp_idx, npoints):
-        uv_map = ob.original.data.surface_uv_map
-        for attr in ob.data.attributes:
-            if attr.name.startswith('.'):
-                continue
-            if attr.name not in bl_hair_attributes:
+
+    def get_attributes_for_curves(self, ob, bl_hair_attributes, bl_curve, curve_ids, point_ids):
+        '''
+        Get the attribute values for a chunk of curves.
+
+        Args:
+            bl_hair_attributes (dict) - the attributes for the whole Curves datablock
+            bl_curve (BlHair) - the chunk of curves
+            curve_ids (numpy.ndarray) - the curve index of each curve in the chunk
+            point_ids (numpy.ndarray) - the point index of each vertex in the chunk, 
+                                        with the end points duplicated
+        '''
+        num_points = len(ob.data.points)
+        num_curves = len(ob.data.curves)
+        for nm, hair_attr in bl_hair_attributes.items():
+            if hair_attr.rman_detail == "uniform":
+                n = num_curves
+                ids = curve_ids
+            else:
+                # if the detail is vertex, use the point indices, 
+                # which already have the end points duplicated
+                n = num_points
+                ids = point_ids
+            values = hair_attr.values
+            if n < 1 or len(values) % n != 0:
                 continue
-            hair_attr = bl_hair_attributes[attr.name]
+            values = np.reshape(values, (n, -1))
 
-            hair_curve_attr = bl_curve.bl_hair_attributes.get(attr.name, BlAttribute())
+            hair_curve_attr = BlAttribute()
             hair_curve_attr.rman_name = hair_attr.rman_name
             hair_curve_attr.rman_detail = hair_attr.rman_detail
             hair_curve_attr.rman_type = hair_attr.rman_type
-            if hair_attr.rman_detail == "uniform":
-                hair_curve_attr.values.append(hair_attr.values[idx])
-            else:
-                # if the detail is vertex, use the first point index
-                # and npoints to get the values we need
-                # we also need to duplicate the end points, like we do for P
-                vals = hair_attr.values[fp_idx:fp_idx+npoints]
-                vals = vals[:1] + vals + vals[-1:]
-                hair_curve_attr.values.append(vals)
-            bl_curve.bl_hair_attributes[attr.name] = hair_curve_attr
+            hair_curve_attr.values = np.ascontiguousarray(values[ids]).reshape(-1)
+            bl_curve.bl_hair_attributes[nm] = hair_curve_attr
 
     def _copy_uv_map(self, ob, bl_hair_attributes, bl_curve):
         # make a copy of the uv_map to scalpST         
@@ -129,7 +139,7 @@ class RmanHairCurvesTranslator(RmanTranslator):
         hair_attr = bl_hair_attributes.get(uv_map, None)
         hair_curve_attr = bl_curve.bl_hair_attributes.get(uv_map, None)
         if hair_attr and hair_curve_attr and hair_attr.rman_type == 'float2':
-            attr_copy = deepcopy(hair_curve_attr)
+            attr_copy = copy(hair_curve_attr)
             attr_copy.rman_name = 'scalpST'
             bl_curve.bl_hair_attributes['scalpST'] = attr_copy
 
@@ -137,57 +147,56 @@ class RmanHairCurvesTranslator(RmanTranslator):
     def _get_strands_(self, ob):
 
         curve_sets = []
-        bl_curve = BlHair()
         db = ob.data
+        num_curves = len(db.curves)
+        num_points = len(db.points)
+        if num_curves < 1 or num_points < 1:
+            return curve_sets
+
+        offsets = np.zeros(num_curves+1, dtype=np.int32)
+        db.curve_offset_data.foreach_get('value', offsets)
+        first_points = offsets[:-1]
+        lengths = np.diff(offsets)
+        if (lengths < 4).any():
+            rfb_log().error("We do not support curves with only 4 control points")
+            return []
+
+        positions = np.zeros(num_points*3, dtype=np.float32)
+        db.points.foreach_get('position', positions)
+        positions = np.reshape(positions, (num_points, 3))
+        radius = np.zeros(num_points, dtype=np.float32)
+        db.points.foreach_get('radius', radius)
+
+        # if the radius of a curve is 0, default to 0.005
+        nonzero = np.add.reduceat((radius != 0.0).astype(np.int32), first_points)
+        zero_radius = np.repeat(nonzero == 0, lengths)
+        radius[zero_radius] = 0.005
+        widths = radius * 2
+
         bl_hair_attributes = dict()
         self.get_attributes(ob, bl_hair_attributes)
-        for curve in db.curves:
-            if curve.points_length < 4:
-                rfb_log().error("We do not support curves with only 4 control points")
-                return []
-
-            npoints = len(curve.points)
-            strand_points = np.zeros(npoints*3, dtype=np.float32)
-            widths = np.zeros(npoints, dtype=np.float32)
-            curve.points.foreach_get('position', strand_points)
-            curve.points.foreach_get('radius', widths)
-            strand_points = np.reshape(strand_points, (npoints, 3))
-            if np.count_nonzero(widths) == 0:
-                # radius is 0. Default to 0.005
-                widths.fill(0.005)
-            widths = widths * 2
-            strand_points = strand_points.tolist()
-            widths = widths.tolist()
-
-            
-            # double the end points
-            strand_points = strand_points[:1] + \
-                strand_points + strand_points[-1:]
 
-            widths = widths[:1] + widths + widths[-1:]
-            
-            vertsInStrand = len(strand_points)
-
-            bl_curve.points.extend(strand_points)
-            bl_curve.vertsArray.append(vertsInStrand)
-            bl_curve.hair_width.extend(widths)
-            bl_curve.index.append(curve.index)
-            bl_curve.nverts += vertsInStrand           
-
-            self.get_attributes_for_curves(ob, bl_hair_attributes, bl_curve, curve.index, curve.first_point_index, npoints)
-               
-            # FIXME: is this still needed? 
-            # if we get more than 100000 vertices, start a new BlHair.  This
-            # is to avoid a maxint on the array length        
-            if bl_curve.nverts > 100000:
-                self._copy_uv_map(ob, bl_hair_attributes, bl_curve)
-                curve_sets.append(bl_curve)
-                bl_curve = BlHair()
-            
-
-        if bl_curve.nverts > 0:
-            self._copy_uv_map(ob, bl_hair_attributes, bl_curve)       
+        # double the end points
+        strand_ids, point_ids, verts_per_strand = curves_utils.get_strand_vertex_indices(lengths, first_points=first_points)
+        vert_offsets = np.cumsum(verts_per_strand) - verts_per_strand
+
+        # FIXME: is this still needed? 
+        # if we get more than 100000 vertices, start a new BlHair.  This
+        # is to avoid a maxint on the array length        
+        for start, end in curves_utils.split_strands(verts_per_strand):
+            vstart = int(vert_offsets[start])
+            vend = int(vert_offsets[end-1] + verts_per_strand[end-1])
+            chunk_point_ids = point_ids[vstart:vend]
+            curve_ids = np.arange(start, end, dtype=np.int32)
+
+            bl_curve = BlHair()
+            bl_curve.points = np.ascontiguousarray(positions[chunk_point_ids]).reshape(-1)
+            bl_curve.vertsArray = verts_per_strand[start:end].astype(np.int32)
+            bl_curve.hair_width = widths[chunk_point_ids]
+            bl_curve.index = curve_ids
+            bl_curve.nverts = vend - vstart
+            self.get_attributes_for_curves(ob, bl_hair_attributes, bl_curve, curve_ids, chunk_point_ids)
+            self._copy_uv_map(ob, bl_hair_attributes, bl_curve)
             curve_sets.append(bl_curve)
 
-        return curve_sets              
-            
+        return curve_sets
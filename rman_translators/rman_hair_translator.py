@@ -2,8 +2,9 @@ from .rman_translator import RmanTranslator
 from ..rfb_utils import transform_utils
 from ..rfb_utils import scenegraph_utils
 from ..rfb_logger import rfb_log
+from ..rfb_utils import particles_utils
+from ..rfb_utils import curves_utils
 from ..rman_sg_nodes.rman_sg_hair import RmanSgHair
-from mathutils import Vector
 import math
 import bpy    
 import numpy as np
@@ -11,17 +12,32 @@ import numpy as np
 class BlHair:
 
     def __init__(self):        
-        self.points = []
-        self.next_points = []
-        self.vertsArray = []
-        self.scalpST = []
-        self.mcols = []
+        self.points = np.zeros(0, dtype=np.float32)
+        self.next_points = np.zeros(0, dtype=np.float32)
+        self.vertsArray = np.zeros(0, dtype=np.int32)
+        self.scalpST = np.zeros(0, dtype=np.float32)
+        self.mcols = np.zeros(0, dtype=np.float32)
         self.nverts = 0
-        self.hair_width = []
+        self.hair_width = np.zeros(0, dtype=np.float32)
 
     @property
     def constant_width(self):
         return (len(self.hair_width) < 2)
+
+def _get_strand_widths_(verts_per_strand, base_width, tip_width):
+    '''
+    Linearly taper the width from base_width to tip_width along each strand.
+    '''
+    nverts = int(verts_per_strand.sum())
+    offsets = np.cumsum(verts_per_strand) - verts_per_strand
+    k = np.arange(nverts) - np.repeat(offsets, verts_per_strand)
+    vv = np.repeat(verts_per_strand, verts_per_strand)
+    decr = (base_width - tip_width) / (vv - 2)
+    widths = base_width - decr * (k - 1)
+    widths[k == 0] = base_width
+    widths[k == vv - 1] = tip_width
+    return widths.astype(np.float32)
+
 class RmanHairTranslator(RmanTranslator):
 
     def __init__(self, rman_scene):
@@ -84,7 +100,7 @@ class RmanHairTranslator(RmanTranslator):
         for i, bl_curve in enumerate(curves):
             curves_sg = self.get_child(i, rman_sg_hair)
             curves_sg.SetTransform(ob_inv_mtx) # puts points in object space
-            curves_sg.Define(self.rman_scene.rman.Tokens.Rix.k_cubic, "nonperiodic", "catmull-rom", len(bl_curve.vertsArray), len(bl_curve.points))
+            curves_sg.Define(self.rman_scene.rman.Tokens.Rix.k_cubic, "nonperiodic", "catmull-rom", len(bl_curve.vertsArray), bl_curve.nverts)
             primvar = curves_sg.GetPrimVars()            
             if rman_sg_hair.motion_steps and psys.settings.renderman.do_velocity_blur:
                 super().set_primvar_times(rman_sg_hair.motion_steps, primvar)            
@@ -92,12 +108,12 @@ class RmanHairTranslator(RmanTranslator):
                 primvar.SetTimes([])
 
             if self.rman_scene.do_motion_blur and psys.settings.renderman.do_velocity_blur:
-                primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, bl_curve.points, "vertex", 0)
-                primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, bl_curve.next_points, "vertex", 1)
+                primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, bl_curve.points.data, "vertex", 0)
+                primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, bl_curve.next_points.data, "vertex", 1)
             else:
-                primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, bl_curve.points, "vertex")
+                primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, bl_curve.points.data, "vertex")
 
-            primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, bl_curve.vertsArray, "uniform")
+            primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, bl_curve.vertsArray.data, "uniform")
             index_nm = psys.settings.renderman.hair_index_name
             if index_nm == '':
                 index_nm = 'index'
@@ -106,13 +122,13 @@ class RmanHairTranslator(RmanTranslator):
             width_detail = "vertex"
             if bl_curve.constant_width:
                 width_detail = "constant" 
-            primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, bl_curve.hair_width, width_detail)
+            primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, bl_curve.hair_width.data, width_detail)
             
             if len(bl_curve.scalpST):
-                primvar.SetFloatArrayDetail("scalpST", bl_curve.scalpST, 2, "uniform")
+                primvar.SetFloatArrayDetail("scalpST", bl_curve.scalpST.data, 2, "uniform")
 
             if len(bl_curve.mcols):
-                primvar.SetColorDetail("Cs", bl_curve.mcols, "uniform")
+                primvar.SetColorDetail("Cs", bl_curve.mcols.data, "uniform")
                     
             curves_sg.SetPrimVars(primvar)
             
@@ -185,80 +201,92 @@ class RmanHairTranslator(RmanTranslator):
                     mcol_set = i
                     break            
 
-        curve_sets = []
-        bl_curve = BlHair()
-        if conwidth:
-            bl_curve.hair_width.append(base_width)
-        
         start_idx = 0
         if psys.settings.child_type != 'NONE' and num_children > 0:
             start_idx = num_parents
-        
-        for pindex in range(start_idx, total_hair_count):
-            particle = psys.particles[
-                (pindex - num_parents) % num_parents]           
-            strand_points = []
-            next_strand_points = []
-            # walk through each strand
-            for step in range(0, steps):           
-                pt = psys.co_hair(ob, particle_no=pindex, step=step)
 
+        if num_parents < 1 or total_hair_count <= start_idx:
+            return []
+
+        # walk through each strand
+        pindices = np.arange(start_idx, total_hair_count)
+        strand_pts = np.zeros((len(pindices), steps, 3), dtype=np.float32)
+        lengths = np.full(len(pindices), steps, dtype=np.int64)
+        co_hair = psys.co_hair
+        for i, pindex in enumerate(pindices.tolist()):
+            row = strand_pts[i]
+            for step in range(0, steps):
+                pt = co_hair(ob, particle_no=pindex, step=step)
                 if pt.length_squared == 0:
-                    # this strand ends prematurely                    
-                    break                
-
-                strand_points.append(pt)
-
-            if len(strand_points) < 2:
-                # not enought points
-                continue
-
-            # double the first and last
-            strand_points = strand_points[:1] + \
-                strand_points + strand_points[-1:]
-                
-            vertsInStrand = len(strand_points)
-
-            # catmull-rom requires at least 4 vertices
-            if vertsInStrand < 4:
-                continue
-
-            if self.rman_scene.do_motion_blur:
-                # calculate the points for the next frame using velocity
-                vel = Vector(particle.velocity / particle.lifetime )
-                next_strand_points = [p + vel for p in strand_points]
-
-            # for varying width make the width array
-            if not conwidth:
-                decr = (base_width - tip_width) / (vertsInStrand - 2)
-                bl_curve.hair_width.extend([base_width] + [(base_width - decr * i)
-                                                for i in range(vertsInStrand - 2)] +
-                                [tip_width])
-
-            bl_curve.points.extend(strand_points)
-            bl_curve.next_points.extend(next_strand_points)
-            bl_curve.vertsArray.append(vertsInStrand)
-            bl_curve.nverts += vertsInStrand
-               
-            # get the scalp ST
+                    # this strand ends prematurely
+                    lengths[i] = step
+                    break
+                row[step] = pt
+
+        # catmull-rom requires at least 4 vertices, after
+        # doubling the first and last
+        keep = lengths >= 2
+        if not keep.any():
+            return []
+        pindices = pindices[keep]
+        strand_pts = strand_pts[keep]
+        lengths = lengths[keep]
+        parent_indices = (pindices - num_parents) % num_parents
+
+        strand_ids, local, verts_per_strand = curves_utils.get_strand_vertex_indices(lengths)
+        points = strand_pts[strand_ids, local]
+
+        next_points = None
+        if self.rman_scene.do_motion_blur:
+            # calculate the points for the next frame using velocity
+            particle_data = particles_utils.RmanParticleData(psys)
+            lifetime = particle_data.lifetime[parent_indices][:, np.newaxis]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                vel = particle_data.velocity[parent_indices] / lifetime
+            vel = np.where(lifetime != 0.0, vel, 0.0).astype(np.float32)
+            next_points = points + vel[strand_ids]
+
+        hair_width = None
+        if not conwidth:
+            hair_width = _get_strand_widths_(verts_per_strand, base_width, tip_width)
+
+        # get the scalp ST and mcol
+        scalpST = None
+        mcols = None
+        if export_st or export_mcol:
+            particles = psys.particles
+            st_list = []
+            mcol_list = []
+            for pindex, parent_index in zip(pindices.tolist(), parent_indices.tolist()):
+                particle = particles[parent_index]
+                if export_st:
+                    st_list.append(psys.uv_on_emitter(psys_modifier, particle=particle, particle_no=pindex, uv_no=uv_set))
+                if export_mcol:
+                    mcol_list.append(psys.mcol_on_emitter(psys_modifier, particle=particle, particle_no=pindex, vcol_no=mcol_set))
             if export_st:
-                st = psys.uv_on_emitter(psys_modifier, particle=particle, particle_no=pindex, uv_no=uv_set)
-                bl_curve.scalpST.append(st)
-
-            # get mcol
-            if export_mcol:                 
-                mcol = psys.mcol_on_emitter(psys_modifier, particle=particle, particle_no=pindex, vcol_no=mcol_set)
-                bl_curve.mcols.append(mcol)
-
-            # if we get more than 100000 vertices, start a new BlHair.  This
-            # is to avoid a maxint on the array length
-            if bl_curve.nverts > 100000:
-                curve_sets.append(bl_curve)
-                bl_curve = BlHair()
-                if conwidth:
-                    bl_curve.hair_width.append(base_width)                
-
-        if bl_curve.nverts > 0:       
+                scalpST = np.array(st_list, dtype=np.float32).reshape(-1, 2)
+            if export_mcol:
+                mcols = np.array(mcol_list, dtype=np.float32).reshape(-1, 3)
+
+        curve_sets = []
+        vert_offsets = np.cumsum(verts_per_strand) - verts_per_strand
+        for start, end in curves_utils.split_strands(verts_per_strand):
+            vstart = int(vert_offsets[start])
+            vend = int(vert_offsets[end-1] + verts_per_strand[end-1])
+            bl_curve = BlHair()
+            bl_curve.points = np.ascontiguousarray(points[vstart:vend]).reshape(-1)
+            if next_points is not None:
+                bl_curve.next_points = np.ascontiguousarray(next_points[vstart:vend]).reshape(-1)
+            bl_curve.vertsArray = verts_per_strand[start:end].astype(np.int32)
+            bl_curve.nverts = vend - vstart
+            if conwidth:
+                bl_curve.hair_width = np.array([base_width], dtype=np.float32)
+            else:
+                bl_curve.hair_width = hair_width[vstart:vend]
+            if scalpST is not None:
+                bl_curve.scalpST = np.ascontiguousarray(scalpST[start:end]).reshape(-1)
+            if mcols is not None:
+                bl_curve.mcols = np.ascontiguousarray(mcols[start:end]).reshape(-1)
             curve_sets.append(bl_curve)
 
         return curve_sets              
@@ -6,6 +6,7 @@ from ..rfb_utils import shadergraph_utils
 from ..rfb_utils import color_utils
 from ..rfb_utils import gpmaterial_utils
 from ..rfb_utils import filepath_utils
+from ..rfb_utils import mesh_utils
 from ..rfb_utils.shadergraph_utils import RmanConvertNode
 from ..rman_constants import __RESERVED_BLENDER_NAMES__
 
@@ -23,6 +24,14 @@ __MAP_CYCLES_PARAMS__ = {
     }
 }
 
+# input sockets on the output node for each of the shading
+# networks, along with their old names
+__NETWORK_SOCKETS__ = {
+    'bxdf': ('bxdf_in', 'Bxdf'),
+    'light': ('light_in', 'Light'),
+    'displace': ('displace_in', 'Displacement')
+}
+
 def get_root_node(node, type='bxdf'):
     rman_type = getattr(node, 'renderman_node_type', node.bl_idname)
     if rman_type == type:
@@ -61,14 +70,10 @@ class RmanMaterialTranslator(RmanTranslator):
         rm = mat.renderman
         succeed = False
 
-        rman_sg_material.has_meshlight = False
-        rman_sg_material.sg_node.SetBxdf(None)        
-        rman_sg_material.sg_node.SetLight(None)
-        rman_sg_material.sg_node.SetDisplace(None)        
-
         handle = string_utils.sanitize_node_name(rman_sg_material.db_name)
         if mat.grease_pencil:
             if not mat.node_tree or not shadergraph_utils.is_renderman_nodetree(mat):
+                self.clear_material(rman_sg_material)
                 self.export_shader_grease_pencil(mat, rman_sg_material, handle=handle)
                 return
 
@@ -76,8 +81,16 @@ class RmanMaterialTranslator(RmanTranslator):
             succeed = self.export_shader_nodetree(mat, rman_sg_material, handle=handle)
 
         if not succeed:
+            self.clear_material(rman_sg_material)
             succeed = self.export_simple_shader(mat, rman_sg_material, mat_handle=handle)     
 
+    def clear_material(self, rman_sg_material):
+        rman_sg_material.has_meshlight = False
+        rman_sg_material.sg_node.SetBxdf(None)        
+        rman_sg_material.sg_node.SetLight(None)
+        rman_sg_material.sg_node.SetDisplace(None)
+        rman_sg_material.network_digests.clear()
+
     def export_shader_grease_pencil(self, mat, rman_sg_material, handle):
         gp_mat = mat.grease_pencil
         rman_sg_material.is_gp_material = True
@@ -125,91 +138,21 @@ class RmanMaterialTranslator(RmanTranslator):
                 if out.solo_node_on:
                     solo_node, solo_nodetree = shadergraph_utils.find_solo_node(nt)
                     if solo_node: 
+                        # the solo shader replaces the bxdf and light networks,
+                        # make sure they are exported again once solo is turned off
+                        rman_sg_material.network_digests.pop('bxdf', None)
+                        rman_sg_material.network_digests.pop('light', None)
+                        rman_sg_material.has_meshlight = False
+                        rman_sg_material.sg_node.SetBxdf(None)
+                        rman_sg_material.sg_node.SetLight(None)
                         has_solo_node = self.export_solo_shader(material, solo_nodetree, out, solo_node, rman_sg_material, handle)
                     else:
                         rfb_log().error("Solo node requested, but could not find nodetree.")
 
-                # bxdf
                 if not has_solo_node:
-                    socket = out.inputs.get('bxdf_in', None)
-                    if socket is None:
-                        # try old name
-                        socket = out.inputs.get('Bxdf', None)
-                    if socket and socket.is_linked and len(socket.links) > 0:
-                        from_node = socket.links[0].from_node
-                        linked_node = get_root_node(from_node, type='bxdf')
-                        if linked_node:
-                            bxdfList = []
-                            sub_nodes = []
-                            rman_sg_material.nodes_to_blnodeinfo.clear()                       
-                            sub_nodes.extend(shadergraph_utils.gather_nodes(from_node))
-                            for sub_node in sub_nodes:
-                                shader_sg_nodes = self.shader_node_sg(material, sub_node, rman_sg_material, mat_name=handle)
-                                for s in shader_sg_nodes:
-                                    bxdfList.append(s) 
-
-                            for node, bl_node_info in rman_sg_material.nodes_to_blnodeinfo.items():
-                                if bl_node_info.is_cycles_node:
-                                    continue
-                                property_utils.property_group_to_rixparams(node, rman_sg_material, bl_node_info.sg_node, ob=material, group_node=bl_node_info.group_node)
-                            
-                            if bxdfList:
-                                rman_sg_material.sg_node.SetBxdf(bxdfList)   
-                        else:
-                            self.create_pxrdiffuse_node(rman_sg_material, handle)         
-                    else:
-                        self.create_pxrdiffuse_node(rman_sg_material, handle)
-
-                # light
-                if not has_solo_node:
-                    socket = out.inputs.get('light_in', None)
-                    if socket is None:
-                        # try old name
-                        socket = out.inputs.get('Light', None)
-                    if socket and socket.is_linked and len(socket.links) > 0:
-                        from_node = socket.links[0].from_node
-                        linked_node = get_root_node(socket.links[0].from_node, type='light')
-                        if linked_node:
-                            lightNodesList = []
-                            sub_nodes = []
-                            rman_sg_material.nodes_to_blnodeinfo.clear()                
-                            sub_nodes.extend(shadergraph_utils.gather_nodes(from_node))                        
-                            for sub_node in sub_nodes:
-                                shader_sg_nodes = self.shader_node_sg(material, sub_node, rman_sg_material, mat_name=handle)
-                                for s in shader_sg_nodes:
-                                    lightNodesList.append(s) 
-                            for node, bl_node_info in rman_sg_material.nodes_to_blnodeinfo.items():
-                                if bl_node_info.is_cycles_node:
-                                    continue                            
-                                property_utils.property_group_to_rixparams(node, rman_sg_material, bl_node_info.sg_node, ob=material, group_node=bl_node_info.group_node)
-                                                        
-                            if lightNodesList:
-                                rman_sg_material.sg_node.SetLight(lightNodesList)                                   
-
-                # displacement
-                socket = out.inputs.get('displace_in', None)
-                if socket is None:
-                    # use old name
-                    socket = out.inputs.get('Displacement', None)                
-                if socket and socket.is_linked and len(socket.links) > 0:
-                    from_node = socket.links[0].from_node
-                    linked_node = get_root_node(from_node, type='displace')
-                    if linked_node:                    
-                        dispList = []
-                        sub_nodes = []
-                        rman_sg_material.nodes_to_blnodeinfo.clear()                  
-                        sub_nodes.extend(shadergraph_utils.gather_nodes(from_node))                             
-                        for sub_node in sub_nodes:
-                            shader_sg_nodes = self.shader_node_sg(material, sub_node, rman_sg_material, mat_name=handle)
-                            for s in shader_sg_nodes:
-                                dispList.append(s) 
-                        for node, bl_node_info in rman_sg_material.nodes_to_blnodeinfo.items():
-                            if bl_node_info.is_cycles_node:
-                                continue
-                            property_utils.property_group_to_rixparams(node, rman_sg_material, bl_node_info.sg_node, ob=material, group_node=bl_node_info.group_node)
-                                                                              
-                        if dispList:
-                            rman_sg_material.sg_node.SetDisplace(dispList)  
+                    self.export_network(material, rman_sg_material, out, 'bxdf', handle)
+                    self.export_network(material, rman_sg_material, out, 'light', handle)
+                self.export_network(material, rman_sg_material, out, 'displace', handle)
 
                 return True                        
                     
@@ -219,6 +162,101 @@ class RmanMaterialTranslator(RmanTranslator):
 
         return False
 
+    def get_network_nodes(self, out, network_type):
+        '''
+        Get the nodes of the bxdf, light or displacement network connected
+        to the output node, or None if there is no such network.
+        '''
+        socket_name, old_socket_name = __NETWORK_SOCKETS__[network_type]
+        socket = out.inputs.get(socket_name, None)
+        if socket is None:
+            # try old name
+            socket = out.inputs.get(old_socket_name, None)
+
+        if socket and socket.is_linked and len(socket.links) > 0:
+            from_node = socket.links[0].from_node
+            linked_node = get_root_node(from_node, type=network_type)
+            if linked_node:
+                return shadergraph_utils.gather_nodes(from_node)
+        return None
+
+    def get_share_digest(self, mat):
+        '''
+        Compute the digest used to find materials with identical shading networks,
+        which can then share a single scene graph material. Unlike the network digests,
+        this does not depend on the material's name.
+
+        Returns:
+            (bytes) - the digest, or None if this material cannot be shared
+        '''
+        if mat.grease_pencil or not mat.node_tree:
+            return None
+        out = shadergraph_utils.is_renderman_nodetree(mat)
+        if not out or out.solo_node_on:
+            return None
+
+        digests = list()
+        for network_type in ['bxdf', 'light', 'displace']:
+            nodes = self.get_network_nodes(out, network_type)
+            if network_type == 'light' and nodes is not None:
+                # mesh lights are never shared
+                return None
+            digests.append(shadergraph_utils.get_network_digest(mat, nodes or [], network_type, nodes is None))
+        return mesh_utils.get_digest(*digests)
+
+    def get_network_digest(self, material, nodes, network_type, handle):
+        extra_values = [network_type, handle, nodes is None]
+        if network_type == 'light' and nodes:
+            # light filters are exported along with the light network
+            for lf in material.renderman_light.light_filters:
+                light_filter = lf.linked_filter_ob
+                if light_filter:
+                    in_scene = self.rman_scene.bl_scene.objects.get(light_filter.name, None) is not None
+                    extra_values.append((light_filter.name_full, in_scene))
+        return shadergraph_utils.get_network_digest(material, nodes or [], *extra_values)
+
+    def export_network(self, material, rman_sg_material, out, network_type, handle):
+        '''
+        Export the bxdf, light or displacement network connected to the output node.
+        Nothing is exported if the network's digest hasn't changed since it was last exported.
+        '''
+        nodes = self.get_network_nodes(out, network_type)
+        digest = self.get_network_digest(material, nodes, network_type, handle)
+        if rman_sg_material.network_digests.get(network_type, None) == digest:
+            rfb_log().debug("Skipping unchanged %s network for material: %s" % (network_type, material.name))
+            return
+        rman_sg_material.network_digests[network_type] = digest
+
+        sg_material = rman_sg_material.sg_node
+        if network_type == 'bxdf':
+            set_network = sg_material.SetBxdf
+        elif network_type == 'light':
+            set_network = sg_material.SetLight
+            rman_sg_material.has_meshlight = False
+        else:
+            set_network = sg_material.SetDisplace
+        set_network(None)
+
+        if nodes is None:
+            if network_type == 'bxdf':
+                self.create_pxrdiffuse_node(rman_sg_material, handle)
+            return
+
+        sg_nodes = []
+        rman_sg_material.nodes_to_blnodeinfo.clear()
+        for sub_node in nodes:
+            shader_sg_nodes = self.shader_node_sg(material, sub_node, rman_sg_material, mat_name=handle)
+            for s in shader_sg_nodes:
+                sg_nodes.append(s)
+
+        for node, bl_node_info in rman_sg_material.nodes_to_blnodeinfo.items():
+            if bl_node_info.is_cycles_node:
+                continue
+            property_utils.property_group_to_rixparams(node, rman_sg_material, bl_node_info.sg_node, ob=material, group_node=bl_node_info.group_node)
+
+        if sg_nodes:
+            set_network(sg_nodes)
+
     def export_solo_shader(self, mat, nt, out, solo_node, rman_sg_material, mat_handle=''):
         bxdfList = []
         rman_sg_material.nodes_to_blnodeinfo.clear()         
@@ -15,24 +15,30 @@ import bmesh
 import numpy as np
 
 def _get_mats_faces_(nverts, material_ids):
+    '''
+    Partition the faces of the mesh by material index.
+
+    Returns:
+    (dict) - material index to an int32 array of face ids, in order of
+             first appearance of the material index
+    '''
+    material_ids = np.asarray(material_ids)[:len(nverts)]
+    mat_ids, first_faces, counts = np.unique(material_ids, return_index=True, return_counts=True)
+
+    # a stable sort keeps the face ids for each material in ascending order
+    faces = np.argsort(material_ids, kind='stable').astype(np.int32)
+    ends = np.cumsum(counts)
+    starts = ends - counts
 
     mats = {}
-    for face_id, num_verts in enumerate(nverts):
-        mat_id = material_ids[face_id]
-        if mat_id not in mats:
-            mats[mat_id] = []
-        mats[mat_id].append(face_id)
+    for i in np.argsort(first_faces):
+        mats[int(mat_ids[i])] = faces[starts[i]:ends[i]]
     return mats
 
-def _is_multi_material_(ob, mesh):
-    if len(ob.data.materials) < 2 or len(mesh.polygons) == 0:
+def _is_multi_material_(material_ids):
+    if material_ids is None or len(material_ids) == 0:
         return False
-
-    first_mat = mesh.polygons[0].material_index
-    for p in mesh.polygons:
-        if p.material_index != first_mat:
-            return True
-    return False
+    return bool((material_ids != material_ids[0]).any())
 
 # requires facevertex interpolation
 def _get_mesh_uv_(mesh, name="", ob=None):
@@ -67,7 +73,11 @@ def _get_mesh_uv_(mesh, name="", ob=None):
 
     return uvs
 
-def _get_mesh_vcol_(mesh, name="", ob=None):    
+def _strip_alpha_(cols):
+    delete_alpha = np.arange(3, cols.size, 4)
+    return np.delete(cols, delete_alpha)
+
+def _get_mesh_vcol_(mesh, name="", ob=None, strip_alpha=True):    
     if not name:
         vcol_layer = mesh.color_attributes.active_color
         if ob and not vcol_layer:
@@ -91,10 +101,9 @@ def _get_mesh_vcol_(mesh, name="", ob=None):
     fastvcols = np.zeros(vcol_count * 4)
     vcol_layer.data.foreach_get("color", fastvcols) 
 
-    delete_alpha = np.arange(3, fastvcols.size, 4)
-    cols = np.delete(fastvcols, delete_alpha)
-
-    return cols    
+    if not strip_alpha:
+        return fastvcols
+    return _strip_alpha_(fastvcols)
 
 def _get_mesh_vattr_(mesh, name=""):
     if not name in mesh.attributes and mesh != "":
@@ -115,21 +124,111 @@ def _get_mesh_vattr_(mesh, name=""):
     
     return attrs 
 
-def _get_mesh_vgroup_(ob, mesh, name=""):
+def _get_mesh_vgroups_(ob, mesh, cache=None):
+    '''
+    Read the weights for all of the vertex groups in a single pass over the vertices.
+
+    Arguments:
+    ob (bpy.types.Object) - the object that owns the vertex groups
+    mesh (bpy.types.Mesh) - Blender mesh
+    cache (dict) - optional dictionary to hold the results, keyed on the mesh data
+
+    Returns:
+    (numpy.ndarray) - dense (nverts x ngroups) float32 array. The array is column major,
+                      so the weights for each group are contiguous.
+    '''
+    key = mesh.as_pointer()
+    if cache is not None and key in cache:
+        return cache[key]
+
+    nverts = len(mesh.vertices)
+    ngroups = len(ob.vertex_groups)
+    weights = np.zeros((nverts, ngroups), dtype=np.float32, order='F')
+
+    # if the vertex groups are available as point attributes
+    # (ex: geometry nodes), read them in bulk
+    missing = False
+    for vgroup in ob.vertex_groups:
+        attr = mesh.attributes.get(vgroup.name, None)
+        if attr and attr.domain == 'POINT' and attr.data_type == 'FLOAT' and len(attr.data) == nverts:
+            attr.data.foreach_get('value', weights[:, vgroup.index])
+        else:
+            missing = True
+
+    if missing:
+        for i, v in enumerate(mesh.vertices):
+            for g in v.groups:
+                if g.group < ngroups:
+                    weights[i, g.group] = g.weight
+
+    if cache is not None:
+        cache[key] = weights
+    return weights
+
+def _get_mesh_vgroup_(ob, mesh, name="", cache=None):
     vgroup = ob.vertex_groups[name] if name != "" else ob.vertex_groups.active
-    weights = []
 
     if vgroup is None:
         return None
 
-    for v in mesh.vertices:
-        if len(v.groups) == 0:
-            weights.append(0.0)
-        else:
-            weights.extend([g.weight if g.group == vgroup.index else 0.0 for g in v.groups
-                            ])
+    weights = _get_mesh_vgroups_(ob, mesh, cache=cache)
+    return weights[:, vgroup.index]
+
+def _get_mesh_creases_(mesh):
+    '''
+    Read the edge creases for the mesh.
+
+    Returns:
+    (tuple) - the creases, and the edge vertices (None if there are no creased edges)
+    '''
+    edges_len = len(mesh.edges)
+    creases = np.zeros(edges_len, dtype=np.float32)
+    if BLENDER_41:
+        if mesh.edge_creases:
+            mesh.edge_creases.data.foreach_get('value', creases)
+    else:
+        mesh.edges.foreach_get('crease', creases)
+
+    edges = None
+    if (creases > 0.0).any():
+        edges = np.zeros(edges_len*2, dtype=np.int32)
+        mesh.edges.foreach_get('vertices', edges)
+    return (creases, edges)
+
+def _get_subd_tags_data_(subdiv_interp, creases, edges):
+    '''
+    Build the subdivision tag arrays from the edge creases. This does not
+    touch any Blender data, so it is safe to call from a worker thread.
+
+    Returns:
+    (tuple) - tags, nargs, intargs, floatargs, stringargs
+    '''
+    tags = ['interpolateboundary', 'facevaryinginterpolateboundary']
+    nargs = [1, 0, 0, 1, 0, 0]
+    intargs = list(subdiv_interp)
+    floatargs = []
+    stringargs = []   
+
+    if edges is not None:
+        # we have edges where their crease is > 0.0
+        # grab only those edges
+        edges_len = len(creases)
+        crease_edges = np.reshape(edges, (edges_len, 2))
+        crease_edges = crease_edges[creases > 0.0]
+        
+        # squared, to match blender appareance better
+        #: range 0 - 10 (infinitely sharp)
+        creases = creases * creases * 10.0
+        
+        creases = creases[creases > 0.0]
+        edges_subset_len = len(creases) 
 
-    return weights
+        tags.extend(['crease'] * edges_subset_len)
+        nargs.extend([2, 1, 0] * edges_subset_len)
+        intargs.extend(crease_edges.flatten().tolist())
+        floatargs.extend(creases.tolist())   
+
+    return (tags, nargs, intargs, floatargs, stringargs)
 
 def _get_material_ids(ob, geo):        
     fast_material_ids = np.zeros(len(geo.polygons), dtype=np.int32)
@@ -137,6 +236,167 @@ def _get_material_ids(ob, geo):
     material_ids = fast_material_ids
     return material_ids
 
+class RmanMeshData:
+    '''
+    The data read from a Blender mesh. Export is split into three stages:
+
+        mesh_data = _read_mesh_data_(ob, mesh) # Blender API reads, main thread only
+        _process_mesh_data_(mesh_data, tokens) # numpy only, safe to run in a worker thread
+        translator.update(...) # Set* calls on the scene graph, main thread
+
+    Attributes:
+        rman_mesh (RmanMesh) - nverts, verts, P and N for the mesh
+        is_subdiv (bool) - whether this mesh is a subdivision mesh
+        get_normals (bool) - whether normals were requested
+        uvs (numpy.ndarray) - the default uv set, if requested
+        vcols (numpy.ndarray) - the default vertex colors, if requested
+        subdiv_interp (list) - interpolateboundary and facevaryinginterpolateboundary values
+        creases (numpy.ndarray) - edge creases
+        crease_edges (numpy.ndarray) - edge vertices, if there are any creased edges
+        subd_tags (tuple) - subdivision tag arrays, filled in by _process_mesh_data_
+        material_ids (numpy.ndarray) - material index for each face, for meshes with multiple materials
+        is_multi_material (bool) - whether the faces use more than one material
+        mat_faces (dict) - material index to face ids, filled in by _process_mesh_data_
+        min_mat_idx (int) - the lowest material index, its faces stay on the main mesh
+        is_empty (bool) - whether the mesh has no faces
+        has_uvs (bool) - whether there are default uvs to export
+        primvars (list) - (Set* method name, args) calls for the primvars that come from
+                          the mesh data, filled in by _process_mesh_data_
+        primvars_digest (bytes) - digest of the primvars calls
+        topology_digest (bytes) - digest of the mesh topology
+    '''
+
+    def __init__(self):
+        self.rman_mesh = None
+        self.is_subdiv = False
+        self.get_normals = False
+        self.uvs = None
+        self.vcols = None
+        self.subdiv_interp = [0, 0]
+        self.creases = None
+        self.crease_edges = None
+        self.subd_tags = None
+        self.material_ids = None
+        self.is_multi_material = False
+        self.mat_faces = None
+        self.min_mat_idx = 0
+        self.is_empty = True
+        self.has_uvs = False
+        self.primvars = list()
+        self.primvars_digest = None
+        self.topology_digest = None
+
+    def nbytes(self):
+        # the size of the arrays read from the Blender mesh
+        arrays = [self.uvs, self.vcols, self.creases, self.crease_edges, self.material_ids]
+        if self.rman_mesh:
+            arrays.extend([self.rman_mesh.nverts, self.rman_mesh.verts, self.rman_mesh.P, self.rman_mesh.N])
+        return sum(a.nbytes for a in arrays if a is not None)
+
+def _read_mesh_data_(ob, mesh):
+    rm = ob.original.data.renderman
+    mesh_data = RmanMeshData()
+    mesh_data.is_subdiv = object_utils.is_subdmesh(ob.original)
+    use_smooth_normals = getattr(rm, 'rman_smoothnormals', False)
+    mesh_data.get_normals = (mesh_data.is_subdiv == 0 and not use_smooth_normals)
+    mesh_data.rman_mesh = mesh_utils.get_mesh(mesh, get_normals=mesh_data.get_normals)
+    if not mesh_data.rman_mesh.nverts.any():
+        return mesh_data
+
+    if rm.export_default_uv:
+        mesh_data.uvs = _get_mesh_uv_(mesh, ob=ob)
+    if rm.export_default_vcol:
+        mesh_data.vcols = _get_mesh_vcol_(mesh, ob=ob, strip_alpha=False)
+
+    if mesh_data.is_subdiv:
+        mesh_data.subdiv_interp = [int(ob.data.renderman.rman_subdivInterp),
+                                   int(ob.data.renderman.rman_subdivFacevaryingInterp)]
+        mesh_data.creases, mesh_data.crease_edges = _get_mesh_creases_(mesh)
+
+    if len(ob.data.materials) > 1 and len(mesh.polygons) > 0:
+        mesh_data.material_ids = _get_material_ids(ob, mesh)
+
+    return mesh_data
+
+def _process_mesh_data_(mesh_data, tokens):
+    '''
+    Pack the mesh data into the Set* calls for its primvars, and compute the
+    topology and primvars digests. This does not touch any Blender data, 
+    so it is safe to call from a worker thread.
+
+    Arguments:
+    mesh_data (RmanMeshData) - the data from _read_mesh_data_
+    tokens - the RenderMan Rix tokens
+
+    Returns:
+    (RmanMeshData) - mesh_data
+    '''
+    rman_mesh = mesh_data.rman_mesh
+    mesh_data.is_empty = not rman_mesh.nverts.any()
+    if mesh_data.is_empty:
+        return mesh_data
+
+    if mesh_data.vcols is not None:
+        mesh_data.vcols = _strip_alpha_(mesh_data.vcols)
+
+    if mesh_data.is_subdiv and mesh_data.creases is not None:
+        mesh_data.subd_tags = _get_subd_tags_data_(mesh_data.subdiv_interp, mesh_data.creases, mesh_data.crease_edges)
+
+    mesh_data.is_multi_material = _is_multi_material_(mesh_data.material_ids)
+    if mesh_data.is_multi_material:
+        mesh_data.mat_faces = _get_mats_faces_(rman_mesh.nverts, mesh_data.material_ids)
+        mesh_data.min_mat_idx = min(mesh_data.mat_faces.keys())
+
+    facevarying_detail = rman_mesh.numnverts
+    primvars = mesh_data.primvars
+    primvars.append(('SetPointDetail', tokens.k_P, rman_mesh.P.data, "vertex"))
+
+    uvs = mesh_data.uvs
+    if uvs is not None and uvs.any():
+        mesh_data.has_uvs = True
+        detail = "facevarying" if (facevarying_detail*2) == len(uvs) else "vertex"
+        primvars.append(('SetFloatArrayDetail', "st", uvs.data, 2, detail))
+
+    vcols = mesh_data.vcols
+    if vcols is not None and vcols.any():
+        detail = "facevarying" if (facevarying_detail*3) == len(vcols) else "vertex"
+        primvars.append(('SetColorDetail', "Cs", vcols.data, detail))
+
+    primvars.append(('SetIntegerDetail', tokens.k_Ri_nvertices, rman_mesh.nverts.data, "uniform"))
+    primvars.append(('SetIntegerDetail', tokens.k_Ri_vertices, rman_mesh.verts.data, "facevarying"))
+
+    if mesh_data.is_subdiv:
+        if mesh_data.subd_tags:
+            tags, nargs, intargs, floatargs, stringargs = mesh_data.subd_tags
+            primvars.append(('SetStringArray', tokens.k_Ri_subdivtags, tags, len(tags)))
+            primvars.append(('SetIntegerArray', tokens.k_Ri_subdivtagnargs, nargs, len(nargs)))
+            primvars.append(('SetIntegerArray', tokens.k_Ri_subdivtagintargs, intargs, len(intargs)))
+            primvars.append(('SetFloatArray', tokens.k_Ri_subdivtagfloatargs, floatargs, len(floatargs)))
+            primvars.append(('SetStringArray', tokens.k_Ri_subdivtagstringtags, stringargs, len(stringargs)))
+    elif mesh_data.get_normals and rman_mesh.N.any():
+        detail = "facevarying" if rman_mesh.nnormals == facevarying_detail else "uniform"
+        primvars.append(('SetNormalDetail', tokens.k_N, rman_mesh.N.data, detail))
+
+    if mesh_data.is_multi_material:
+        faces = mesh_data.mat_faces[mesh_data.min_mat_idx]
+        primvars.append(('SetIntegerArray', tokens.k_shade_faceset, faces.data, len(faces)))
+
+    mesh_data.topology_digest = mesh_utils.get_digest(rman_mesh.npolys, rman_mesh.npoints, facevarying_detail, 
+                                                      rman_mesh.nverts, rman_mesh.verts)
+    mesh_data.primvars_digest = mesh_utils.get_primvars_digest(primvars)
+
+    return mesh_data
+
+def _can_prefetch_(ob):
+    # These options need the Blender mesh when setting primvars,
+    # so they cannot use the staged export
+    rm = ob.original.data.renderman
+    if getattr(rm, 'output_all_primvars', False) or len(rm.prim_vars) > 0:
+        return False
+    if rm.export_default_uv and rm.export_default_tangents:
+        return False
+    return True
+
 def _export_reference_pose(ob, rman_sg_mesh, rm, rixparams):
     rman__Pref = None
     rman__WPref = None
@@ -229,27 +489,18 @@ def export_tangents(ob, geo, rixparams, uvmap="", name=""):
     except RuntimeError as err:
         rfb_log().debug("Can't export tangent vectors: %s" % str(err))       
 
-def _get_primvars_(ob, rman_sg_mesh, geo, rixparams):
+def _get_primvars_(ob, rman_sg_mesh, geo, rixparams, mesh_data):
     #rm = ob.data.renderman
     # Stange problem here : ob seems to not be in sync with the scene
     # when a geometry node is active...
     rm = ob.original.data.renderman
 
     facevarying_detail = rman_sg_mesh.nverts 
+    vgroup_cache = dict()
 
-    if rm.export_default_uv:
-        uvs = _get_mesh_uv_(geo, ob=ob)
-        if uvs is not None and uvs.any():
-            detail = "facevarying" if (facevarying_detail*2) == len(uvs) else "vertex"
-            rixparams.SetFloatArrayDetail("st", uvs.data, 2, detail)
-            if rm.export_default_tangents:
-                export_tangents(ob, geo, rixparams)    
-
-    if rm.export_default_vcol:
-        vcols = _get_mesh_vcol_(geo, ob=ob)
-        if vcols is not None and vcols.any():
-            detail = "facevarying" if (facevarying_detail*3) == len(vcols) else "vertex"
-            rixparams.SetColorDetail("Cs", vcols.data, detail)
+    # the default uvs and vertex colors were already packed by _process_mesh_data_
+    if rm.export_default_uv and rm.export_default_tangents and mesh_data.has_uvs:
+        export_tangents(ob, geo, rixparams)    
 
     # reference pose
     if hasattr(rm, 'reference_pose'):
@@ -267,10 +518,10 @@ def _get_primvars_(ob, rman_sg_mesh, geo, rixparams):
 
         # vertex group
         for nm in ob.vertex_groups.keys():
-            weights = _get_mesh_vgroup_(ob, geo, nm)
-            if weights and len(weights) > 0:
+            weights = _get_mesh_vgroup_(ob, geo, nm, cache=vgroup_cache)
+            if weights is not None and len(weights) > 0:
                 detail = "facevarying" if facevarying_detail == len(weights) else "vertex"
-                rixparams.SetFloatDetail(nm, weights, detail)        
+                rixparams.SetFloatDetail(nm, weights.data, detail)        
         
     elif len(rm.prim_vars) > 0:
         # custom prim vars
@@ -301,10 +552,10 @@ def _get_primvars_(ob, rman_sg_mesh, geo, rixparams):
                         export_tangents(ob, geo, rixparams, uvmap=p.data_name, name=p.name) 
 
             elif p.data_source == 'VERTEX_GROUP':
-                weights = _get_mesh_vgroup_(ob, geo, p.data_name)
-                if weights and len(weights) > 0:
+                weights = _get_mesh_vgroup_(ob, geo, p.data_name, cache=vgroup_cache)
+                if weights is not None and len(weights) > 0:
                     detail = "facevarying" if facevarying_detail == len(weights) else "vertex"
-                    rixparams.SetFloatDetail(p.name, weights, detail)
+                    rixparams.SetFloatDetail(p.name, weights.data, detail)
             elif p.data_source == 'VERTEX_ATTR_COLOR':
                 vattr = _get_mesh_vattr_(geo, p.data_name)            
                 if vattr is not None and vattr.any():
@@ -319,50 +570,34 @@ class RmanMeshTranslator(RmanTranslator):
     def __init__(self, rman_scene):
         super().__init__(rman_scene)
         self.bl_type = 'MESH' 
+        self.prefetched = dict()
+
+    def prefetch(self, ob, executor):
+        '''
+        Read the mesh data on the calling (main) thread, and submit the packing
+        of the primvars to executor. The next call to update() for this object will
+        use the result.
+
+        Args:
+            ob (bpy.types.Object) - evaluated Blender object
+            executor (concurrent.futures.Executor) - executor to run the processing in
+
+        Returns:
+            (int) - the size in bytes of the mesh data that was read, or None if this 
+                    mesh cannot use the staged export
+        '''
+        if not _can_prefetch_(ob):
+            return None
+        mesh = ob.to_mesh()
+        if not mesh:
+            return None
+        mesh_data = _read_mesh_data_(ob, mesh)
+        ob.to_mesh_clear()
+        self.prefetched[ob.original] = executor.submit(_process_mesh_data_, mesh_data, self.rman_scene.rman.Tokens.Rix)
+        return mesh_data.nbytes()
 
-    def _get_subd_tags_(self, ob, mesh, primvar):
-        rm = mesh.renderman
-
-        tags = ['interpolateboundary', 'facevaryinginterpolateboundary']
-        nargs = [1, 0, 0, 1, 0, 0]
-        intargs = [ int(ob.data.renderman.rman_subdivInterp),
-                int(ob.data.renderman.rman_subdivFacevaryingInterp)]
-        floatargs = []
-        stringargs = []   
-
-        # get creases
-        edges_len = len(mesh.edges)
-        creases = np.zeros(edges_len, dtype=np.float32)
-        if BLENDER_41:
-            if mesh.edge_creases:
-                mesh.edge_creases.data.foreach_get('value', creases)
-        else:
-            mesh.edges.foreach_get('crease', creases)
-        if (creases > 0.0).any():
-            # we have edges where their crease is > 0.0
-            # grab only those edges
-            crease_edges = np.zeros(edges_len*2, dtype=np.int32)
-            mesh.edges.foreach_get('vertices', crease_edges)
-            crease_edges = np.reshape(crease_edges, (edges_len, 2))
-            crease_edges = crease_edges[creases > 0.0]
-            
-            # squared, to match blender appareance better
-            #: range 0 - 10 (infinitely sharp)
-            creases = creases * creases * 10.0
-            
-            creases = creases[creases > 0.0]
-            edges_subset_len = len(creases) 
-
-            tags.extend(['crease'] * edges_subset_len)
-            nargs.extend([2, 1, 0] * edges_subset_len)
-            intargs.extend(crease_edges.flatten().tolist())
-            floatargs.extend(creases.tolist())   
-
-        primvar.SetStringArray(self.rman_scene.rman.Tokens.Rix.k_Ri_subdivtags, tags, len(tags))
-        primvar.SetIntegerArray(self.rman_scene.rman.Tokens.Rix.k_Ri_subdivtagnargs, nargs, len(nargs))
-        primvar.SetIntegerArray(self.rman_scene.rman.Tokens.Rix.k_Ri_subdivtagintargs, intargs, len(intargs))
-        primvar.SetFloatArray(self.rman_scene.rman.Tokens.Rix.k_Ri_subdivtagfloatargs, floatargs, len(floatargs))
-        primvar.SetStringArray(self.rman_scene.rman.Tokens.Rix.k_Ri_subdivtagstringtags, stringargs, len(stringargs))        
+    def clear_prefetched(self):
+        self.prefetched.clear()
 
     def export(self, ob, db_name):
         sg_node = self.rman_scene.sg_scene.CreateGroup('')
@@ -388,6 +623,10 @@ class RmanMeshTranslator(RmanTranslator):
         P = mesh_utils.get_mesh_points_(mesh)
         npoints = int(len(P) / 3)
 
+        # the primvars on the sg_mesh are about to differ from what
+        # the last update() call set
+        rman_sg_mesh.primvars_digest = None
+
         if rman_sg_mesh.npoints != npoints:
             primvar.SetTimes([])
             sg_node.SetPrimVars(primvar)
@@ -428,32 +667,39 @@ class RmanMeshTranslator(RmanTranslator):
     def update(self, ob, rman_sg_mesh, input_mesh=None, sg_node=None):
         rm = ob.original.data.renderman
         mesh = input_mesh
-        if not mesh:
-            mesh = ob.to_mesh()
+        mesh_data = None
+        future = None
+        if not input_mesh and sg_node is None:
+            future = self.prefetched.pop(ob.original, None)
+        if future:
+            # the mesh was already read by prefetch()
+            mesh_data = future.result()
+        else:
             if not mesh:
-                return True
+                mesh = ob.to_mesh()
+                if not mesh:
+                    return True
+            mesh_data = _process_mesh_data_(_read_mesh_data_(ob, mesh), self.rman_scene.rman.Tokens.Rix)
 
+        # only track content digests for our own sg_mesh
+        use_digest = (sg_node is None)
         if not sg_node:
             sg_node = rman_sg_mesh.sg_mesh
 
-        rman_sg_mesh.is_subdiv = object_utils.is_subdmesh(ob.original)
-        use_smooth_normals = getattr(rm, 'rman_smoothnormals', False)
-        get_normals = (rman_sg_mesh.is_subdiv == 0 and not use_smooth_normals)
-        rman_mesh = mesh_utils.get_mesh(mesh, get_normals=get_normals)
-        nverts = rman_mesh.nverts
-        verts = rman_mesh.verts
-        P = rman_mesh.P
-        N = rman_mesh.N
+        rman_sg_mesh.is_subdiv = mesh_data.is_subdiv
+        rman_mesh = mesh_data.rman_mesh
         
         # if this is empty continue:
-        if not nverts.any():
-            if not input_mesh:
+        if mesh_data.is_empty:
+            if mesh and not input_mesh:
                 ob.to_mesh_clear()
             rman_sg_mesh.npoints = 0
             rman_sg_mesh.npolys = 0
             rman_sg_mesh.nverts = 0
             rman_sg_mesh.is_transforming = False
             rman_sg_mesh.is_deforming = False
+            rman_sg_mesh.topology_digest = None
+            rman_sg_mesh.primvars_digest = None
             if rman_sg_mesh.sg_mesh:
                 rman_sg_mesh.sg_node.RemoveChild(rman_sg_mesh.sg_mesh)
             return None
@@ -471,44 +717,52 @@ class RmanMeshTranslator(RmanTranslator):
         rman_sg_mesh.npolys = npolys
         rman_sg_mesh.nverts = numnverts
 
-        sg_node.Define( npolys, npoints, numnverts )
-        rman_sg_mesh.is_multi_material = _is_multi_material_(ob, mesh)
+        stats_mgr = self.rman_scene.rman_render.stats_mgr
+        topology_digest = None
+        if use_digest:
+            topology_digest = mesh_data.topology_digest
+        if use_digest and topology_digest == rman_sg_mesh.topology_digest:
+            stats_mgr.update_geo_cache_stats(hit=True)
+        else:
+            if use_digest:
+                stats_mgr.update_geo_cache_stats(hit=False)
+            sg_node.Define( npolys, npoints, numnverts )
+        rman_sg_mesh.topology_digest = topology_digest
+        rman_sg_mesh.is_multi_material = mesh_data.is_multi_material
             
         primvar = sg_node.GetPrimVars()
         primvar.Clear()
 
+        # multi-material meshes need the actual RtParamList to inherit from,
+        # so we don't track the digest for those
+        use_digest = use_digest and not rman_sg_mesh.is_multi_material
+        rixparams = primvar
+        if use_digest:
+            rixparams = mesh_utils.RmanPrimVarsDigest(primvar)
+
         if rman_sg_mesh.is_deforming and len(rman_sg_mesh.deform_motion_steps) > 1:
-            super().set_primvar_times(rman_sg_mesh.deform_motion_steps, primvar)
+            super().set_primvar_times(rman_sg_mesh.deform_motion_steps, rixparams)
         
-        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P.data, "vertex")
-        _get_primvars_(ob, rman_sg_mesh, mesh, primvar)   
-
-        primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_nvertices, nverts.data, "uniform")
-        primvar.SetIntegerDetail(self.rman_scene.rman.Tokens.Rix.k_Ri_vertices, verts.data, "facevarying")                  
+        # the primvars from the mesh data were packed, and included in
+        # mesh_data.primvars_digest, by _process_mesh_data_
+        for set_func, *args in mesh_data.primvars:
+            getattr(primvar, set_func)(*args)
+        _get_primvars_(ob, rman_sg_mesh, mesh, rixparams, mesh_data)   
 
         if rman_sg_mesh.is_subdiv:
-            creases = self._get_subd_tags_(ob, mesh, primvar)
             sg_node.SetScheme(rm.rman_subdiv_scheme) 
-
         else:
             sg_node.SetScheme(None)
 
-        if not rman_sg_mesh.is_subdiv:
-            if get_normals and N.any():
-                if rman_mesh.nnormals == numnverts:
-                    primvar.SetNormalDetail(self.rman_scene.rman.Tokens.Rix.k_N, N.data, "facevarying")         
-                else:
-                    primvar.SetNormalDetail(self.rman_scene.rman.Tokens.Rix.k_N, N.data, "uniform")         
         subdiv_scheme = getattr(rm, 'rman_subdiv_scheme', 'none')
         rman_sg_mesh.subdiv_scheme = subdiv_scheme
 
-        super().export_object_primvars(ob, primvar)
+        super().export_object_primvars(ob, rixparams)
 
         if rman_sg_mesh.is_multi_material:
-            material_ids = _get_material_ids(ob, mesh)
             i = 1
-            mat_faces_dict = _get_mats_faces_(nverts, material_ids)
-            min_idx = min(mat_faces_dict.keys()) # find the minimun material index
+            mat_faces_dict = mesh_data.mat_faces
+            min_idx = mesh_data.min_mat_idx # the faces for the minimum material index stay on this mesh
             for mat_id, faces in mat_faces_dict.items():
                 # If the face has a mat index that is higher than the number of
                 # material slots, use the last material. This is what
@@ -523,7 +777,6 @@ class RmanMeshTranslator(RmanTranslator):
                     sg_material = self.rman_scene.rman_materials.get(mat.original, None)
 
                 if mat_id == min_idx:
-                    primvar.SetIntegerArray(self.rman_scene.rman.Tokens.Rix.k_shade_faceset, faces, len(faces))
                     if mat:
                         scenegraph_utils.set_material(sg_node, sg_material.sg_node, sg_material, mat=mat, ob=ob)
                 else:                
@@ -536,7 +789,7 @@ class RmanMeshTranslator(RmanTranslator):
                     if rman_sg_mesh.is_deforming and len(rman_sg_mesh.deform_motion_steps) > 1:
                         super().set_primvar_times(rman_sg_mesh.deform_motion_steps, pvars)
                     pvars.Inherit(primvar)
-                    pvars.SetIntegerArray(self.rman_scene.rman.Tokens.Rix.k_shade_faceset, faces, len(faces))                    
+                    pvars.SetIntegerArray(self.rman_scene.rman.Tokens.Rix.k_shade_faceset, faces.data, len(faces))                    
                     sg_sub_mesh.SetPrimVars(pvars)
                     if mat:
                         scenegraph_utils.set_material(sg_sub_mesh, sg_material.sg_node, sg_material, mat=mat, ob=ob)
@@ -545,9 +798,19 @@ class RmanMeshTranslator(RmanTranslator):
         else:
             rman_sg_mesh.multi_material_children = []
 
-        sg_node.SetPrimVars(primvar)
+        if use_digest:
+            primvars_digest = mesh_utils.get_digest(mesh_data.primvars_digest, rixparams.digest())
+            if primvars_digest == rman_sg_mesh.primvars_digest:
+                stats_mgr.update_geo_cache_stats(hit=True)
+            else:
+                stats_mgr.update_geo_cache_stats(hit=False)
+                sg_node.SetPrimVars(primvar)
+            rman_sg_mesh.primvars_digest = primvars_digest
+        else:
+            rman_sg_mesh.primvars_digest = None
+            sg_node.SetPrimVars(primvar)
 
-        if not input_mesh:
+        if mesh and not input_mesh:
             ob.to_mesh_clear()  
 
         return True    
\ No newline at end of file
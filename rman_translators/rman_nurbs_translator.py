@@ -5,7 +5,7 @@ from ..rfb_utils import string_utils
 from ..rfb_utils import property_utils
 
 import bpy
-import math
+import numpy as np
 
 '''
 Code reference from: https://blender.stackexchange.com/questions/34145/calculate-points-on-a-nurbs-curve-without-converting-to-mesh
@@ -18,7 +18,7 @@ def macro_segmentsu(nu):
     return nu.point_count_u if nu.use_cyclic_u else nu.point_count_u - 1
 
 def makeknots(nu):
-    knots = [0.0] * (4 + macro_knotsu(nu))
+    knots = np.zeros(4 + macro_knotsu(nu), dtype=np.float32)
     flag = nu.use_endpoint_u + (nu.use_bezier_u << 1)
     if nu.use_cyclic_u:
         calcknots(knots, nu.point_count_u, nu.order_u, 0)
@@ -29,114 +29,82 @@ def makeknots(nu):
 
 def calcknots(knots, pnts, order, flag):
     pnts_order = pnts + order
+    a = np.arange(pnts_order)
     if flag == 1:
-        k = 0.0
-        for a in range(1, pnts_order + 1):
-            knots[a - 1] = k
-            if a >= order and a <= pnts:
-                k += 1.0
+        knots[:pnts_order] = np.clip(a - order + 1, 0, pnts - order + 1)
     elif flag == 2:
         if order == 4:
-            k = 0.34
-            for a in range(pnts_order):
-                knots[a] = math.floor(k)
-                k += (1.0 / 3.0)
+            knots[:pnts_order] = np.floor(0.34 + a / 3.0)
         elif order == 3:
-            k = 0.6
-            for a in range(pnts_order):
-                if a >= order and a <= pnts:
-                    k += 0.5
-                    knots[a] = math.floor(k)
+            knots[:pnts_order] = np.floor(0.6 + 0.5 * np.clip(a - order + 1, 0, pnts - order + 1))
     else:
-        for a in range(pnts_order):
-            knots[a] = a
+        knots[:pnts_order] = a
 
 def makecyclicknots(knots, pnts, order):
     order2 = order - 1
 
-    if order > 2:
-        b = pnts + order2
-        for a in range(1, order2):
-            if knots[b] != knots[b - a]:
-                break
-
-            if a == order2:
-                knots[pnts + order - 2] += 1.0
-
-    b = order
+    # knot spacing is mirrored from the start of the knots
     c = pnts + order + order2
-    for a in range(pnts + order2, c):
-        knots[a] = knots[a - 1] + (knots[b] - knots[b - 1])
-        b -= 1
-
-def basisNurb(t, order, pnts, knots, basis, start, end):
-    i1 = i2 = 0
+    start = pnts + order2
+    b = np.arange(order, order - (c - start), -1)
+    knots[start:c] = knots[start - 1] + np.cumsum(knots[b] - knots[b - 1])
+
+def basis_nurbs(t, order, pnts, knots):
+    '''
+    Evaluate the basis functions for an array of parameters. At most order
+    basis functions are non-zero for each parameter, so only those are computed.
+
+    Returns:
+    (tuple) - (len(t), order) array of basis function values, and the index of
+              the basis function in the first column for each parameter
+    '''
     orderpluspnts = order + pnts
     opp2 = orderpluspnts - 1
+    knots = np.asarray(knots, dtype=np.float64)[:orderpluspnts]
 
     # this is for float inaccuracy
-    if t < knots[0]:
-        t = knots[0]
-    elif t > knots[opp2]:
-        t = knots[opp2]
-
-    # this part is order '1'
-    o2 = order + 1
-    for i in range(opp2):
-        if knots[i] != knots[i + 1] and t >= knots[i] and t <= knots[i + 1]:
-            basis[i] = 1.0
-            i1 = i - o2
-            if i1 < 0:
-                i1 = 0
-            i2 = i
-            i += 1
-            while i < opp2:
-                basis[i] = 0.0
-                i += 1
-            break
-
-        else:
-            basis[i] = 0.0
-
-    basis[i] = 0.0
+    t = np.clip(np.asarray(t, dtype=np.float64), knots[0], knots[opp2])
+
+    # this part is order '1'. The first non-empty span containing t is used.
+    span = np.searchsorted(knots, t, side='left') - 1
+    at_start = span < 0
+    span[at_start] = np.searchsorted(knots, t[at_start], side='right') - 1
+    valid = (span >= 0) & (span < opp2)
+    span = np.clip(span, 0, opp2 - 1)
+    valid &= knots[span] != knots[span + 1]
+
+    # only the basis functions span - order + 1 ... span can be non-zero. The
+    # extra column is basis function span + 1, which is always zero.
+    first = span - (order - 1)
+    ids = first[:, np.newaxis] + np.arange(order)
+    basis = np.zeros((len(t), order + 1), dtype=np.float64)
+    basis[valid, order - 1] = 1.0
+    t = t[:, np.newaxis]
+
+    def knots_at(offset):
+        return knots[np.clip(ids + offset, 0, opp2)]
 
     # this is order 2, 3, ...
-    for j in range(2, order + 1):
-
-        if i2 + j >= orderpluspnts:
-            i2 = opp2 - j
-
-        for i in range(i1, i2 + 1):
-            if basis[i] != 0.0:
-                d = ((t - knots[i]) * basis[i]) / (knots[i + j - 1] - knots[i])
-            else:
-                d = 0.0
-
-            if basis[i + 1] != 0.0:
-                e = ((knots[i + j] - t) * basis[i + 1]) / (knots[i + j] - knots[i + 1])
-            else:
-                e = 0.0
-
-            basis[i] = d + e
-
-    start = 1000
-    end = 0
-
-    for i in range(i1, i2 + 1):
-        if basis[i] > 0.0:
-            end = i
-            if start == 1000:
-                start = i
-
-    return start, end
-
-def nurb_make_curve(nu, resolu, stride):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for j in range(2, order + 1):
+            n = orderpluspnts - j
+            ki = knots_at(0)
+            ki1 = knots_at(1)
+            kij = knots_at(j)
+            d = (t - ki) * basis[:, :order] / (knots_at(j - 1) - ki)
+            e = (kij - t) * basis[:, 1:] / (kij - ki1)
+            d = np.where(basis[:, :order] != 0.0, d, 0.0)
+            e = np.where(basis[:, 1:] != 0.0, e, 0.0)
+            basis[:, :order] = np.where((ids >= 0) & (ids < n), d + e, 0.0)
+
+    return basis[:, :order], first
+
+def nurb_make_curve(nu, resolu, stride=3):
     EPS = 1e-6
-    coord_index = istart = iend = 0
 
-    coord_array = [0.0] * (3 * nu.resolution_u * macro_segmentsu(nu))
-    sum_array = [0] * nu.point_count_u
-    basisu = [0.0] * macro_knotsu(nu)
+    co = np.zeros(len(nu.points)*4, dtype=np.float32)
+    nu.points.foreach_get('co', co)
+    co = co.reshape(-1, 4)[:nu.point_count_u]
     knots = makeknots(nu)
 
     resolu = resolu * macro_segmentsu(nu)
@@ -146,50 +114,20 @@ def nurb_make_curve(nu, resolu, stride):
     ustep  = (uend - ustart) / (resolu - (0 if nu.use_cyclic_u else 1))
     cycl = nu.order_u - 1 if nu.use_cyclic_u else 0
 
-    u = ustart
-    while resolu:
-        resolu -= 1
-        istart, iend = basisNurb(u, nu.order_u, nu.point_count_u + cycl, knots, basisu, istart, iend)
-
-        #/* calc sum */
-        sumdiv = 0.0
-        sum_index = 0
-        pt_index = istart - 1
-        for i in range(istart, iend + 1):
-            if i >= nu.point_count_u:
-                pt_index = i - nu.point_count_u
-            else:
-                pt_index += 1
-
-            sum_array[sum_index] = basisu[i] * nu.points[pt_index].co[3]
-            sumdiv += sum_array[sum_index]
-            sum_index += 1
-
-        if (sumdiv != 0.0) and (sumdiv < 1.0 - EPS or sumdiv > 1.0 + EPS):
-            sum_index = 0
-            for i in range(istart, iend + 1):
-                sum_array[sum_index] /= sumdiv
-                sum_index += 1
-
-        coord_array[coord_index: coord_index + 3] = (0.0, 0.0, 0.0)
-
-        sum_index = 0
-        pt_index = istart - 1
-        for i in range(istart, iend + 1):
-            if i >= nu.point_count_u:
-                pt_index = i - nu.point_count_u
-            else:
-                pt_index += 1
-
-            if sum_array[sum_index] != 0.0:
-                for j in range(3):
-                    coord_array[coord_index + j] += sum_array[sum_index] * nu.points[pt_index].co[j]
-            sum_index += 1
-
-        coord_index += stride
-        u += ustep
-
-    return coord_array
+    u = ustart + np.arange(resolu) * ustep
+    basisu, first = basis_nurbs(u, nu.order_u, nu.point_count_u + cycl, knots)
+
+    # the extra cyclic basis functions wrap around to the first points.
+    # Basis functions before the first one have a zero weight.
+    pt_ids = np.maximum(first[:, np.newaxis] + np.arange(nu.order_u), 0) % nu.point_count_u
+    sums = basisu * co[pt_ids, 3]
+    sumdiv = sums.sum(axis=1)
+    normalize = (sumdiv != 0.0) & ((sumdiv < 1.0 - EPS) | (sumdiv > 1.0 + EPS))
+    sums[normalize] /= sumdiv[normalize, np.newaxis]
+
+    coord_array = np.zeros((resolu, stride), dtype=np.float32)
+    coord_array[:, :3] = np.einsum('ij,ijk->ik', sums, co[pt_ids, :3])
+    return coord_array.reshape(-1)
 
 class RmanNurbsTranslator(RmanTranslator):
 
@@ -219,9 +157,8 @@ class RmanNurbsTranslator(RmanTranslator):
         if uorder == 0 or vorder == 0:
             return
 
-        P = []
-        for pt in spline.points:
-            P.append(pt.co)            
+        P = np.zeros(len(spline.points)*4, dtype=np.float32)
+        spline.points.foreach_get('co', P)
 
         '''
         # we currently don't support use_cyclic_u and use_cuclic_v options    
@@ -245,20 +182,20 @@ class RmanNurbsTranslator(RmanTranslator):
         '''
      
         pnts_order = spline.point_count_u + spline.order_u
-        uknots = [0.0] * pnts_order
+        uknots = np.zeros(pnts_order, dtype=np.float32)
         flag = spline.use_endpoint_u + (spline.use_bezier_u << 1)
         calcknots(uknots, spline.point_count_u, spline.order_u, flag)
 
         pnts_order = spline.point_count_v + spline.order_v
-        vknots = [0.0] * pnts_order
+        vknots = np.zeros(pnts_order, dtype=np.float32)
         flag = spline.use_endpoint_v + (spline.use_bezier_v << 1)
         calcknots(vknots, spline.point_count_v, spline.order_v, flag)
 
         rman_sg_nurbs.sg_node.Define(nu, uorder, nv, vorder)
         
         primvar = rman_sg_nurbs.sg_node.GetPrimVars()
-        primvar.SetHpointDetail(self.rman_scene.rman.Tokens.Rix.k_Pw, P, "vertex")   
-        primvar.SetFloatArray(self.rman_scene.rman.Tokens.Rix.k_Ri_uknot, uknots, len(uknots))
-        primvar.SetFloatArray(self.rman_scene.rman.Tokens.Rix.k_Ri_vknot, vknots, len(vknots))
+        primvar.SetHpointDetail(self.rman_scene.rman.Tokens.Rix.k_Pw, P.data, "vertex")   
+        primvar.SetFloatArray(self.rman_scene.rman.Tokens.Rix.k_Ri_uknot, uknots.data, len(uknots))
+        primvar.SetFloatArray(self.rman_scene.rman.Tokens.Rix.k_Ri_vknot, vknots.data, len(vknots))
         super().export_object_primvars(ob, primvar)
         rman_sg_nurbs.sg_node.SetPrimVars(primvar)
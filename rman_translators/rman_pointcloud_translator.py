@@ -1,9 +1,34 @@
 from .rman_translator import RmanTranslator
 from ..rman_sg_nodes.rman_sg_pointcloud import RmanSgPointCloud
 from ..rfb_utils.scene_utils import BlAttribute
-from mathutils import Vector
+from ..rfb_utils import transform_utils
 import numpy as np
 
+def _get_points_(P, inv_mtx, velocity=None, motion_scale=1.0):
+    '''
+    Transform the points into object space, and calculate the points
+    at the end of the shutter from velocity.
+
+    Arguments:
+    P (numpy.ndarray) - (npoints, 3) array of points
+    inv_mtx (mathutils.Matrix) - inverse of the object's world matrix
+    velocity (numpy.ndarray) - optional flat array of the point velocities
+    motion_scale (float) - scale for the velocities
+
+    Returns:
+    (tuple) - (npoints, 3) float32 arrays of the points and the next points. The next
+              points are None if there is no velocity.
+    '''
+    # this matches Vector(p) @ inv_mtx for each point
+    P = transform_utils.transform_points_array(inv_mtx, P, row_vector=True)
+    if velocity is None:
+        return (P, None)
+
+    velocity = np.reshape(velocity, (len(P), 3)) * np.float32(motion_scale)
+    next_points = transform_utils.transform_points_array(inv_mtx, velocity, row_vector=True)
+    next_points += P
+    return (P, next_points)
+
 class RmanPointCloudTranslator(RmanTranslator):
 
     def __init__(self, rman_scene):
@@ -46,16 +71,12 @@ class RmanPointCloudTranslator(RmanTranslator):
         P = np.reshape(P, (nvertices, 3))
 
         if np.count_nonzero(radius) == 0:
-            radius = []
+            radius = None
         else:
-            radius = radius * 2.0
-            radius = radius.tolist()
+            radius *= 2.0
 
-        next_points = []
-        P = [Vector(p) @ inv_mtx for p in P]
-        
         # if this is empty continue:
-        if not P or len(P) < 1:
+        if nvertices < 1:
             if rman_sg_pointcloud.sg_pointcloud:
                 rman_sg_pointcloud.sg_node.RemoveChild(rman_sg_pointcloud.sg_pointcloud)
             rman_sg_pointcloud.is_transforming = False
@@ -64,36 +85,35 @@ class RmanPointCloudTranslator(RmanTranslator):
 
         bl_attributes = self.get_attributes_for_points(ob)
         velocity = bl_attributes.get('velocity', None)          
+        velocity_values = None
+        motion_scale = 1.0
+        if rman_sg_pointcloud.deform_motion_steps and velocity and velocity.rman_type == 'vector':    
+            # calculate a scale for the velocity
+            # based on the calculation from cycles
+            shutter_interval = self.rman_scene.bl_scene.renderman.shutter_angle / 360.0
+            motion_scale = shutter_interval / (self.rman_scene.bl_scene.render.fps / self.rman_scene.bl_scene.render.fps_base)
+            velocity_values = velocity.values
+
+        P, next_points = _get_points_(P, inv_mtx, velocity=velocity_values, motion_scale=motion_scale)
         
-        npoints = len(P)
+        npoints = nvertices
         rman_sg_pointcloud.sg_pointcloud.Define(npoints)
         rman_sg_pointcloud.npoints = npoints
 
         primvar = rman_sg_pointcloud.sg_pointcloud.GetPrimVars()
         primvar.Clear()                       
 
-        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P, "vertex")        
+        primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P.reshape(-1).data, "vertex")        
         
-        if rman_sg_pointcloud.deform_motion_steps and velocity and velocity.rman_type == 'vector':    
-            # calculate a scale for the velocity
-            # based on the calculation from cycles
-            shutter_interval = self.rman_scene.bl_scene.renderman.shutter_angle / 360.0
-            motion_scale = shutter_interval / (self.rman_scene.bl_scene.render.fps / self.rman_scene.bl_scene.render.fps_base)
-            velocity = np.reshape(velocity.values, (nvertices, 3))
-            
-            for i in range(len(P)):
-                p = P[i]
-                v = (Vector(velocity[i]) * motion_scale) @ inv_mtx
-                next_points.append(p + v)       
-
+        if next_points is not None:
             super().set_primvar_times(rman_sg_pointcloud.deform_motion_steps, primvar)
-            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P, "vertex", 0)
-            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, next_points, "vertex", 1)
+            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, P.reshape(-1).data, "vertex", 0)
+            primvar.SetPointDetail(self.rman_scene.rman.Tokens.Rix.k_P, next_points.reshape(-1).data, "vertex", 1)
         else:
             primvar.SetTimes([])          
 
-        if radius:
-            primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, radius, "vertex")
+        if radius is not None:
+            primvar.SetFloatDetail(self.rman_scene.rman.Tokens.Rix.k_width, radius.data, "vertex")
 
         BlAttribute.set_rman_primvars(primvar, bl_attributes)         
             
@@ -110,7 +110,16 @@ class RmanTranslator(object):
         if not rman_sg_node.sg_node:
             return        
         name = ob.name_full
-        is_instance = ob_inst.is_instance
+        if isinstance(ob_inst, bpy.types.DepsgraphObjectInstance):
+            is_instance = ob_inst.is_instance
+            inst_ob = ob_inst.object
+            persistent_id = ob_inst.persistent_id[1]
+        else:
+            # an object that is not an instance. Its depsgraph
+            # instance has the same attributes and a persistent ID of 0
+            is_instance = False
+            inst_ob = ob_inst
+            persistent_id = 0
         if is_instance:
             name = ob_inst.parent.name
         attrs = rman_sg_node.sg_node.GetAttributes()
@@ -118,7 +127,6 @@ class RmanTranslator(object):
 
         # Add ID
         if name != "":            
-            persistent_id = ob_inst.persistent_id[1]
             if persistent_id == 0:           
                 persistent_id = int(hashlib.sha1(name.encode()).hexdigest(), 16) % 10**8
             self.rman_scene.obj_hash[persistent_id] = name
@@ -145,8 +153,8 @@ class RmanTranslator(object):
             holdout = ob_inst.parent.holdout_get(view_layer=self.rman_scene.bl_view_layer)
             indirect = ob_inst.parent.indirect_only_get(view_layer=self.rman_scene.bl_view_layer)
         else:
-            holdout = ob_inst.object.holdout_get(view_layer=self.rman_scene.bl_view_layer)
-            indirect = ob_inst.object.indirect_only_get(view_layer=self.rman_scene.bl_view_layer)
+            holdout = inst_ob.holdout_get(view_layer=self.rman_scene.bl_view_layer)
+            indirect = inst_ob.indirect_only_get(view_layer=self.rman_scene.bl_view_layer)
 
         if holdout:
             # let Blender's holdout attribute take precedence
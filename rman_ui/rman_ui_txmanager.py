@@ -481,6 +481,67 @@ class PRMAN_OT_Renderman_txmanager_apply_preset(Operator):
 
         return {'FINISHED'}
 
+def set_txmgr_list_item(item, txfile):
+    """Fill in a texture manager UI list item from a TxFile."""
+    item.name = txfile.input_image
+    params = txfile.params
+    item.texture_type = params.texture_type
+    item.s_mode = params.s_mode
+    item.t_mode = params.t_mode
+    item.texture_format = params.texture_format
+    if params.data_type is not None:
+        item.data_type = params.data_type
+    item.resize = params.resize 
+    item.state = txfile.state   
+    if txfile.state == txmngr.STATE_IS_TEX:
+        item.enable = False  
+    else:
+        item.enable = True
+    if params.ocioconvert:
+        item.ocioconvert = params.ocioconvert
+
+    if params.bumprough:
+        bumprough = params.bumprough_as_dict()
+        item.bumpRough = str(bumprough['normalmap'])
+        item.bumpRough_factor = float(bumprough['factor'])
+        item.bumpRough_invert = bool(bumprough['invert'])
+        item.bumpRough_invertU = bool(bumprough['invertU'])
+        item.bumpRough_invertV = bool(bumprough['invertV'])
+        item.bumpRough_refit = bool(bumprough['refit'])
+    else:
+        item.bumpRough = "-1"
+
+    item.tooltip = '\nNode ID: ' + item.nodeID + "\n" + str(txfile)
+
+def add_txmgr_list_items(rman_txmgr_list, nodeIDs):
+    """Add or update the texture manager UI list items for nodeIDs in one pass.
+    This is the batched version of the rman_txmgr_list.add_texture operator."""
+    txm = texture_utils.get_txmanager().txmanager
+    txfiles = dict()
+    for nodeID in nodeIDs:
+        txfile = txm.get_txfile_from_id(nodeID)
+        if txfile:
+            txfiles[nodeID] = txfile
+
+    # remove stale items, and items that now point to a texture
+    # that is being added under a different nodeID
+    added_txfiles = set(id(txfile) for txfile in txfiles.values())
+    for i in reversed(range(len(rman_txmgr_list))):
+        item = rman_txmgr_list[i]
+        if item.nodeID in txfiles:
+            continue
+        txfile_item = txm.get_txfile_from_id(item.nodeID)
+        if txfile_item is None or id(txfile_item) in added_txfiles:
+            rman_txmgr_list.remove(i)
+
+    items = dict((item.nodeID, item) for item in rman_txmgr_list if item.nodeID in txfiles)
+    for nodeID, txfile in txfiles.items():
+        item = items.get(nodeID, None)
+        if not item:
+            item = rman_txmgr_list.add()
+            item.nodeID = nodeID
+        set_txmgr_list_item(item, txfile)
+
 class PRMAN_OT_Renderman_txmanager_add_texture(Operator):
     """Add texture."""
 
@@ -520,35 +581,7 @@ class PRMAN_OT_Renderman_txmanager_add_texture(Operator):
         if not item:
             item = rman_txmgr_list.add()
             item.nodeID = self.nodeID
-        item.name = txfile.input_image
-        params = txfile.params
-        item.texture_type = params.texture_type
-        item.s_mode = params.s_mode
-        item.t_mode = params.t_mode
-        item.texture_format = params.texture_format
-        if params.data_type is not None:
-            item.data_type = params.data_type
-        item.resize = params.resize 
-        item.state = txfile.state   
-        if txfile.state == txmngr.STATE_IS_TEX:
-            item.enable = False  
-        else:
-            item.enable = True
-        if params.ocioconvert:
-            item.ocioconvert = params.ocioconvert
-
-        if params.bumprough:
-            bumprough = params.bumprough_as_dict()
-            item.bumpRough = str(bumprough['normalmap'])
-            item.bumpRough_factor = float(bumprough['factor'])
-            item.bumpRough_invert = bool(bumprough['invert'])
-            item.bumpRough_invertU = bool(bumprough['invertU'])
-            item.bumpRough_invertV = bool(bumprough['invertV'])
-            item.bumpRough_refit = bool(bumprough['refit'])
-        else:
-            item.bumpRough = "-1"
-
-        item.tooltip = '\nNode ID: ' + item.nodeID + "\n" + str(txfile)
+        set_txmgr_list_item(item, txfile)
         # FIXME: should also add the nodes that this texture is referenced in     
 
         return{'FINISHED'}        
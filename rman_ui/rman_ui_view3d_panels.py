@@ -296,6 +296,7 @@ class RENDER_PT_renderman_live_stats(bpy.types.Panel, _RManPanelHeader):
             if rr.rman_context.is_render_running():
                 box.prop(rm, 'roz_stats_iterations', slider=True, text='Iterations (%d / %d)' % (rr.stats_mgr._iterations, rr.stats_mgr._maxSamples))
                 box.prop(rm, 'roz_stats_progress', slider=True)            
+                box.label(text='Geometry Cache: %d hits / %d misses' % (rr.stats_mgr.geo_cache_hits, rr.stats_mgr.geo_cache_misses))
             '''
             if rr.stats_mgr.web_socket_enabled:
                 if rr.stats_mgr.is_connected():